@@ -3,9 +3,14 @@ Created 2023-12-24
 
 @author: wf
 """
+from functools import partial
+
 from ceurws.wikidatasync import DblpEndpoint
 from ngwidgets.progress import NiceguiProgressbar
-from nicegui import run, ui
+from nicegui import ui
+
+from sempubflow.cache_refresh import CacheRefreshScheduler, CacheRefreshState
+from sempubflow.dblp_delta import DblpDeltaRefresh
 
 
 class Admin:
@@ -16,12 +21,22 @@ class Admin:
         webserver: A server instance on which the admin panel is running.
         endpoint_url: The URL of the DBLP SPARQL endpoint to be used.
         endpoint: An instance of DblpEndpoint initialized with endpoint_url.
+        cache_warmer: the CacheWarmer of the webserver process if any.
     """
 
+    default_endpoint_url = "https://qlever.cs.uni-freiburg.de/api/dblp/query"
+
+    # the dblp caches that are built from other caches
+    cache_dependencies = {
+        "dblp/papers": ["dblp/authors"],
+        "dblp/volumes": ["dblp/editors", "dblp/papers"],
+    }
+
     def __init__(
         self,
         webserver,
-        endpoint_url: str = "https://qlever.cs.uni-freiburg.de/api/dblp/query",
+        endpoint_url: str = default_endpoint_url,
+        cache_warmer=None,
     ):
         """
         Initializes the Admin panel with given webserver and endpoint URL.
@@ -29,10 +44,15 @@ class Admin:
         Args:
             webserver: The server instance on which the admin panel is running.
             endpoint_url: The URL for the DBLP SPARQL endpoint, defaults to "https://qlever.cs.uni-freiburg.de/api/dblp/query".
+            cache_warmer: the CacheWarmer whose state is to be shown
         """
         self.webserver = webserver
+        self.cache_warmer = cache_warmer
         self.endpoint_url = None
         self.force_query = False
+        # fetch only the records of new volumes where possible
+        self.delta_refresh = False
+        self.max_concurrency = 2
         self.set_endpoint(endpoint_url)
         # Initialize with the given endpoint URL
         self.setup()
@@ -40,7 +60,12 @@ class Admin:
     def set_endpoint(self, url):
         if self.endpoint_url is None or url != self.endpoint_url:
             self.endpoint_url = url  # Store the given or default endpoint URL
-            self.endpoint = DblpEndpoint(self.endpoint_url)
+            warm_endpoint = self.cache_warmer.get("dblp") if self.cache_warmer else None
+            if warm_endpoint is not None and url == self.default_endpoint_url:
+                # reuse the preloaded caches
+                self.endpoint = warm_endpoint
+            else:
+                self.endpoint = DblpEndpoint(self.endpoint_url)
 
     def setup(self):
         """
@@ -57,8 +82,10 @@ class Admin:
             # Initialize the table with empty rows
             columns = [
                 {"name": "cache_name", "label": "Cache Name", "field": "cache_name"},
+                {"name": "status", "label": "Status", "field": "status"},
                 {"name": "size", "label": "Size (Bytes)", "field": "size"},
                 {"name": "entries", "label": "Entries", "field": "entries"},
+                {"name": "delta", "label": "Delta", "field": "delta"},
                 {
                     "name": "last_accessed",
                     "label": "Last Accessed",
@@ -74,6 +101,12 @@ class Admin:
                 self.force_query_checkbox = ui.checkbox("Force Query").bind_value(
                     self, "force_query"
                 )
+                ui.checkbox("Delta").bind_value(self, "delta_refresh").tooltip(
+                    "query only new volumes and merge them into the cache"
+                )
+                ui.number("parallel queries", min=1, max=8, precision=0).bind_value(
+                    self, "max_concurrency", forward=int
+                )
 
             # Initialize the progress bar with total steps equal to the number of cache functions
             self.progress_bar = NiceguiProgressbar(
@@ -85,6 +118,38 @@ class Admin:
             # Show initial cache status
             self.update_cache_info()
 
+            if self.cache_warmer:
+                self.setup_cache_warmer()
+
+    def setup_cache_warmer(self):
+        """
+        show the state of the background cache warmer
+        """
+        ui.label("Cache Warmer:")
+        columns = [
+            {"name": name, "label": label, "field": name}
+            for name, label in [
+                ("name", "Cache"),
+                ("status", "Status"),
+                ("loads", "Loads"),
+                ("loaded_at", "Loaded at"),
+                ("duration", "Duration"),
+                ("next_refresh", "Next Refresh"),
+                ("error", "Error"),
+            ]
+        ]
+        self.warmer_table = ui.table(
+            columns=columns, rows=self.cache_warmer.get_rows(), row_key="name"
+        ).classes("w-full")
+        ui.timer(2.0, self.update_cache_warmer_info)
+
+    def update_cache_warmer_info(self):
+        """
+        update the state of the background cache warmer
+        """
+        self.warmer_table.rows = self.cache_warmer.get_rows()
+        self.warmer_table.update()
+
     def update_endpoint_url(self, event):
         """
         Updates the endpoint URL in the DblpEndpoint instance.
@@ -102,41 +167,100 @@ class Admin:
 
         # Reset and display the progress bar
         self.progress_bar.reset()
-        self.table.rows.clear()
-        # Run the cache update process in the background
-        await run.io_bound(self.background_cache_update)
-        msg = f"Cache update finished"
-        ui.notify(msg)
+        # independent caches are refreshed in parallel in a thread pool
+        scheduler = CacheRefreshScheduler(
+            cache_functions={
+                cache_name: partial(self.refresh_cache, cache_name)
+                for cache_name in self.endpoint.cache_functions
+            },
+            dependencies=self.cache_dependencies,
+            max_concurrency=int(self.max_concurrency),
+            on_progress=self.on_refresh_progress,
+        )
+        states = await scheduler.run(force_query=self.force_query)
+        failed = [state.name for state in states.values() if state.status != "done"]
+        if failed:
+            ui.notify(f"Cache update failed for {', '.join(failed)}", type="negative")
+        else:
+            ui.notify("Cache update finished")
 
-    def background_cache_update(self):
-        """Background task to refresh data in caches."""
-        for step, (cache_name, cache_function) in enumerate(
-            self.endpoint.cache_functions.items(), start=1
-        ):
-            # Call the corresponding function to refresh cache data
-            cache_function(force_query=self.force_query)
-            with self.card:
-                ui.notify(f"{step}: {cache_name} updated")
-                # Update progress bar after each cache is processed
-                self.progress_bar.update(1)
-                info = self.endpoint.json_cache_manager.get_cache_info(cache_name)
-                self.update_cache_info_row(info)
-
-    def update_cache_info_row(self, info):
+    def refresh_cache(self, cache_name: str, force_query: bool):
+        """
+        refresh the cache with the given name - called from a worker thread
+
+        each refresh uses its own endpoint since the SPARQL access of an
+        endpoint is not thread safe
+
+        Args:
+            cache_name: the name of the cache
+            force_query: if True query even if the cache is stored
+
+        Returns:
+            the DeltaResult of a delta refresh
+        """
+        endpoint = DblpEndpoint(self.endpoint_url)
+        if self.delta_refresh and DblpDeltaRefresh.supports(cache_name):
+            return DblpDeltaRefresh(endpoint).refresh(cache_name)
+        return endpoint.cache_functions[cache_name](force_query=force_query)
+
+    def on_refresh_progress(self, state: CacheRefreshState):
+        """
+        show the refresh state of a cache
+
+        Args:
+            state: the changed state
+        """
+        status = state.status
+        if state.attempts > 1:
+            status = f"{status} (attempt {state.attempts})"
+        if state.error and state.finished:
+            status = f"{status}: {state.error}"
+        info = None
+        if state.status == "done":
+            info = self.endpoint.json_cache_manager.get_cache_info(state.name)
+            ui.notify(f"{state.name} updated in {state.duration:.1f} s")
+        if state.finished:
+            self.progress_bar.update(1)
+        delta = str(state.result) if state.result is not None else ""
+        self.update_cache_info_row(
+            info, cache_name=state.name, status=status, delta=delta
+        )
+
+    def update_cache_info_row(
+        self, info, cache_name: str = None, status: str = "", delta: str = ""
+    ):
+        """
+        show the given cache info replacing the former row of the cache
+
+        Args:
+            info: the cache info or None if not available
+            cache_name: the name of the cache - default: the name of the info
+            status: the refresh status
+            delta: the number of records added by a delta refresh
+        """
+        cache_name = cache_name or info.name
+        old_row = next(
+            (row for row in self.table.rows if row["cache_name"] == cache_name), {}
+        )
         row = {
-            "cache_name": info.name,
-            "size": info.size if info else "❓",
-            "entries": info.count if info else "❓",
+            "cache_name": cache_name,
+            "status": status,
+            "size": info.size if info else old_row.get("size", "❓"),
+            "entries": info.count if info else old_row.get("entries", "❓"),
+            "delta": delta,
             "last_accessed": info.last_accessed.strftime("%Y-%m-%d %H:%M:%S")
             if info and info.last_accessed
-            else "Never",
+            else old_row.get("last_accessed", "Never"),
         }
-        # Dynamically add each row to the table
-        self.table.add_rows(row)
+        if old_row:
+            self.table.rows[self.table.rows.index(old_row)] = row
+        else:
+            self.table.rows.append(row)
+        self.table.update()
 
     def update_cache_info(self):
         """Retrieves and dynamically adds cache status rows to the table."""
         self.table.rows.clear()
         for cache_name in self.endpoint.cache_functions.keys():
             info = self.endpoint.json_cache_manager.get_cache_info(cache_name)
-            self.update_cache_info_row(info)
+            self.update_cache_info_row(info, cache_name=cache_name)
@@ -0,0 +1,194 @@
+"""
+Created on 2024-03-18
+
+@author: wf
+"""
+import asyncio
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+
+@dataclass
+class CacheRefreshState:
+    """
+    the refresh state of a single cache
+    """
+
+    name: str
+    # pending, waiting, running, retrying, done, failed or skipped
+    status: str = "pending"
+    attempts: int = 0
+    duration: float = 0.0
+    error: Optional[str] = None
+    # the return value of the cache function
+    result: Any = None
+
+    @property
+    def finished(self) -> bool:
+        """
+        True if the refresh of the cache is over
+        """
+        return self.status in ("done", "failed", "skipped")
+
+
+class CacheRefreshScheduler:
+    """
+    refresh caches in parallel respecting their dependencies
+
+    the blocking cache functions are run in a thread pool. A cache is
+    refreshed after all caches it depends on are done - if one of them
+    failed it is skipped. Failed refreshes are retried individually with
+    an exponential backoff.
+    """
+
+    def __init__(
+        self,
+        cache_functions: Dict[str, Callable[..., object]],
+        dependencies: Optional[Dict[str, List[str]]] = None,
+        max_concurrency: int = 2,
+        max_retries: int = 2,
+        retry_delay: float = 5.0,
+        on_progress: Optional[Callable[[CacheRefreshState], None]] = None,
+        debug: bool = False,
+    ):
+        """
+        constructor
+
+        Args:
+            cache_functions(Dict[str, Callable]): the refresh functions by cache name - called with force_query
+            dependencies(Dict[str, List[str]]): the names of the caches each cache is built from
+            max_concurrency(int): the maximum number of caches to refresh at the same time
+            max_retries(int): the maximum number of retries of a failed refresh
+            retry_delay(float): the delay in seconds before the first retry - doubled for each further retry
+            on_progress(Callable): called in the event loop whenever the state of a cache changes
+            debug(bool): if True print the stack trace of failures
+        """
+        self.cache_functions = cache_functions
+        self.dependencies = {
+            name: [dep for dep in deps if dep in cache_functions]
+            for name, deps in (dependencies or {}).items()
+            if name in cache_functions
+        }
+        self.check_cycles()
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.on_progress = on_progress
+        self.debug = debug
+        self.states: Dict[str, CacheRefreshState] = {}
+
+    def check_cycles(self):
+        """
+        make sure my dependencies have no cycles
+
+        Raises:
+            ValueError: if there is a cycle
+        """
+        visiting = set()
+        visited = set()
+
+        def visit(name: str, path: List[str]):
+            if name in visiting:
+                raise ValueError(f"cyclic cache dependency {' -> '.join(path)}")
+            if name not in visited:
+                visiting.add(name)
+                for dep in self.dependencies.get(name, []):
+                    visit(dep, path + [dep])
+                visiting.remove(name)
+                visited.add(name)
+
+        for name in self.cache_functions:
+            visit(name, [name])
+
+    def set_status(self, state: CacheRefreshState, status: str):
+        """
+        set the status of the given cache state and report the change
+        """
+        state.status = status
+        if self.on_progress:
+            self.on_progress(state)
+
+    async def refresh(self, name: str, force_query: bool):
+        """
+        refresh the cache with the given name after its dependencies
+
+        Args:
+            name(str): the name of the cache
+            force_query(bool): passed to the cache function
+        """
+        state = self.states[name]
+        deps = self.dependencies.get(name, [])
+        if deps:
+            self.set_status(state, "waiting")
+            await asyncio.gather(*[self.tasks[dep] for dep in deps])
+            failed = [dep for dep in deps if self.states[dep].status != "done"]
+            if failed:
+                state.error = f"depends on {', '.join(failed)}"
+                self.set_status(state, "skipped")
+                return
+        loop = asyncio.get_running_loop()
+        while True:
+            async with self.semaphore:
+                state.attempts += 1
+                self.set_status(state, "running")
+                start_time = time.time()
+                try:
+                    state.result = await loop.run_in_executor(
+                        self.executor,
+                        lambda: self.cache_functions[name](force_query=force_query),
+                    )
+                    state.error = None
+                except Exception as ex:
+                    state.error = str(ex)
+                    if self.debug:
+                        traceback.print_exc()
+                state.duration += time.time() - start_time
+            if state.error is None:
+                self.set_status(state, "done")
+                return
+            if state.attempts > self.max_retries:
+                self.set_status(state, "failed")
+                return
+            self.set_status(state, "retrying")
+            # wait outside of the slot so that other caches can proceed
+            await asyncio.sleep(self.retry_delay * 2 ** (state.attempts - 1))
+
+    async def run(
+        self, force_query: bool = False, names: Optional[List[str]] = None
+    ) -> Dict[str, CacheRefreshState]:
+        """
+        refresh the given caches and the caches they depend on
+
+        Args:
+            force_query(bool): passed to the cache functions
+            names(List[str]): the names of the caches to refresh - default: all
+
+        Returns:
+            Dict[str, CacheRefreshState]: the final states by cache name
+        """
+        selected = []
+        pending = list(names or self.cache_functions.keys())
+        while pending:
+            name = pending.pop(0)
+            if name not in selected:
+                selected.append(name)
+                pending.extend(self.dependencies.get(name, []))
+        self.states = {
+            name: CacheRefreshState(name=name)
+            for name in self.cache_functions
+            if name in selected
+        }
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        try:
+            self.tasks = {
+                name: asyncio.ensure_future(self.refresh(name, force_query))
+                for name in self.states
+            }
+            await asyncio.gather(*self.tasks.values())
+        finally:
+            self.executor.shutdown(wait=True)
+        return self.states
@@ -0,0 +1,237 @@
+"""
+Created on 2024-03-20
+
+@author: wf
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional
+
+from sempubflow.cache_refresh import CacheRefreshScheduler, CacheRefreshState
+
+
+@dataclass
+class WarmCache:
+    """
+    a cache that is kept in memory by the CacheWarmer
+    """
+
+    name: str
+    # blocking function returning the value of the cache
+    loader: Callable[[], Any]
+    # seconds between refreshes - None to load once
+    refresh_interval: Optional[float] = None
+    # the names of the caches to load first
+    depends_on: List[str] = field(default_factory=list)
+    value: Any = None
+    # cold, loading, retrying, warm or failed
+    status: str = "cold"
+    load_count: int = 0
+    loaded_at: Optional[datetime] = None
+    duration: float = 0.0
+    next_refresh: Optional[float] = None
+    error: Optional[str] = None
+
+    def as_row(self) -> Dict[str, Any]:
+        """
+        get my state as a table row
+        """
+        next_refresh = (
+            datetime.fromtimestamp(self.next_refresh).strftime("%Y-%m-%d %H:%M:%S")
+            if self.next_refresh
+            else ""
+        )
+        row = {
+            "name": self.name,
+            "status": self.status,
+            "loads": self.load_count,
+            "loaded_at": self.loaded_at.strftime("%Y-%m-%d %H:%M:%S")
+            if self.loaded_at
+            else "",
+            "duration": f"{self.duration:.1f} s",
+            "next_refresh": next_refresh,
+            "error": self.error or "",
+        }
+        return row
+
+
+class CacheWarmer:
+    """
+    background loader that keeps caches of the webserver process in memory
+
+    all caches are loaded at startup in a thread pool so that the event loop
+    is not blocked - caches depending on other caches are loaded after them.
+    Afterwards each cache with a refresh interval is reloaded when it is due
+    while the former value is still served.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 2,
+        max_retries: int = 2,
+        retry_delay: float = 30.0,
+        check_interval: float = 60.0,
+    ):
+        """
+        constructor
+
+        Args:
+            max_concurrency(int): the maximum number of caches to load at the same time
+            max_retries(int): the maximum number of retries of a failed load
+            retry_delay(float): the delay in seconds before the first retry
+            check_interval(float): the maximum time in seconds between checks for due refreshes
+        """
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.check_interval = check_interval
+        self.caches: Dict[str, WarmCache] = {}
+        self.task: Optional[asyncio.Task] = None
+
+    def add(
+        self,
+        name: str,
+        loader: Callable[[], Any],
+        refresh_interval: Optional[float] = None,
+        depends_on: Optional[List[str]] = None,
+    ) -> WarmCache:
+        """
+        add a cache to keep warm
+
+        Args:
+            name(str): the name of the cache
+            loader(Callable): blocking function returning the value of the cache
+            refresh_interval(float): seconds between refreshes - None to load once
+            depends_on(List[str]): the names of the caches to load first
+
+        Returns:
+            WarmCache: the cache
+        """
+        cache = WarmCache(
+            name=name,
+            loader=loader,
+            refresh_interval=refresh_interval,
+            depends_on=depends_on or [],
+        )
+        self.caches[name] = cache
+        return cache
+
+    def get(self, name: str) -> Any:
+        """
+        get the value of the cache with the given name
+
+        Returns:
+            the value or None if the cache has not been loaded yet
+        """
+        cache = self.caches.get(name)
+        return cache.value if cache else None
+
+    def load(self, name: str, force_query: bool = False):
+        """
+        load the cache with the given name - called in a worker thread
+
+        Args:
+            name(str): the name of the cache
+            force_query(bool): ignored - needed for the CacheRefreshScheduler
+        """
+        cache = self.caches[name]
+        start_time = time.time()
+        value = cache.loader()
+        cache.duration = time.time() - start_time
+        cache.value = value
+        cache.load_count += 1
+        cache.loaded_at = datetime.now()
+        cache.error = None
+
+    def on_progress(self, state: CacheRefreshState):
+        """
+        update the state of a cache from the state of its load
+        """
+        cache = self.caches[state.name]
+        status_map = {"running": "loading", "done": "warm", "skipped": "failed"}
+        status = status_map.get(state.status, state.status)
+        if status == "waiting":
+            return
+        if status in ("warm", "failed"):
+            if status == "failed":
+                cache.error = state.error
+            if cache.refresh_interval:
+                cache.next_refresh = time.time() + cache.refresh_interval
+        if status == "failed" and cache.value is not None:
+            # keep serving the former value
+            status = "warm"
+        cache.status = status
+
+    async def load_caches(self, names: List[str], with_dependencies: bool):
+        """
+        load the given caches
+
+        Args:
+            names(List[str]): the names of the caches
+            with_dependencies(bool): if True load the dependencies first
+        """
+        scheduler = CacheRefreshScheduler(
+            cache_functions={name: partial(self.load, name) for name in self.caches},
+            dependencies={name: cache.depends_on for name, cache in self.caches.items()}
+            if with_dependencies
+            else {},
+            max_concurrency=self.max_concurrency,
+            max_retries=self.max_retries,
+            retry_delay=self.retry_delay,
+            on_progress=self.on_progress,
+        )
+        await scheduler.run(names=names)
+
+    def due_caches(self, now: float) -> List[str]:
+        """
+        get the names of the caches whose refresh is due
+        """
+        due = [
+            cache.name
+            for cache in self.caches.values()
+            if cache.next_refresh is not None and cache.next_refresh <= now
+        ]
+        return due
+
+    async def run(self):
+        """
+        load all caches and refresh them when due
+        """
+        await self.load_caches(list(self.caches), with_dependencies=True)
+        while True:
+            now = time.time()
+            due = self.due_caches(now)
+            if due:
+                await self.load_caches(due, with_dependencies=False)
+                continue
+            next_refreshes = [
+                cache.next_refresh
+                for cache in self.caches.values()
+                if cache.next_refresh is not None
+            ]
+            wait = min(next_refreshes, default=now + self.check_interval) - now
+            await asyncio.sleep(min(max(wait, 0.0), self.check_interval))
+
+    def start(self):
+        """
+        start warming in the background - must be called from within the event loop
+        """
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self.run())
+
+    def stop(self):
+        """
+        stop the background refreshes
+        """
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    def get_rows(self) -> List[Dict[str, Any]]:
+        """
+        get the states of my caches as table rows
+        """
+        return [cache.as_row() for cache in self.caches.values()]
@@ -0,0 +1,245 @@
+"""
+Created on 2024-03-19
+
+@author: wf
+"""
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+
+@dataclass
+class DeltaResult:
+    """
+    the result of an incremental cache refresh
+    """
+
+    cache_name: str
+    # the first volume number that was queried - None for a full query
+    start: Optional[int] = None
+    fetched: int = 0
+    added: int = 0
+    replaced: int = 0
+    total: int = 0
+    pages: int = 0
+    duration: float = 0.0
+
+    def __str__(self) -> str:
+        return f"+{self.added}"
+
+
+class DblpDeltaRefresh:
+    """
+    incremental refresh of the dblp caches that are keyed by volume number
+
+    CEUR-WS volumes are only appended so instead of re-running the full
+    query only the records of the last overlap cached volumes and of
+    newer volumes are fetched in windows of volume numbers (keyset pagination)
+    and merged into the existing cache
+    """
+
+    # the caches that can be refreshed incrementally with their query names and key fields
+    delta_caches: Dict[str, Tuple[str, str]] = {
+        "dblp/papers": ("CEUR-WS all Papers", "volume_number"),
+        "dblp/volumes": ("CEUR-WS all Volumes", "volume_number"),
+    }
+
+    def __init__(self, endpoint, overlap: int = 10, window: int = 100, debug=False):
+        """
+        constructor
+
+        Args:
+            endpoint: the DblpEndpoint with its sparql, qm and json_cache_manager
+            overlap(int): the number of cached volumes to fetch again for late changes
+            window(int): the number of volumes per query
+            debug(bool): if True show the queries
+        """
+        self.endpoint = endpoint
+        self.overlap = overlap
+        self.window = window
+        self.debug = debug
+
+    @classmethod
+    def supports(cls, cache_name: str) -> bool:
+        """
+        check whether the given cache can be refreshed incrementally
+        """
+        return cache_name in cls.delta_caches
+
+    @staticmethod
+    def split_prefixes(query: str) -> Tuple[str, str]:
+        """
+        split the given SPARQL query into its PREFIX declarations and the rest
+
+        Returns:
+            Tuple[str, str]: the prefixes and the query body
+        """
+        prefix_pattern = re.compile(r"^\s*PREFIX\s+\S*:\s*<[^>]*>\s*$", re.I | re.M)
+        prefixes = "\n".join(match.strip() for match in prefix_pattern.findall(query))
+        body = prefix_pattern.sub("", query).strip()
+        return prefixes, body
+
+    def key_pattern(self, query: str, key: str) -> re.Match:
+        """
+        find the triple pattern binding the given key variable
+        e.g. ?proceeding dblp:publishedInSeriesVolume ?volume_number.
+
+        Args:
+            query(str): the SPARQL query
+            key(str): the name of the key variable
+
+        Returns:
+            re.Match: the match of the triple pattern
+        """
+        match = re.search(rf"\S+\s+\S+\s+\?{key}\s*\.", query)
+        if match is None:
+            raise ValueError(f"no triple pattern binding ?{key} found")
+        return match
+
+    def with_xsd_prefix(self, query: str) -> str:
+        """
+        get the given query with the xsd prefix declared
+        """
+        prefixes, _body = self.split_prefixes(query)
+        if not re.search(r"^PREFIX\s+xsd:", prefixes, re.I | re.M):
+            query = f"PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>\n{query}"
+        return query
+
+    def window_query(self, query: str, key: str, lo: int, hi: int) -> str:
+        """
+        restrict the given query to the records with lo <= key < hi
+
+        the FILTER is injected right after the triple pattern binding the key
+        so that aggregating queries only group the records of the window.
+        The key is compared as xsd:integer since the volume numbers are
+        string literals in dblp
+
+        Args:
+            query(str): the full SPARQL query
+            key(str): the name of the key variable
+            lo(int): the first key
+            hi(int): the key after the last key
+
+        Returns:
+            str: the query for the window
+        """
+        match = self.key_pattern(query, key)
+        range_filter = (
+            f"\n    FILTER(xsd:integer(?{key}) >= {lo} && xsd:integer(?{key}) < {hi})"
+        )
+        window_query = query[: match.end()] + range_filter + query[match.end() :]
+        return self.with_xsd_prefix(window_query)
+
+    def max_key_query(self, query: str, key: str) -> str:
+        """
+        get the query for the maximum key of the given query
+
+        only the triple patterns up to the one binding the key are used
+
+        Args:
+            query(str): the full SPARQL query
+            key(str): the name of the key variable
+
+        Returns:
+            str: the query with a single max_key result
+        """
+        prefixes, _body = self.split_prefixes(query)
+        match = self.key_pattern(query, key)
+        where = re.search(r"WHERE\s*\{", query[: match.start()], re.I)
+        patterns = query[where.end() : match.end()]
+        max_key_query = self.with_xsd_prefix(
+            f"""{prefixes}
+SELECT (MAX(xsd:integer(?{key})) AS ?max_key) WHERE {{
+{patterns}
+}}"""
+        )
+        return max_key_query
+
+    def query_max_key(self, query: str, key: str) -> Optional[int]:
+        """
+        get the current maximum key of the given query from the endpoint
+
+        Returns:
+            int: the maximum key or None if there are no records
+        """
+        lod = self.query(self.max_key_query(query, key))
+        return self.key_of(lod[0], "max_key") if lod else None
+
+    @staticmethod
+    def key_of(record: Dict[str, Any], key: str) -> Optional[int]:
+        """
+        get the integer key of the given record
+        """
+        try:
+            return int(record.get(key))
+        except (TypeError, ValueError):
+            return None
+
+    def refresh(self, cache_name: str) -> DeltaResult:
+        """
+        refresh the given cache incrementally
+
+        Args:
+            cache_name(str): the name of the cache
+
+        Returns:
+            DeltaResult: the numbers of fetched, added and replaced records
+        """
+        start_time = time.time()
+        query_name, key = self.delta_caches[cache_name]
+        query = self.endpoint.qm.queriesByName[query_name].query
+        cache_manager = self.endpoint.json_cache_manager
+        try:
+            lod = cache_manager.load_lod(cache_name)
+        except Exception:
+            lod = None
+        result = DeltaResult(cache_name=cache_name)
+        keys = [self.key_of(record, key) for record in lod or []]
+        keys = [k for k in keys if k is not None]
+        if not keys:
+            # nothing to merge with - full query
+            new_records = self.query(query)
+            result.pages = 1
+            kept = []
+        else:
+            max_key = max(keys)
+            result.start = max(min(keys), max_key - self.overlap + 1)
+            # the windows up to the current last volume - gaps in the
+            # numbering give empty windows but do not end the refresh
+            remote_max_key = self.query_max_key(query, key)
+            last_key = max(max_key, remote_max_key or max_key)
+            new_records = []
+            lo = result.start
+            while lo <= last_key:
+                page = self.query(self.window_query(query, key, lo, lo + self.window))
+                result.pages += 1
+                new_records.extend(page)
+                lo += self.window
+            # only replace the cached volumes that have been fetched again -
+            # an empty answer for a volume must not drop its records
+            fetched_keys = {self.key_of(record, key) for record in new_records}
+            kept = [
+                record
+                for record in lod
+                if (self.key_of(record, key) or 0) < result.start
+                or self.key_of(record, key) not in fetched_keys
+            ]
+            result.replaced = len(lod) - len(kept)
+        new_records.sort(key=lambda record: self.key_of(record, key) or 0)
+        merged = kept + new_records
+        result.fetched = len(new_records)
+        result.added = len(merged) - len(lod or [])
+        result.total = len(merged)
+        cache_manager.store(cache_name, merged)
+        result.duration = time.time() - start_time
+        return result
+
+    def query(self, query: str) -> List[Dict[str, Any]]:
+        """
+        run the given query
+        """
+        if self.debug:
+            print(query)
+        lod = self.endpoint.sparql.queryAsListOfDicts(query)
+        return lod
@@ -3,8 +3,9 @@ Created on 2023-11-22
 
 @author: wf
 """
-from dataclasses import dataclass, field
-from typing import List, Optional
+import datetime
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, List, Optional
 
 from ngwidgets.yamlable import YamlAble
 
@@ -30,6 +31,32 @@ class Event(YamlAble["Event"]):
     title: Optional[str] = None
     subject: Optional[str] = None
 
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Event":
+        """
+        get an event from the given record e.g. the yaml answer of a llm
+
+        fields not in the event like the comments field the prompt allows
+        for are ignored and unquoted iso dates parsed by yaml are
+        converted back to strings
+
+        Args:
+            data(Dict[str, Any]): the event record
+
+        Returns:
+            Event: the event
+        """
+        if not isinstance(data, dict):
+            raise ValueError(f"no event record: {data}")
+        field_names = {event_field.name for event_field in fields(cls)}
+        values = {}
+        for key, value in data.items():
+            if key in field_names:
+                if isinstance(value, datetime.date):
+                    value = value.isoformat()
+                values[key] = value
+        return cls(**values)
+
 
 @dataclass
 class Events(YamlAble["Events"]):
@@ -0,0 +1,336 @@
+"""
+Created on 2024-03-10
+
+@author: wf
+"""
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from sempubflow.event import Event
+from sempubflow.event_extraction import EventExtractionRunner
+from sempubflow.event_store import EventStore
+from sempubflow.homepage import Homepage
+from sempubflow.volume_registry import VolumeRegistry
+
+
+class EventEvaluation:
+    """
+    evaluate extracted events against the CEUR-WS volume metadata
+
+    the scores are exact match counts per attribute and run. Values are
+    compared after normalization - stripped, lower case and the na
+    placeholder as missing value. For the events of volumes with a ground
+    truth value of the attribute:
+
+    - expected: all these events
+    - predicted: those with an extracted value
+    - correct: those with an extracted value equal to the ground truth value
+
+    precision is correct/predicted, recall is correct/expected and F1 their
+    harmonic mean - each 0.0 for a zero denominator. Events of volumes
+    without a ground truth value are ignored.
+
+    The former sklearn scores only used the events with both values,
+    compared them without normalization and averaged the precision and
+    recall of each distinct value weighted by its support - so the numbers
+    differ: an event with a missing extracted value now lowers the recall.
+    """
+
+    # event attribute -> volume attribute
+    attribute_map = {
+        "acronym": "acronym",
+        "city": "city",
+        "country": "country",
+        "end_date": "dateTo",
+        "region": "loc_region",
+        "start_date": "dateFrom",
+        "title": "title",
+        "year": "year",
+    }
+
+    def __init__(self, volumes: Optional[List[Dict]] = None, na: str = "N/A"):
+        """
+        constructor
+
+        Args:
+            volumes(List[Dict]): the volume records as ground truth - default: the shared VolumeRegistry
+            na(str): placeholder for missing values in the volume records
+        """
+        self.registry = (
+            VolumeRegistry.get_instance()
+            if volumes is None
+            else VolumeRegistry(volumes)
+        )
+        self.na = na
+
+    def ground_truth(
+        self, store: EventStore, event_attr: str, volume_attr: str
+    ) -> np.ndarray:
+        """
+        get the normalized codes of the ground truth values of the given volume
+        attribute for the rows of the given store
+
+        the volumes are looked up once per distinct volume number. The values
+        are encoded in the vocabulary of the given event attribute so that
+        they can be compared with the codes of the event column
+
+        Args:
+            store(EventStore): the events
+            event_attr(str): the event attribute to compare with
+            volume_attr(str): the volume attribute with the ground truth
+
+        Returns:
+            np.ndarray: the code of each row - 0 if there is no ground truth value
+        """
+        numbers, inverse = np.unique(store.volumes, return_inverse=True)
+        codes = np.zeros(len(numbers), np.int32)
+        for i, number in enumerate(numbers):
+            volume = self.registry.by_number(int(number))
+            if volume is not None:
+                codes[i] = store.norm_code(event_attr, volume.get(volume_attr))
+        return codes[inverse.reshape(-1)]
+
+    def count(
+        self,
+        store: EventStore,
+        attribute_map: Optional[Dict[str, str]] = None,
+        unique: bool = False,
+    ) -> Dict[str, np.ndarray]:
+        """
+        count the correct, predicted and expected values of all attributes of
+        all runs of the given store in one pass
+
+        a value is correct if it equals the volume value. Predicted values
+        are values extracted for volumes with a ground truth value, expected
+        values are the ground truth values of the volumes of the events
+
+        Args:
+            store(EventStore): the events
+            attribute_map(Dict[str, str]): event attribute -> volume attribute - default: my attribute map
+            unique(bool): if True only count the first event of each volume of each run
+
+        Returns:
+            Dict[str, np.ndarray]: attribute x run matrices of the counts of the
+            events, available (extracted) values, predicted, expected and correct values
+        """
+        attribute_map = attribute_map or self.attribute_map
+        rows = store.unique_rows() if unique else np.arange(len(store))
+        runs = store.runs[rows]
+        # attribute x row matrices of normalized codes
+        values = np.stack(
+            [store.column(event_attr)[rows] for event_attr in attribute_map]
+        ).reshape(len(attribute_map), len(rows))
+        truth = np.stack(
+            [
+                self.ground_truth(store, event_attr, volume_attr)[rows]
+                for event_attr, volume_attr in attribute_map.items()
+            ]
+        ).reshape(len(attribute_map), len(rows))
+        expected = truth > 0
+        predicted = expected & (values > 0)
+        flags = {
+            "events": np.ones_like(values, dtype=bool),
+            "available": values > 0,
+            "predicted": predicted,
+            "expected": expected,
+            "correct": predicted & (values == truth),
+        }
+        # sum up the flags by attribute and run
+        run_count = len(store.run_names)
+        bins = (
+            np.arange(len(attribute_map))[:, None] * run_count + runs[None, :]
+        ).reshape(-1)
+        size = len(attribute_map) * run_count
+        counts = {
+            name: np.bincount(bins, weights=flag.reshape(-1), minlength=size)
+            .reshape(len(attribute_map), run_count)
+            .astype(np.int64)
+            for name, flag in flags.items()
+        }
+        return counts
+
+    @staticmethod
+    def ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+        """
+        divide the given arrays elementwise with 0.0 for a zero denominator
+        """
+        return np.divide(
+            numerator,
+            denominator,
+            out=np.zeros(numerator.shape, dtype=float),
+            where=denominator > 0,
+        )
+
+    def scores(
+        self, counts: Dict[str, np.ndarray]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        get the precision, recall and F1 score matrices for the given counts
+        """
+        precision = self.ratio(counts["correct"], counts["predicted"])
+        recall = self.ratio(counts["correct"], counts["expected"])
+        f1 = self.ratio(2 * precision * recall, precision + recall)
+        return precision, recall, f1
+
+    def evaluate_store(
+        self,
+        store: EventStore,
+        attribute_map: Optional[Dict[str, str]] = None,
+        unique: bool = False,
+    ) -> Dict[str, Dict[str, Tuple[float, float, float]]]:
+        """
+        evaluate all mapped attributes of all runs of the given store - see count
+
+        Returns:
+            Dict[str, Dict[str, Tuple[float, float, float]]]: precision, recall and F1 score by run name and event attribute
+        """
+        attribute_map = attribute_map or self.attribute_map
+        precision, recall, f1 = self.scores(
+            self.count(store, attribute_map, unique=unique)
+        )
+        scores = {
+            run_name: {
+                event_attr: (
+                    float(precision[a, r]),
+                    float(recall[a, r]),
+                    float(f1[a, r]),
+                )
+                for a, event_attr in enumerate(attribute_map)
+            }
+            for r, run_name in enumerate(store.run_names)
+        }
+        return scores
+
+    def score_table(
+        self,
+        store: EventStore,
+        attribute_map: Optional[Dict[str, str]] = None,
+        unique: bool = True,
+    ) -> List[Dict]:
+        """
+        get the counts and scores of all mapped attributes of all runs of the given store
+
+        Returns:
+            List[Dict]: one row per run and attribute
+        """
+        attribute_map = attribute_map or self.attribute_map
+        counts = self.count(store, attribute_map, unique=unique)
+        precision, recall, f1 = self.scores(counts)
+        rows = []
+        for r, run_name in enumerate(store.run_names):
+            for a, event_attr in enumerate(attribute_map):
+                row = {"run": run_name, "attr": event_attr}
+                for name, count in counts.items():
+                    row[name] = int(count[a, r])
+                row["prec"] = float(precision[a, r])
+                row["recall"] = float(recall[a, r])
+                row["f1"] = float(f1[a, r])
+                rows.append(row)
+        return rows
+
+    def evaluate_runs(
+        self, runs: Dict[str, List[Event]]
+    ) -> Dict[str, Dict[str, Tuple[float, float, float]]]:
+        """
+        evaluate the events of the given runs
+
+        Args:
+            runs(Dict[str, List[Event]]): the events by run name
+
+        Returns:
+            Dict[str, Dict[str, Tuple[float, float, float]]]: precision, recall and F1 score by run name and event attribute
+        """
+        store = EventStore(na=self.na)
+        for run_name, events in runs.items():
+            store.add_events(events, run_name)
+        return self.evaluate_store(store)
+
+    def evaluate_attribute(
+        self, events: List[Event], event_attr: str, volume_attr: str
+    ) -> Tuple[float, float, float]:
+        """
+        calculate precision, recall and F1 score of the given attribute - see count
+
+        Returns:
+            Tuple[float, float, float]: precision, recall and F1 score
+        """
+        store = EventStore.from_events(events, na=self.na)
+        scores = self.evaluate_store(store, {event_attr: volume_attr})
+        return scores["events"][event_attr]
+
+    def evaluate(self, events: List[Event]) -> Dict[str, Tuple[float, float, float]]:
+        """
+        evaluate all mapped attributes
+
+        Returns:
+            Dict[str, Tuple[float, float, float]]: precision, recall and F1 score by event attribute
+        """
+        scores = self.evaluate_runs({"events": events})["events"]
+        return scores
+
+    def compare(
+        self, full_events: List[Event], compact_events: List[Event]
+    ) -> List[Dict]:
+        """
+        compare the scores of events extracted from the full and the compacted texts
+
+        Returns:
+            List[Dict]: one row per attribute with the scores and their changes
+        """
+        scores = self.evaluate_runs({"full": full_events, "compact": compact_events})
+        full_scores = scores["full"]
+        compact_scores = scores["compact"]
+        rows = []
+        for attr in self.attribute_map:
+            full_p, full_r, _full_f1 = full_scores[attr]
+            compact_p, compact_r, _compact_f1 = compact_scores[attr]
+            rows.append(
+                {
+                    "attr": attr,
+                    "prec full": full_p,
+                    "prec compact": compact_p,
+                    "Δ prec": compact_p - full_p,
+                    "recall full": full_r,
+                    "recall compact": compact_r,
+                    "Δ recall": compact_r - full_r,
+                }
+            )
+        return rows
+
+    def compare_compaction(
+        self,
+        llm,
+        homepages: List[Homepage],
+        output_dir: str,
+        token_budget: int,
+        **runner_kwargs,
+    ) -> Tuple[List[Dict], Dict]:
+        """
+        extract the events of the given homepages with the full and the
+        compacted texts and compare the results
+
+        Args:
+            llm(LLM): the large language model to use
+            homepages(List[Homepage]): the homepages to extract
+            output_dir(str): the directory for the events files of both runs - reruns resume
+            token_budget(int): the prompt token budget of the compacted run
+            **runner_kwargs: further EventExtractionRunner arguments
+
+        Returns:
+            Tuple[List[Dict], Dict]: the comparison rows and the prompt token usage of both runs
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        runs = {}
+        tokens = {}
+        for name, budget in [("full", None), ("compact", token_budget)]:
+            output_path = os.path.join(output_dir, f"events-{name}.yaml")
+            runner = EventExtractionRunner(
+                llm, output_path, token_budget=budget, **runner_kwargs
+            )
+            runner.run(homepages)
+            runs[name] = runner.load_events()
+            tokens[name] = runner.prompt_tokens
+        rows = self.compare(runs["full"], runs["compact"])
+        return rows, tokens
@@ -0,0 +1,310 @@
+"""
+Created on 2024-03-09
+
+@author: wf
+"""
+import asyncio
+import dataclasses
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Set
+
+import yaml
+from ngwidgets.llm import LLM
+
+from sempubflow.event import Event
+from sempubflow.event_info import EventInfo
+from sempubflow.homepage import Homepage
+from sempubflow.llm_cache import LlmResponseCache
+from sempubflow.snapshot_store import SnapshotStore
+from sempubflow.text_compactor import TextCompactor
+
+
+class TokenBucket:
+    """
+    token bucket refilled continuously at a given rate per minute
+    """
+
+    def __init__(self, per_minute: float):
+        """
+        constructor
+
+        Args:
+            per_minute(float): the number of tokens per minute - also the capacity
+        """
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self.timestamp = time.monotonic()
+
+    def refill(self):
+        """
+        add the tokens for the time passed since the last refill
+        """
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.timestamp) * self.rate
+        )
+        self.timestamp = now
+
+    async def acquire(self, amount: float = 1):
+        """
+        wait until the given amount of tokens is available and take it
+
+        Args:
+            amount(float): the number of tokens - capped at the capacity
+        """
+        amount = min(amount, self.capacity)
+        while True:
+            self.refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return
+            await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+class EventExtractionRunner:
+    """
+    batch extraction of events from homepage texts with a large language model
+
+    the requests run concurrently within request and token per minute limits.
+    Each extracted event is appended to a YAML file loadable as Events as soon
+    as it is available and volumes already in the file are skipped on a rerun
+    """
+
+    def __init__(
+        self,
+        llm,
+        output_path: str,
+        max_concurrency: int = 4,
+        requests_per_minute: float = 60,
+        tokens_per_minute: float = 90000,
+        max_retries: int = 5,
+        retry_delay: float = 2.0,
+        model: str = LLM.DEFAULT_MODEL,
+        temperature: float = 0.0,
+        llm_cache: Optional[LlmResponseCache] = None,
+        snapshot_store: Optional[SnapshotStore] = None,
+        token_budget: Optional[int] = None,
+        progress_bar=None,
+        debug: bool = False,
+    ):
+        """
+        constructor
+
+        Args:
+            llm(LLM): the large language model to use
+            output_path(str): the YAML file to append the events to
+            max_concurrency(int): maximum number of requests in flight
+            requests_per_minute(float): the request rate limit
+            tokens_per_minute(float): the token rate limit
+            max_retries(int): maximum number of retries after a rate limit error
+            retry_delay(float): the initial delay in seconds before a retry - doubled per retry
+            model(str): the name of the model
+            temperature(float): the sampling temperature
+            llm_cache(LlmResponseCache): optional cache for the responses of the llm
+            snapshot_store(SnapshotStore): optional raw html snapshots for homepages without text
+            token_budget(int): optional maximum number of prompt tokens per request
+            progress_bar: optional tqdm progress bar to update per homepage
+            debug(bool): if True show errors
+        """
+        self.llm = llm
+        self.output_path = output_path
+        self.max_concurrency = max_concurrency
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.model = model
+        self.temperature = temperature
+        self.llm_cache = llm_cache
+        self.snapshot_store = snapshot_store
+        self.token_budget = token_budget
+        self.progress_bar = progress_bar
+        self.debug = debug
+        # for the token estimation of the prompts
+        self.compactor = TextCompactor()
+        self.extracted = 0
+        self.failed = 0
+        self.retries = 0
+        # estimated number of prompt tokens sent
+        self.prompt_tokens = 0
+
+    @staticmethod
+    def is_rate_limit_error(ex: Exception) -> bool:
+        """
+        check whether the given exception signals a rate limit
+        e.g. openai.RateLimitError or an HTTP 429 response
+        """
+        if type(ex).__name__ == "RateLimitError":
+            return True
+        status_code = getattr(ex, "status_code", None)
+        if status_code is None:
+            status_code = getattr(getattr(ex, "response", None), "status_code", None)
+        return status_code == 429
+
+    def load_events(self) -> List[Event]:
+        """
+        load the events of my output file
+
+        Returns:
+            List[Event]: the events extracted so far
+        """
+        events = []
+        if os.path.isfile(self.output_path):
+            with open(self.output_path, "r") as yaml_file:
+                record = yaml.safe_load(yaml_file) or {}
+            for event_record in record.get("events") or []:
+                events.append(Event(**event_record))
+        return events
+
+    def load_done_volumes(self) -> Set[int]:
+        """
+        get the volume numbers of the events of a former partial run
+
+        Returns:
+            Set[int]: the volume numbers already in my output file
+        """
+        volumes = {event.volume for event in self.load_events()}
+        return volumes
+
+    def append_event(self, event: Event):
+        """
+        append the given event to my output file
+
+        Args:
+            event(Event): the event
+        """
+        record = {k: v for k, v in dataclasses.asdict(event).items() if v is not None}
+        entry = yaml.safe_dump([record], allow_unicode=True, sort_keys=False)
+        with open(self.output_path, "a") as yaml_file:
+            if yaml_file.tell() == 0:
+                yaml_file.write("events:\n")
+            # write the entry at once so that a crash can not leave half of it
+            yaml_file.write(entry)
+            yaml_file.flush()
+
+    def get_text(self, homepage: Homepage) -> Optional[str]:
+        """
+        get the cached text of the given homepage or fetch it
+        """
+        text = homepage.text
+        if text is None:
+            text = homepage.get_text(snapshot_store=self.snapshot_store)
+        return text
+
+    async def extract(self, homepage: Homepage) -> Optional[Event]:
+        """
+        extract the event of a single homepage
+
+        Args:
+            homepage(Homepage): the homepage
+
+        Returns:
+            Event: the event or None if the extraction failed
+        """
+        event = None
+        try:
+            async with self.semaphore:
+                loop = asyncio.get_running_loop()
+                event_info = EventInfo(
+                    self.llm,
+                    debug=self.debug,
+                    snapshot_store=self.snapshot_store,
+                    llm_cache=self.llm_cache,
+                    token_budget=self.token_budget,
+                )
+                event_info.homepage = homepage
+                event_info.text = await loop.run_in_executor(
+                    self.executor, self.get_text, homepage
+                )
+                if not event_info.text:
+                    raise ValueError(f"no text for {homepage.url}")
+                # the compacted text is computed once for all attempts
+                prompt_text = await loop.run_in_executor(
+                    self.executor, event_info.get_prompt_text
+                )
+                tokens = self.compactor.estimate_tokens(
+                    event_info.prompt_prefix
+                ) + self.compactor.estimate_tokens(prompt_text)
+                self.prompt_tokens += tokens
+                # cached answers do not use up the rate limits
+                yaml_str = await loop.run_in_executor(
+                    self.executor,
+                    event_info.get_cached_answer,
+                    self.model,
+                    self.temperature,
+                    prompt_text,
+                )
+                delay = self.retry_delay
+                attempts = 0 if yaml_str is not None else self.max_retries + 1
+                for attempt in range(attempts):
+                    await self.request_bucket.acquire(1)
+                    await self.token_bucket.acquire(tokens)
+                    try:
+                        yaml_str = await loop.run_in_executor(
+                            self.executor,
+                            event_info.ask_llm,
+                            self.model,
+                            self.temperature,
+                            prompt_text,
+                        )
+                        break
+                    except Exception as ex:
+                        if (
+                            not self.is_rate_limit_error(ex)
+                            or attempt == self.max_retries
+                        ):
+                            raise
+                        self.retries += 1
+                        await asyncio.sleep(delay)
+                        delay *= 2
+                if yaml_str is None:
+                    raise ValueError("llm not available")
+            event = Event.from_yaml(yaml_str)
+            event.volume = homepage.volume
+            self.append_event(event)
+            self.extracted += 1
+        except Exception as ex:
+            self.failed += 1
+            if self.debug:
+                print(f"{homepage.volume}:{homepage.url} {str(ex)}", file=sys.stderr)
+        if self.progress_bar:
+            self.progress_bar.update(1)
+        return event
+
+    async def run_async(self, homepages: List[Homepage]) -> List[Event]:
+        """
+        extract the events of the given homepages skipping the volumes
+        already in my output file
+
+        Args:
+            homepages(List[Homepage]): the homepages
+
+        Returns:
+            List[Event]: the newly extracted events
+        """
+        done_volumes = self.load_done_volumes()
+        todo = [hp for hp in homepages if hp.volume not in done_volumes]
+        if self.progress_bar:
+            self.progress_bar.total = len(todo)
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as self.executor:
+            results = await asyncio.gather(*[self.extract(hp) for hp in todo])
+        events = [event for event in results if event is not None]
+        return events
+
+    def run(self, homepages: List[Homepage]) -> List[Event]:
+        """
+        extract the events from synchronous code
+
+        Args:
+            homepages(List[Homepage]): the homepages
+
+        Returns:
+            List[Event]: the newly extracted events
+        """
+        events = asyncio.run(self.run_async(homepages))
+        return events
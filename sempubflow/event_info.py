@@ -3,10 +3,15 @@ Created on 2023-06-22
 
 @author: wf
 """
+from typing import Optional
+
 from ngwidgets.llm import LLM
 
 from sempubflow.event import Event
 from sempubflow.homepage import Homepage
+from sempubflow.llm_cache import LlmResponseCache
+from sempubflow.snapshot_store import SnapshotStore
+from sempubflow.text_compactor import TextCompactor
 
 
 class EventInfo:
@@ -14,14 +19,27 @@ class EventInfo:
     check the event metadata
     """
 
-    def __init__(self, llm, debug: bool = False):
+    def __init__(
+        self,
+        llm,
+        debug: bool = False,
+        snapshot_store: SnapshotStore = None,
+        llm_cache: LlmResponseCache = None,
+        token_budget: Optional[int] = None,
+    ):
         """
         construct me with the given llm
 
         Args:
             llm(LLM): the large language model to use
+            snapshot_store(SnapshotStore): optional raw html snapshots to replay the homepage texts from
+            llm_cache(LlmResponseCache): optional cache for the responses of the llm
+            token_budget(int): optional maximum number of prompt tokens - the homepage text is compacted to fit
         """
         self.llm = llm
+        self.snapshot_store = snapshot_store
+        self.llm_cache = llm_cache
+        self.token_budget = token_budget
         self.text = None
         self.homepage = None
         self.debug = debug
@@ -116,12 +134,81 @@ Extract as instructed from the following homepage text:
         get the metadata for the given homepage
         """
         self.homepage = homepage
-        self.text = self.homepage.get_text()
+        self.text = self.homepage.get_text(snapshot_store=self.snapshot_store)
         event = None
-        if self.llm.available():
-            prompt_text = f"{self.prompt_prefix}\n{self.text}"
-            yaml_str = self.llm.ask(prompt_text, model=model, temperature=temperature)
+        yaml_str = self.ask_llm(model=model, temperature=temperature)
+        if yaml_str is not None:
             if self.debug:
                 print(f"{self.homepage.volume}:\n{yaml_str}")
             event = Event.from_yaml(yaml_str)
         return event
+
+    def get_prompt_text(self) -> Optional[str]:
+        """
+        get my text compacted to what is left of my token budget after the prompt prefix
+
+        Returns:
+            str: the text to send with the prompt
+        """
+        text = self.text
+        if self.token_budget is not None and text:
+            compactor = TextCompactor()
+            text_budget = self.token_budget - compactor.estimate_tokens(
+                self.prompt_prefix
+            )
+            text = compactor.compact(text, max(text_budget, 0))
+        return text
+
+    def get_cached_answer(
+        self,
+        model: str = LLM.DEFAULT_MODEL,
+        temperature: float = 0.0,
+        text: Optional[str] = None,
+    ) -> Optional[str]:
+        """
+        get the cached answer of the llm for my text without asking the llm
+
+        Args:
+            model(str): the name of the model
+            temperature(float): the sampling temperature
+            text(str): the text to send if already computed - default: get_prompt_text()
+
+        Returns:
+            str: the yaml answer or None if there is no cache or the answer is not cached
+        """
+        if self.llm_cache is None:
+            return None
+        if text is None:
+            text = self.get_prompt_text()
+        key = self.llm_cache.key_of(self.prompt_prefix, text, model, temperature)
+        return self.llm_cache.get(key)
+
+    def ask_llm(
+        self,
+        model: str = LLM.DEFAULT_MODEL,
+        temperature: float = 0.0,
+        text: Optional[str] = None,
+    ) -> Optional[str]:
+        """
+        ask the llm for the event signature of my text
+
+        Args:
+            model(str): the name of the model
+            temperature(float): the sampling temperature
+            text(str): the text to send if already computed - default: get_prompt_text()
+
+        Returns:
+            str: the yaml answer or None if the llm is not available
+            and the answer is not cached
+        """
+        yaml_str = None
+        if text is None:
+            text = self.get_prompt_text()
+        if self.llm_cache is not None:
+            yaml_str = self.llm_cache.ask(
+                self.llm, self.prompt_prefix, text, model, temperature
+            )
+        elif self.llm.available():
+            prompt_text = f"{self.prompt_prefix}\n{text}"
+            yaml_str = self.llm.ask(prompt_text, model=model, temperature=temperature)
+        return yaml_str
@@ -0,0 +1,235 @@
+"""
+Created on 2024-03-22
+
+@author: wf
+"""
+import dataclasses
+import glob
+import os
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import numpy as np
+import yaml
+
+from sempubflow.event import Event
+from sempubflow.volume_registry import VolumeRegistry
+
+# the libyaml based loader is much faster if available
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+class EventStore:
+    """
+    columnar store of the events of one or more extraction runs
+
+    each event is a row with its run id, its volume number and one
+    dictionary encoded column per Event attribute. Code 0 stands for
+    a missing value. The normalized values used for comparisons have
+    their own codes so that whole columns can be compared as integer
+    arrays.
+    """
+
+    attributes = [field.name for field in dataclasses.fields(Event)]
+
+    def __init__(self, na: str = "N/A"):
+        """
+        constructor
+
+        Args:
+            na(str): placeholder for missing values
+        """
+        self.na = na
+        self.run_names: List[str] = []
+        self.runs = np.zeros(0, dtype=np.int32)
+        self.volumes = np.zeros(0, dtype=np.int64)
+        self.codes = {attr: np.zeros(0, dtype=np.int32) for attr in self.attributes}
+        # raw value -> code and code -> raw value by attribute
+        self.vocabularies: Dict[str, Dict[Any, int]] = {
+            attr: {} for attr in self.attributes
+        }
+        self.values: Dict[str, List[Any]] = {attr: [None] for attr in self.attributes}
+        # normalized value -> normalized code by attribute
+        self.norm_vocabularies: Dict[str, Dict[str, int]] = {
+            attr: {} for attr in self.attributes
+        }
+
+    @classmethod
+    def from_events(
+        cls, events: Iterable[Event], run_name: str = "events", na: str = "N/A"
+    ) -> "EventStore":
+        """
+        get a store for the given events of a single run
+        """
+        store = cls(na=na)
+        store.add_events(events, run_name)
+        return store
+
+    @classmethod
+    def from_files(
+        cls,
+        paths: Union[str, Iterable[str]],
+        run_name: Optional[str] = None,
+        na: str = "N/A",
+    ) -> "EventStore":
+        """
+        get a store for the events of the given YAML files
+
+        Args:
+            paths: a glob pattern or the paths of the events files
+            run_name(str): the run of all events - default: one run per file named by the file
+            na(str): placeholder for missing values
+
+        Returns:
+            EventStore: the store
+        """
+        if isinstance(paths, str):
+            paths = sorted(glob.glob(paths))
+        store = cls(na=na)
+        for path in paths:
+            store.add_file(path, run_name)
+        return store
+
+    def __len__(self) -> int:
+        return len(self.volumes)
+
+    def normalize(self, value) -> Optional[str]:
+        """
+        normalize the given value for comparison
+
+        Returns:
+            str: the lower case stripped string or None for missing values
+        """
+        if value is None:
+            return None
+        value = str(value).strip().lower()
+        if not value or value == self.na.lower():
+            return None
+        return value
+
+    def encode(self, attr: str, value) -> int:
+        """
+        get the code of the given raw value of the given attribute
+        """
+        if value is None:
+            return 0
+        if isinstance(value, (list, dict)):
+            value = str(value)
+        vocabulary = self.vocabularies[attr]
+        code = vocabulary.get(value)
+        if code is None:
+            code = len(self.values[attr])
+            vocabulary[value] = code
+            self.values[attr].append(value)
+        return code
+
+    def norm_code(self, attr: str, value) -> int:
+        """
+        get the code of the normalized value of the given value of the given attribute
+
+        Returns:
+            int: the code or 0 for missing values
+        """
+        norm_value = self.normalize(value)
+        if norm_value is None:
+            return 0
+        norm_vocabulary = self.norm_vocabularies[attr]
+        return norm_vocabulary.setdefault(norm_value, len(norm_vocabulary) + 1)
+
+    def run_id(self, run_name: str) -> int:
+        """
+        get the id of the run with the given name - adding the run if needed
+        """
+        if run_name not in self.run_names:
+            self.run_names.append(run_name)
+        return self.run_names.index(run_name)
+
+    def add_records(self, records: Iterable[Dict[str, Any]], run_name: str) -> int:
+        """
+        add the given event records of the given run
+
+        Args:
+            records(Iterable[Dict]): the event records
+            run_name(str): the name of the run
+
+        Returns:
+            int: the number of records added
+        """
+        volumes = []
+        codes = {attr: [] for attr in self.attributes}
+        for record in records:
+            volume = VolumeRegistry.as_int(record.get("volume"))
+            volumes.append(-1 if volume is None else volume)
+            for attr in self.attributes:
+                codes[attr].append(self.encode(attr, record.get(attr)))
+        count = len(volumes)
+        run_id = self.run_id(run_name)
+        self.runs = np.concatenate([self.runs, np.full(count, run_id, np.int32)])
+        self.volumes = np.concatenate([self.volumes, np.array(volumes, np.int64)])
+        for attr in self.attributes:
+            self.codes[attr] = np.concatenate(
+                [self.codes[attr], np.array(codes[attr], np.int32)]
+            )
+        return count
+
+    def add_events(self, events: Iterable[Event], run_name: str) -> int:
+        """
+        add the given events of the given run
+        """
+        return self.add_records((event.__dict__ for event in events), run_name)
+
+    def add_file(self, path: str, run_name: Optional[str] = None) -> int:
+        """
+        add the events of the given YAML file
+
+        Args:
+            path(str): the path of the events file
+            run_name(str): the name of the run - default: the name of the file
+
+        Returns:
+            int: the number of events added
+        """
+        if run_name is None:
+            run_name = os.path.splitext(os.path.basename(path))[0]
+        with open(path, "r") as yaml_file:
+            record = yaml.load(yaml_file, Loader=YamlLoader) or {}
+        return self.add_records(record.get("events") or [], run_name)
+
+    def column(self, attr: str) -> np.ndarray:
+        """
+        get the normalized codes of the given attribute
+
+        the normalization is done once per distinct value
+
+        Returns:
+            np.ndarray: the normalized code of each row - 0 for missing values
+        """
+        norm_map = np.array(
+            [self.norm_code(attr, value) for value in self.values[attr]], np.int32
+        )
+        return norm_map[self.codes[attr]]
+
+    def unique_rows(self) -> np.ndarray:
+        """
+        get the rows of the first event of each volume of each run
+
+        Returns:
+            np.ndarray: the row numbers ordered by run and volume
+        """
+        keys = np.stack([self.runs.astype(np.int64), self.volumes], axis=1)
+        _keys, rows = np.unique(keys, axis=0, return_index=True)
+        return rows
+
+    def rows_of_volume(self, volume: int) -> np.ndarray:
+        """
+        get the rows of the events of the given volume
+        """
+        return np.flatnonzero(self.volumes == volume)
+
+    def get_event(self, row: int) -> Event:
+        """
+        get the event of the given row
+        """
+        fields = {
+            attr: self.values[attr][self.codes[attr][row]] for attr in self.attributes
+        }
+        return Event(**fields)
@@ -5,16 +5,19 @@ Created on 2023-06-19
 """
 import os
 import sys
-import urllib.request
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional
 
-from bs4 import BeautifulSoup
 from ngwidgets.yamlable import YamlAble
 from tabulate import tabulate
 from tqdm import tqdm
 
+from sempubflow.html_text import HtmlTextExtractor, extract_text
+from sempubflow.http_client import HttpClient
+from sempubflow.snapshot_store import SnapshotStore
+from sempubflow.volume_registry import VolumeRegistry
+
 
 @dataclass
 class Homepage(YamlAble["Homepage"]):
@@ -27,79 +30,251 @@ class Homepage(YamlAble["Homepage"]):
     text: Optional[str] = None
     available: bool = False
     content_len: Optional[int] = None
-    availability_check: datetime = datetime.now()
+    availability_check: datetime = field(default_factory=datetime.now)
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    # number of consecutive failed checks
+    failure_count: int = 0
+    # content hash of the last raw html snapshot
+    html_hash: Optional[str] = None
+    # the charset declared in the Content-Type header of the last read
+    charset: Optional[str] = None
 
     def __post_init__(self):
         # Strip leading and trailing whitespace from the URL
         self.read_timeout = 3.0
+        # maximum number of html bytes to read
+        self.max_html_bytes = 2 * 1024 * 1024
+        self.truncated = False
+        # True if the last check found the page unchanged via conditional request
+        self.not_modified = False
         if self.url:
             self.url = self.url.strip()
 
-    def check_url(self, timeout: float = 0.5) -> bool:
+    def get_conditional_headers(self) -> Dict[str, str]:
+        """
+        get the headers for a conditional request based on
+        the validators of my last successful check
+
+        Returns:
+            Dict[str, str]: If-None-Match and/or If-Modified-Since headers
+        """
+        headers = {}
+        if self.available:
+            if self.etag:
+                headers["If-None-Match"] = self.etag
+            if self.last_modified:
+                headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def open_url(self, method: str, timeout: float, headers: Dict[str, str]):
+        """
+        open my url with the given method and headers
+
+        Args:
+            method (str): the HTTP method e.g. HEAD or GET
+            timeout (float): The timeout in seconds.
+            headers (Dict[str, str]): the request headers
+
+        Returns:
+            requests.Response: the response - the body is not read
+        """
+        # HEAD requests are kept as HEAD requests when following a redirect
+        response = HttpClient.get_instance("probe").request(
+            method,
+            self.url,
+            headers=headers,
+            timeout=timeout,
+            allow_redirects=True,
+            stream=method != "HEAD",
+        )
+        return response
+
+    def update_from_response(self, response):
+        """
+        update my availability, content length and validators from the given response headers
+
+        Args:
+            response: the HEAD or (ranged) GET response
+        """
+        code = response.status_code
+        self.available = code in (200, 206)
+        if self.available:
+            content_len = None
+            content_range = response.headers.get("Content-Range")
+            if code == 206 and content_range and "/" in content_range:
+                # e.g. bytes 0-0/12345
+                content_len = content_range.rsplit("/", 1)[1]
+            elif code == 200:
+                content_len = response.headers.get("Content-Length")
+            if content_len is not None and content_len.isdigit():
+                self.content_len = int(content_len)
+            else:
+                self.content_len = None
+            self.etag = response.headers.get("ETag")
+            self.last_modified = response.headers.get("Last-Modified")
+        else:
+            self.content_len = None
+
+    def check_url(
+        self, timeout: float = 0.5, head_first: bool = True, revalidate: bool = True
+    ) -> bool:
         """
         Check the URL.
 
+        A HEAD request is tried first. If the server does not support HEAD
+        a GET for the first byte only is used instead. If revalidate is set and
+        validators of a former successful check are known a conditional request
+        is sent and an unchanged page is not transferred again.
+
         Args:
             timeout (float): The timeout in seconds.
+            head_first (bool): if True try a HEAD request first
+            revalidate (bool): if True send If-None-Match/If-Modified-Since headers
 
         Returns:
             bool: True if the URL is reachable, False otherwise.
         """
+        self.not_modified = False
         # Skip if the URL is empty
         if not self.url:
             return False
 
+        headers = self.get_conditional_headers() if revalidate else {}
         try:
-            response = urllib.request.urlopen(self.url, timeout=timeout)
-            self.available = response.getcode() == 200
-
-            # Get content length if available
-            if self.available:
-                self.content_len = response.headers.get("Content-Length")
-                if self.content_len is not None:
-                    self.content_len = int(self.content_len)
-
+            response = None
+            if head_first:
+                response = self.open_url("HEAD", timeout, headers)
+                if response.status_code >= 400:
+                    # e.g. 405 Method Not Allowed - fall back to GET
+                    response.close()
+                    response = None
+            if response is None:
+                ranged_headers = {**headers, "Range": "bytes=0-0"}
+                response = self.open_url("GET", timeout, ranged_headers)
+            with response:
+                if response.status_code == 304:
+                    # unchanged since the last check - keep content length and validators
+                    self.not_modified = True
+                    self.available = True
+                else:
+                    self.update_from_response(response)
+                if response.status_code == 206:
+                    # read the single byte so that the connection is kept alive
+                    response.raw.read()
         except Exception as _ex:
             self.available = False
             self.content_len = None
 
+        self.availability_check = datetime.now()
+        self.failure_count = 0 if self.available else self.failure_count + 1
         return self.available
 
-    def read(self) -> str:
+    def iter_html(
+        self, max_bytes: Optional[int] = None, chunk_size: int = 64 * 1024
+    ) -> Iterator[bytes]:
+        """
+        stream my html in chunks and stop after max_bytes
+
+        sets my charset from the Content-Type header and my truncated flag
+
+        Args:
+            max_bytes (int): maximum number of bytes to read - default: my max_html_bytes
+            chunk_size (int): the size of the chunks to read
+
+        Yields:
+            bytes: the next chunk of html
+        """
+        max_bytes = max_bytes or self.max_html_bytes
+        self.truncated = False
+        http_client = HttpClient.get_instance()
+        with http_client.get(
+            self.url, timeout=self.read_timeout, stream=True
+        ) as response:
+            response.raise_for_status()
+            self.charset = HttpClient.charset_of(response)
+            byte_count = 0
+            for chunk in response.iter_content(chunk_size):
+                remaining = max_bytes - byte_count
+                if len(chunk) > remaining:
+                    self.truncated = True
+                    chunk = chunk[:remaining]
+                if chunk:
+                    byte_count += len(chunk)
+                    yield chunk
+                if self.truncated:
+                    break
+
+    def read(self, max_bytes: Optional[int] = None) -> bytes:
         """
         read my html
+
+        Args:
+            max_bytes (int): maximum number of bytes to read - default: my max_html_bytes
         """
-        self.html = urllib.request.urlopen(self.url, timeout=self.read_timeout).read()
+        self.html = b"".join(self.iter_html(max_bytes))
         return self.html
 
-    def get_text(self) -> str:
+    def snapshot(
+        self, snapshot_store: SnapshotStore, max_bytes: Optional[int] = None
+    ) -> str:
+        """
+        read my html and keep it in the given snapshot store
+
+        Args:
+            snapshot_store (SnapshotStore): the store for the raw html
+            max_bytes (int): maximum number of bytes to read - default: my max_html_bytes
+
+        Returns:
+            str: the content hash of the snapshot
+        """
+        html = self.read(max_bytes)
+        self.html_hash = snapshot_store.put(html)
+        return self.html_hash
+
+    def get_text(
+        self,
+        max_bytes: Optional[int] = None,
+        parser: Optional[str] = None,
+        snapshot_store: Optional[SnapshotStore] = None,
+    ) -> str:
         """
         get the text from my url
+
+        the html is streamed into an incremental parser and
+        reading stops after max_bytes. With a snapshot store the text is
+        replayed from my last snapshot if there is one and otherwise the
+        downloaded html is kept as a new snapshot
+
+        Args:
+            max_bytes (int): maximum number of bytes to read - default: my max_html_bytes
+            parser (str): "lxml" or "bs4" - default: "lxml" if available
+            snapshot_store (SnapshotStore): optional store for the raw html
         """
         text = None
-        soup = None
         try:
-            self.read()
-            if not text:
-                soup = BeautifulSoup(self.html, features="html.parser")
-
-                # kill all script and style elements
-                for script in soup(["script", "style"]):
-                    script.extract()  # rip it out
+            if snapshot_store is not None and snapshot_store.has(self.html_hash):
+                text = snapshot_store.get_text(
+                    self.html_hash,
+                    charset=self.charset,
+                    max_bytes=max_bytes,
+                    parser=parser,
+                )
+            elif snapshot_store is not None:
+                self.snapshot(snapshot_store, max_bytes)
+                text = extract_text(self.html, charset=self.charset, parser=parser)
+            else:
+                chunks = self.iter_html(max_bytes)
+                first_chunk = next(chunks, b"")
+                extractor = HtmlTextExtractor(charset=self.charset, parser=parser)
+                extractor.feed(first_chunk)
+                for chunk in chunks:
+                    extractor.feed(chunk)
+                text = extractor.close()
         except Exception as ex:
             # shall we log the exception here?
             print(str(ex), file=sys.stderr)
             pass
-
-        if soup and soup.body:
-            # get text
-            text = soup.body.get_text()
-            # break into lines and remove leading and trailing space on each
-            lines = (line.strip() for line in text.splitlines())
-            # break multi-headlines into a line each
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            # drop blank lines
-            text = "\n".join(chunk for chunk in chunks if chunk)
         return text
 
 
@@ -196,36 +371,58 @@ class HomepageChecker:
 
     def __init__(
         self,
-        volumes: List[Dict],
+        volumes: Optional[List[Dict]] = None,
         debug: bool = False,
         cache_file: str = None,
     ):
         """Initialize the HomepageChecker with caching mechanism.
 
         Args:
-            volumes (List[Dict]): A list of volume dictionaries.
+            volumes (List[Dict]): A list of volume dictionaries - default: the volumes
+                with a homepage of the shared VolumeRegistry.
             debug (bool): If True, shows detailed debug information.
-            cache_file (str): The filename for storing cache data.
+            cache_file (str): The filename for storing cache data - a file ending
+                with .db is used as a SQLite HomepageStore otherwise as a YAML file.
         """
-        self.volumes = [v for v in volumes if "homepage" in v]
+        if volumes is None:
+            self.volumes = VolumeRegistry.get_instance().select(has_homepage=True)
+        else:
+            self.volumes = [v for v in volumes if "homepage" in v]
         self.debug = debug
         self.results = []
         self.set_infos = []
         self.cache_file = cache_file or os.path.expanduser(
-            "~/.ceurws/volume_homepages.yaml"
+            "~/.ceurws/volume_homepages.db"
         )
+        self.store = None
         # load the homepages
         self.load_homepages_cache()
-        self.homepages_by_volume = {hp.volume: hp for hp in self.homepages.homepages}
 
     def load_homepages_cache(self):
         """Load the homepages cache data from a file."""
-        if os.path.exists(self.cache_file):
+        if self.cache_file.endswith(".db"):
+            # avoid circular import
+            from sempubflow.homepage_store import HomepageStore
+
+            is_new = not os.path.exists(self.cache_file)
+            self.store = HomepageStore(self.cache_file)
+            yaml_file = f"{os.path.splitext(self.cache_file)[0]}.yaml"
+            if is_new and os.path.exists(yaml_file):
+                # migrate the legacy YAML cache
+                self.store.migrate_from_yaml(yaml_file)
+            self.homepages = self.store.load()
+        elif os.path.exists(self.cache_file):
             self.homepages = Homepages.load_from_file(self.cache_file)
+        else:
+            self.homepages = Homepages()
+        self.homepages_by_volume = {hp.volume: hp for hp in self.homepages.homepages}
 
     def save_homepages_cache(self):
         """Save the homepages cache data to a file."""
-        self.homepages.save_to_file(self.cache_file)
+        if self.store:
+            self.store.save(self.homepages)
+        else:
+            self.homepages.save_to_file(self.cache_file)
 
     def check_availability(self, url: str, volume_number: int) -> bool:
         """
@@ -255,12 +452,125 @@ class HomepageChecker:
             # Use existing Homepage availability
             return self.homepages_by_volume[volume_number].available
 
+    def check_availabilities(
+        self,
+        volumes: List[Dict],
+        max_concurrency: int = 32,
+        per_host_limit: int = 2,
+        progress_bar=None,
+    ):
+        """
+        Concurrently check the availability of all volume homepages
+        that are not in the cache yet.
+
+        Args:
+            volumes (List[Dict]): the volumes to check.
+            max_concurrency (int): maximum number of requests in flight.
+            per_host_limit (int): maximum number of requests in flight per host.
+            progress_bar: optional tqdm progress bar to update per volume.
+        """
+        # avoid circular import
+        from sempubflow.homepage_crawler import HomepageCrawler
+
+        new_homepages = {}
+        for volume in volumes:
+            volume_number = volume["number"]
+            if (
+                volume_number in self.homepages_by_volume
+                or volume_number in new_homepages
+            ):
+                if progress_bar:
+                    progress_bar.update(1)
+                continue
+            new_homepages[volume_number] = Homepage(
+                volume=volume_number,
+                url=volume["homepage"],
+                available=False,
+                availability_check=datetime.now(),
+            )
+        on_checked = (
+            (lambda _homepage: progress_bar.update(1)) if progress_bar else None
+        )
+        crawler = HomepageCrawler(
+            max_concurrency=max_concurrency,
+            per_host_limit=per_host_limit,
+            on_checked=on_checked,
+        )
+        crawler.run(list(new_homepages.values()))
+        for volume_number, new_homepage in new_homepages.items():
+            self.homepages.homepages.append(new_homepage)
+            self.homepages_by_volume[volume_number] = new_homepage
+
+    def recheck_stale(
+        self,
+        policy=None,
+        time_budget: Optional[float] = None,
+        max_count: Optional[int] = None,
+        max_concurrency: int = 32,
+        per_host_limit: int = 2,
+        show_progress: bool = False,
+        with_save: bool = False,
+    ) -> List[Homepage]:
+        """
+        Recheck the slice of cached homepages whose availability check has expired.
+
+        Homepages whose url differs from the url of the volume are updated
+        and rechecked first.
+
+        Args:
+            policy (RecheckPolicy): the time to live policy - default: RecheckPolicy()
+            time_budget (float): time budget in seconds for the recheck run
+            max_count (int): maximum number of homepages to recheck
+            max_concurrency (int): maximum number of requests in flight.
+            per_host_limit (int): maximum number of requests in flight per host.
+            show_progress (bool): Whether to show a progress bar.
+            with_save(bool): if True update the cache
+
+        Returns:
+            List[Homepage]: the rechecked homepages
+        """
+        # avoid circular import
+        from sempubflow.homepage_scheduler import HomepageRecheckScheduler
+
+        for volume in self.volumes:
+            homepage = self.homepages_by_volume.get(volume["number"])
+            url = volume["homepage"].strip() if volume["homepage"] else None
+            if homepage and homepage.url != url:
+                homepage.url = url
+                homepage.etag = None
+                homepage.last_modified = None
+                homepage.availability_check = datetime.min
+        scheduler = HomepageRecheckScheduler(
+            policy=policy,
+            max_concurrency=max_concurrency,
+            per_host_limit=per_host_limit,
+        )
+        progress_bar = None
+        if show_progress:
+            stale_count = len(
+                scheduler.select_stale(self.homepages.homepages, max_count=max_count)
+            )
+            progress_bar = tqdm(total=stale_count, desc="Rechecking homepages")
+        rechecked = scheduler.run(
+            self.homepages.homepages,
+            time_budget=time_budget,
+            max_count=max_count,
+            progress_bar=progress_bar,
+        )
+        if progress_bar:
+            progress_bar.close()
+        if with_save and rechecked:
+            self.save_homepages_cache()
+        return rechecked
+
     def process_samples(
         self,
         set_number: int = 1,
         sample_size: int = None,
         show_progress=False,
         with_save: bool = False,
+        max_concurrency: int = 1,
+        per_host_limit: int = 2,
     ):
         """
         Process the samples and check the availability of homepages.
@@ -270,6 +580,9 @@ class HomepageChecker:
             sample_size (int): The size of each sample to check.
             show_progress (bool): Whether to show a progress bar.
             with_save(bool): if True update the cache
+            max_concurrency (int): if > 1 check uncached homepages concurrently with
+                this many requests in flight
+            per_host_limit (int): maximum number of concurrent requests per host
         """
 
         self.set_number = set_number
@@ -278,20 +591,33 @@ class HomepageChecker:
         total_volumes = len(self.volumes)
         slot_size = total_volumes // self.set_number
 
-        if show_progress:
-            progress_bar = tqdm(
-                total=self.set_number * self.sample_size, desc="Checking homepages"
-            )
-
+        sample_sets = []
         for set_index in range(self.set_number):
-            set_info = None
-
             start_index = set_index * slot_size
             middle_start = start_index + (
                 (slot_size - self.sample_size) // 2 if self.set_number > 1 else 0
             )
             middle_end = middle_start + self.sample_size
-            sample_volumes = self.volumes[middle_start:middle_end]
+            sample_sets.append(self.volumes[middle_start:middle_end])
+
+        progress_bar = None
+        if show_progress:
+            progress_bar = tqdm(
+                total=self.set_number * self.sample_size, desc="Checking homepages"
+            )
+
+        concurrent = max_concurrency > 1
+        if concurrent:
+            # fill the cache concurrently - the loop below will then only read it
+            self.check_availabilities(
+                [volume for sample_volumes in sample_sets for volume in sample_volumes],
+                max_concurrency=max_concurrency,
+                per_host_limit=per_host_limit,
+                progress_bar=progress_bar,
+            )
+
+        for set_index, sample_volumes in enumerate(sample_sets):
+            set_info = None
 
             for volume in sample_volumes:
                 volume_number = volume["number"]
@@ -309,13 +635,13 @@ class HomepageChecker:
                     (set_index + 1, volume_number, homepage, is_accessible)
                 )
 
-                if show_progress:
+                if progress_bar and not concurrent:
                     progress_bar.update(1)
 
             if set_info:
                 self.set_infos.append(set_info)
 
-        if show_progress:
+        if progress_bar:
             progress_bar.close()
         # Save homepages after processing
         if with_save:
@@ -0,0 +1,146 @@
+"""
+Created on 2024-03-01
+
+@author: wf
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+from sempubflow.homepage import Homepage
+
+
+class HomepageCrawler:
+    """
+    concurrent availability checker for event homepages
+
+    the blocking Homepage.check_url calls are run in a thread pool
+    while asyncio semaphores bound the number of requests in flight
+    overall and per host so that a single server is not hammered
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 32,
+        per_host_limit: int = 2,
+        timeout: float = 0.5,
+        on_checked: Optional[Callable[[Homepage], None]] = None,
+    ):
+        """
+        constructor
+
+        Args:
+            max_concurrency(int): maximum number of requests in flight
+            per_host_limit(int): maximum number of requests in flight per host
+            timeout(float): the timeout in seconds for each check
+            on_checked(Callable): optional callback called after each check e.g. for progress
+        """
+        self.max_concurrency = max_concurrency
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.on_checked = on_checked
+
+    @staticmethod
+    def host_of(url: Optional[str]) -> str:
+        """
+        get the host of the given url
+
+        Args:
+            url(str): the url
+
+        Returns:
+            str: the lowercase network location or an empty string
+        """
+        host = ""
+        if url:
+            try:
+                host = urlparse(url.strip()).netloc.lower()
+            except ValueError:
+                pass
+        return host
+
+    def open(self):
+        """
+        create my semaphores and thread pool - must be called from within the event loop
+        """
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+
+    def close(self):
+        """
+        shut down my thread pool
+        """
+        self.executor.shutdown(wait=True)
+
+    async def call(self, homepage: Homepage, func: Callable, *args):
+        """
+        call the given blocking function for the given homepage in my thread pool
+        respecting the global and per host limits
+
+        Args:
+            homepage(Homepage): the homepage whose url host is to be limited
+            func(Callable): the blocking function to call
+            *args: the arguments of the function
+
+        Returns:
+            the result of the function
+        """
+        host = self.host_of(homepage.url)
+        host_semaphore = self.host_semaphores.setdefault(
+            host, asyncio.Semaphore(self.per_host_limit)
+        )
+        # wait for the host slot first so that a busy host
+        # does not block global slots
+        async with host_semaphore:
+            async with self.semaphore:
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(self.executor, func, *args)
+        return result
+
+    async def check_homepage(self, homepage: Homepage) -> bool:
+        """
+        check the availability of a single homepage
+
+        Args:
+            homepage(Homepage): the homepage to check
+
+        Returns:
+            bool: True if the homepage is available
+        """
+        available = await self.call(homepage, homepage.check_url, self.timeout)
+        if self.on_checked:
+            self.on_checked(homepage)
+        return available
+
+    async def check_homepages(self, homepages: List[Homepage]) -> List[bool]:
+        """
+        check the availability of the given homepages concurrently
+
+        Args:
+            homepages(List[Homepage]): the homepages to check
+
+        Returns:
+            List[bool]: the availability results in the order of the homepages
+        """
+        self.open()
+        try:
+            tasks = [self.check_homepage(homepage) for homepage in homepages]
+            results = await asyncio.gather(*tasks)
+        finally:
+            self.close()
+        return list(results)
+
+    def run(self, homepages: List[Homepage]) -> List[bool]:
+        """
+        check the given homepages from synchronous code
+
+        Args:
+            homepages(List[Homepage]): the homepages to check
+
+        Returns:
+            List[bool]: the availability results in the order of the homepages
+        """
+        results = asyncio.run(self.check_homepages(homepages))
+        return results
@@ -0,0 +1,168 @@
+"""
+Created on 2024-03-03
+
+@author: wf
+"""
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sempubflow.homepage import Homepage
+from sempubflow.homepage_crawler import HomepageCrawler
+
+
+@dataclass
+class RecheckPolicy:
+    """
+    time to live policy for homepage availability checks
+    """
+
+    available_ttl: timedelta = timedelta(days=30)
+    unavailable_ttl: timedelta = timedelta(days=1)
+    # each further consecutive failure multiplies the unavailable ttl by this factor
+    backoff_factor: float = 2.0
+    max_ttl: timedelta = timedelta(days=180)
+
+    def ttl(self, homepage: Homepage) -> timedelta:
+        """
+        get the time to live of the availability check of the given homepage
+
+        Args:
+            homepage(Homepage): the homepage
+
+        Returns:
+            timedelta: the time after which the homepage should be rechecked
+        """
+        if not homepage.available:
+            failures = max(homepage.failure_count - 1, 0)
+            # avoid overflow for pages that fail for a very long time
+            factor = self.backoff_factor ** min(failures, 64)
+            ttl_seconds = self.unavailable_ttl.total_seconds() * factor
+            ttl = timedelta(seconds=min(ttl_seconds, self.max_ttl.total_seconds()))
+        else:
+            ttl = min(self.available_ttl, self.max_ttl)
+        return ttl
+
+    def due(self, homepage: Homepage) -> datetime:
+        """
+        get the time when the given homepage is due for a recheck
+
+        Returns:
+            datetime: the due time - datetime.min for a homepage that has never been checked
+        """
+        if homepage.availability_check is None:
+            return datetime.min
+        due = homepage.availability_check + self.ttl(homepage)
+        return due
+
+    def is_stale(self, homepage: Homepage, now: Optional[datetime] = None) -> bool:
+        """
+        check whether the given homepage is due for a recheck
+
+        Args:
+            homepage(Homepage): the homepage
+            now(datetime): the reference time - default: the current time
+
+        Returns:
+            bool: True if the availability check has expired
+        """
+        now = now or datetime.now()
+        stale = self.due(homepage) <= now
+        return stale
+
+
+class HomepageRecheckScheduler:
+    """
+    pick the stale slice of the homepage cache and recheck
+    it within a fixed time budget
+    """
+
+    def __init__(
+        self,
+        policy: Optional[RecheckPolicy] = None,
+        max_concurrency: int = 32,
+        per_host_limit: int = 2,
+        batch_size: Optional[int] = None,
+        timeout: float = 0.5,
+    ):
+        """
+        constructor
+
+        Args:
+            policy(RecheckPolicy): the time to live policy - default: RecheckPolicy()
+            max_concurrency(int): maximum number of requests in flight
+            per_host_limit(int): maximum number of requests in flight per host
+            batch_size(int): number of homepages to check between time budget checks - default: 4*max_concurrency
+            timeout(float): the timeout in seconds for each check
+        """
+        self.policy = policy or RecheckPolicy()
+        self.max_concurrency = max_concurrency
+        self.per_host_limit = per_host_limit
+        self.batch_size = batch_size or 4 * max_concurrency
+        self.timeout = timeout
+
+    def select_stale(
+        self,
+        homepages: List[Homepage],
+        now: Optional[datetime] = None,
+        max_count: Optional[int] = None,
+    ) -> List[Homepage]:
+        """
+        select the stale homepages - the most overdue ones first
+
+        Args:
+            homepages(List[Homepage]): the homepages to select from
+            now(datetime): the reference time - default: the current time
+            max_count(int): the maximum number of homepages to select
+
+        Returns:
+            List[Homepage]: the stale homepages ordered by due time
+        """
+        now = now or datetime.now()
+        stale = [hp for hp in homepages if hp.url and self.policy.is_stale(hp, now)]
+        stale.sort(key=self.policy.due)
+        if max_count is not None:
+            stale = stale[:max_count]
+        return stale
+
+    def run(
+        self,
+        homepages: List[Homepage],
+        time_budget: Optional[float] = None,
+        max_count: Optional[int] = None,
+        now: Optional[datetime] = None,
+        progress_bar=None,
+    ) -> List[Homepage]:
+        """
+        recheck the stale homepages batch by batch until the time budget is used up
+
+        Args:
+            homepages(List[Homepage]): all homepages
+            time_budget(float): the time budget in seconds - no new batch is started after it is exhausted
+            max_count(int): the maximum number of homepages to recheck
+            now(datetime): the reference time for staleness - default: the current time
+            progress_bar: optional tqdm progress bar to update per homepage
+
+        Returns:
+            List[Homepage]: the rechecked homepages
+        """
+        stale = self.select_stale(homepages, now=now, max_count=max_count)
+        on_checked = (
+            (lambda _homepage: progress_bar.update(1)) if progress_bar else None
+        )
+        crawler = HomepageCrawler(
+            max_concurrency=self.max_concurrency,
+            per_host_limit=self.per_host_limit,
+            timeout=self.timeout,
+            on_checked=on_checked,
+        )
+        start_time = time.monotonic()
+        rechecked = []
+        for batch_start in range(0, len(stale), self.batch_size):
+            if time_budget is not None and time.monotonic() - start_time >= time_budget:
+                break
+            batch = stale[batch_start : batch_start + self.batch_size]
+            crawler.run(batch)
+            rechecked.extend(batch)
+        return rechecked
@@ -9,6 +9,7 @@ from nicegui import run, ui
 
 from sempubflow.event_info import EventInfo
 from sempubflow.homepage import Homepage
+from sempubflow.llm_cache import LlmResponseCache
 
 
 class HomePageSelector:
@@ -25,7 +26,9 @@ class HomePageSelector:
         self.webserver = webserver
         self.model = model
         self.llm = LLM(model=model)
-        self.event_info = EventInfo(self.llm, debug=self.webserver.debug)
+        self.event_info = EventInfo(
+            self.llm, debug=self.webserver.debug, llm_cache=LlmResponseCache()
+        )
         self.setup()
 
     def setup(self):
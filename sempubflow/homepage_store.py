@@ -0,0 +1,309 @@
+"""
+Created on 2024-03-04
+
+@author: wf
+"""
+import dataclasses
+import hashlib
+import os
+import sqlite3
+import zlib
+from contextlib import closing
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+import yaml
+
+from sempubflow.homepage import Homepage, Homepages
+
+
+class HomepageStore:
+    """
+    SQLite based storage for Homepages
+
+    the homepage records are kept in a table keyed by volume number while
+    the extracted texts are kept zlib compressed in a separate blob table.
+    Saving only upserts the rows that changed since the last load or save.
+    """
+
+    def __init__(self, db_path: str):
+        """
+        constructor
+
+        Args:
+            db_path(str): the path to the SQLite database file
+        """
+        self.db_path = db_path
+        # fingerprints of the rows as last loaded or saved by volume number
+        self.row_fingerprints: Dict[int, Tuple] = {}
+        # sha1 of the texts as last loaded or saved by volume number
+        self.text_hashes: Dict[int, Optional[str]] = {}
+        self.create_schema()
+
+    def connect(self) -> sqlite3.Connection:
+        """
+        get a connection to my database
+        """
+        connection = sqlite3.connect(self.db_path)
+        return connection
+
+    def create_schema(self):
+        """
+        create my tables and indices if they do not exist yet
+        """
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with closing(self.connect()) as connection, connection:
+            connection.executescript(
+                """
+CREATE TABLE IF NOT EXISTS homepage (
+  volume INTEGER PRIMARY KEY,
+  url TEXT,
+  available INTEGER NOT NULL,
+  content_len INTEGER,
+  availability_check TEXT,
+  etag TEXT,
+  last_modified TEXT,
+  failure_count INTEGER NOT NULL DEFAULT 0,
+  html_hash TEXT,
+  charset TEXT
+);
+CREATE INDEX IF NOT EXISTS homepage_availability_check
+  ON homepage(availability_check);
+CREATE TABLE IF NOT EXISTS homepage_text (
+  volume INTEGER PRIMARY KEY,
+  text_hash TEXT NOT NULL,
+  text BLOB NOT NULL
+);
+"""
+            )
+            # add the columns of newer versions to existing databases
+            columns = {
+                row[1] for row in connection.execute("PRAGMA table_info(homepage)")
+            }
+            for column in ["html_hash", "charset"]:
+                if column not in columns:
+                    connection.execute(f"ALTER TABLE homepage ADD COLUMN {column} TEXT")
+
+    @staticmethod
+    def text_hash(text: Optional[str]) -> Optional[str]:
+        """
+        get the hash of the given text
+        """
+        if text is None:
+            return None
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def to_row(homepage: Homepage) -> Tuple:
+        """
+        convert the given homepage to a homepage table row
+        """
+        availability_check = (
+            homepage.availability_check.isoformat()
+            if homepage.availability_check
+            else None
+        )
+        row = (
+            homepage.volume,
+            homepage.url,
+            int(bool(homepage.available)),
+            homepage.content_len,
+            availability_check,
+            homepage.etag,
+            homepage.last_modified,
+            homepage.failure_count,
+            homepage.html_hash,
+            homepage.charset,
+        )
+        return row
+
+    @staticmethod
+    def from_row(row: Tuple, text: Optional[str] = None) -> Homepage:
+        """
+        convert the given homepage table row to a homepage
+        """
+        (
+            volume,
+            url,
+            available,
+            content_len,
+            availability_check,
+            etag,
+            last_modified,
+            failure_count,
+            html_hash,
+            charset,
+        ) = row
+        homepage = Homepage(
+            volume=volume,
+            url=url,
+            text=text,
+            available=bool(available),
+            content_len=content_len,
+            availability_check=datetime.fromisoformat(availability_check)
+            if availability_check
+            else None,
+            etag=etag,
+            last_modified=last_modified,
+            failure_count=failure_count,
+            html_hash=html_hash,
+            charset=charset,
+        )
+        return homepage
+
+    def load(self, with_text: bool = True) -> Homepages:
+        """
+        load all homepages
+
+        Args:
+            with_text(bool): if False the texts are not loaded and
+            saving will keep the stored texts of homepages without text
+
+        Returns:
+            Homepages: the homepages ordered by volume number
+        """
+        homepages = Homepages()
+        self.row_fingerprints.clear()
+        self.text_hashes.clear()
+        with closing(self.connect()) as connection:
+            texts = {}
+            if with_text:
+                for volume, text_hash, blob in connection.execute(
+                    "SELECT volume, text_hash, text FROM homepage_text"
+                ):
+                    texts[volume] = zlib.decompress(blob).decode("utf-8")
+                    self.text_hashes[volume] = text_hash
+            for row in connection.execute(
+                """SELECT volume, url, available, content_len, availability_check,
+                etag, last_modified, failure_count, html_hash, charset
+                FROM homepage ORDER BY volume"""
+            ):
+                volume = row[0]
+                homepage = self.from_row(row, texts.get(volume))
+                homepages.homepages.append(homepage)
+                self.row_fingerprints[volume] = self.to_row(homepage)
+                if with_text and volume not in self.text_hashes:
+                    self.text_hashes[volume] = None
+        return homepages
+
+    def get_text(self, volume: int) -> Optional[str]:
+        """
+        get the text of a single homepage
+
+        Args:
+            volume(int): the volume number
+
+        Returns:
+            str: the text or None if no text is stored
+        """
+        with closing(self.connect()) as connection:
+            row = connection.execute(
+                "SELECT text FROM homepage_text WHERE volume=?", (volume,)
+            ).fetchone()
+        text = zlib.decompress(row[0]).decode("utf-8") if row else None
+        return text
+
+    def save(self, homepages: Homepages) -> int:
+        """
+        upsert the homepages that changed since the last load or save
+
+        homepages that are not in the given list are kept in the store
+
+        Args:
+            homepages(Homepages): the homepages to save
+
+        Returns:
+            int: the number of changed homepages
+        """
+        changed_rows = []
+        changed_texts = []
+        deleted_texts = []
+        for homepage in homepages.homepages:
+            row = self.to_row(homepage)
+            volume = homepage.volume
+            if self.row_fingerprints.get(volume) != row:
+                changed_rows.append(row)
+            if homepage.text is not None:
+                text_hash = self.text_hash(homepage.text)
+                if self.text_hashes.get(volume) != text_hash:
+                    blob = zlib.compress(homepage.text.encode("utf-8"))
+                    changed_texts.append((volume, text_hash, blob))
+            elif self.text_hashes.get(volume) is not None:
+                # the text has been loaded and removed since
+                deleted_texts.append((volume,))
+        changed_volumes = {row[0] for row in changed_rows}
+        changed_volumes.update(volume for volume, _hash, _blob in changed_texts)
+        changed_volumes.update(volume for volume, in deleted_texts)
+        with closing(self.connect()) as connection, connection:
+            connection.executemany(
+                """INSERT INTO homepage (volume, url, available, content_len,
+                availability_check, etag, last_modified, failure_count,
+                html_hash, charset)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(volume) DO UPDATE SET
+                url=excluded.url,
+                available=excluded.available,
+                content_len=excluded.content_len,
+                availability_check=excluded.availability_check,
+                etag=excluded.etag,
+                last_modified=excluded.last_modified,
+                failure_count=excluded.failure_count,
+                html_hash=excluded.html_hash,
+                charset=excluded.charset""",
+                changed_rows,
+            )
+            connection.executemany(
+                """INSERT INTO homepage_text (volume, text_hash, text) VALUES (?, ?, ?)
+                ON CONFLICT(volume) DO UPDATE SET
+                text_hash=excluded.text_hash,
+                text=excluded.text""",
+                changed_texts,
+            )
+            connection.executemany(
+                "DELETE FROM homepage_text WHERE volume=?", deleted_texts
+            )
+        for row in changed_rows:
+            self.row_fingerprints[row[0]] = row
+        for volume, text_hash, _blob in changed_texts:
+            self.text_hashes[volume] = text_hash
+        for (volume,) in deleted_texts:
+            self.text_hashes[volume] = None
+        return len(changed_volumes)
+
+    def import_homepages(self, homepages: Homepages) -> int:
+        """
+        import the given homepages e.g. from a legacy YAML cache
+
+        Args:
+            homepages(Homepages): the homepages to import
+
+        Returns:
+            int: the number of imported homepages
+        """
+        self.load(with_text=True)
+        count = self.save(homepages)
+        return count
+
+    def migrate_from_yaml(self, yaml_path: str) -> int:
+        """
+        migrate the given legacy YAML homepages cache into this store
+
+        Args:
+            yaml_path(str): the path of the volume_homepages.yaml file
+
+        Returns:
+            int: the number of migrated homepages
+        """
+        with open(yaml_path, "r") as yaml_file:
+            record = yaml.safe_load(yaml_file) or {}
+        field_names = {field.name for field in dataclasses.fields(Homepage)}
+        homepages = Homepages(
+            [
+                Homepage(**{k: v for k, v in hp.items() if k in field_names})
+                for hp in record.get("homepages") or []
+            ]
+        )
+        count = self.import_homepages(homepages)
+        return count
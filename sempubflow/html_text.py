@@ -0,0 +1,238 @@
+"""
+Created on 2024-03-05
+
+@author: wf
+"""
+import codecs
+import re
+from typing import Iterable, List, Optional
+
+from bs4 import BeautifulSoup
+
+try:
+    from lxml import etree
+
+    HAS_LXML = True
+except ImportError:  # pragma: no cover - lxml is optional
+    HAS_LXML = False
+
+
+def normalize_text(text: str) -> str:
+    """
+    normalize the given raw text the same way for all parsers
+
+    Args:
+        text(str): the raw text of the html body
+
+    Returns:
+        str: the text with one stripped phrase per line and no blank lines
+    """
+    # break into lines and remove leading and trailing space on each
+    lines = (line.strip() for line in text.splitlines())
+    # break multi-headlines into a line each
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    # drop blank lines
+    text = "\n".join(chunk for chunk in chunks if chunk)
+    return text
+
+
+class BodyTextTarget:
+    """
+    lxml parser target collecting the visible text of the html body
+    """
+
+    skip_tags = {"script", "style"}
+
+    def __init__(self):
+        self.parts: List[str] = []
+        self.in_body = False
+        self.skip_depth = 0
+
+    def start(self, tag, _attrib):
+        if tag == "body":
+            self.in_body = True
+        elif tag in self.skip_tags:
+            self.skip_depth += 1
+
+    def end(self, tag):
+        if tag in self.skip_tags and self.skip_depth > 0:
+            self.skip_depth -= 1
+
+    def data(self, data):
+        if self.in_body and self.skip_depth == 0:
+            self.parts.append(data)
+
+    def comment(self, _text):
+        pass
+
+    def close(self) -> Optional[str]:
+        if not self.in_body:
+            return None
+        return "".join(self.parts)
+
+
+class HtmlTextExtractor:
+    """
+    incremental extractor of the visible text of an html page
+
+    chunks of bytes are fed as they arrive and decoded with the declared
+    charset. The text is extracted with the incremental lxml parser if
+    available otherwise the collected html is parsed with BeautifulSoup
+    """
+
+    # number of bytes to look at for the charset detection
+    sniff_size = 4096
+    meta_charset_pattern = re.compile(
+        rb"""<meta[^>]+charset\s*=\s*["']?([a-zA-Z0-9_\-]+)""", re.IGNORECASE
+    )
+
+    def __init__(
+        self,
+        charset: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        parser: Optional[str] = None,
+    ):
+        """
+        constructor
+
+        Args:
+            charset(str): the declared charset e.g. from the Content-Type header
+            max_bytes(int): maximum number of bytes to consume - further chunks are ignored
+            parser(str): "lxml" or "bs4" - default: "lxml" if available
+        """
+        self.charset = charset
+        self.max_bytes = max_bytes
+        self.parser = parser or ("lxml" if HAS_LXML else "bs4")
+        if self.parser == "lxml" and not HAS_LXML:
+            raise ValueError("lxml is not installed")
+        self.byte_count = 0
+        self.truncated = False
+        self.decoder = None
+        self.pending = b""
+        self.html_parts: List[str] = []
+        if self.parser == "lxml":
+            self.lxml_parser = etree.HTMLParser(target=BodyTextTarget())
+
+    @property
+    def full(self) -> bool:
+        """
+        True if the byte cap has been reached
+        """
+        return self.max_bytes is not None and self.byte_count >= self.max_bytes
+
+    def get_decoder(self, chunk: bytes):
+        """
+        get an incremental decoder for the declared, meta or sniffed charset
+        """
+        charset = self.charset
+        if not charset:
+            match = self.meta_charset_pattern.search(chunk[: self.sniff_size])
+            if match:
+                charset = match.group(1).decode("ascii")
+        if charset:
+            try:
+                codecs.lookup(charset)
+            except LookupError:
+                charset = None
+        if not charset:
+            try:
+                chunk[: self.sniff_size].decode("utf-8")
+                charset = "utf-8"
+            except UnicodeDecodeError as ude:
+                # a multibyte sequence might just be cut at the end
+                charset = "utf-8" if ude.start >= self.sniff_size - 3 else "cp1252"
+        self.charset = charset
+        decoder = codecs.getincrementaldecoder(charset)(errors="replace")
+        return decoder
+
+    def feed(self, chunk: bytes):
+        """
+        feed the next chunk of bytes
+
+        Args:
+            chunk(bytes): the chunk
+        """
+        if self.full:
+            self.truncated = True
+            return
+        if self.max_bytes is not None and self.byte_count + len(chunk) > self.max_bytes:
+            chunk = chunk[: self.max_bytes - self.byte_count]
+            self.truncated = True
+        self.byte_count += len(chunk)
+        if self.decoder is None:
+            # collect enough bytes to sniff the charset
+            self.pending += chunk
+            if not (self.charset or self.full) and len(self.pending) < self.sniff_size:
+                return
+            chunk = self.pending
+            self.pending = b""
+            self.decoder = self.get_decoder(chunk)
+        self.feed_str(self.decoder.decode(chunk))
+
+    def feed_str(self, html: str):
+        """
+        feed decoded html to the parser
+        """
+        if not html:
+            return
+        if self.parser == "lxml":
+            self.lxml_parser.feed(html)
+        else:
+            self.html_parts.append(html)
+
+    def close(self) -> Optional[str]:
+        """
+        finish parsing
+
+        Returns:
+            str: the normalized text of the body or None if there is no body
+        """
+        if self.decoder is None and self.pending:
+            self.decoder = self.get_decoder(self.pending)
+            self.feed_str(self.decoder.decode(self.pending))
+            self.pending = b""
+        if self.decoder is not None:
+            self.feed_str(self.decoder.decode(b"", final=True))
+        text = None
+        if self.parser == "lxml":
+            if self.byte_count > 0:
+                text = self.lxml_parser.close()
+        else:
+            soup = BeautifulSoup("".join(self.html_parts), features="html.parser")
+            # kill all script and style elements
+            for script in soup(["script", "style"]):
+                script.extract()  # rip it out
+            if soup.body:
+                text = soup.body.get_text()
+        if text is not None:
+            text = normalize_text(text)
+        return text
+
+
+def extract_text(
+    html_chunks: Iterable[bytes],
+    charset: Optional[str] = None,
+    max_bytes: Optional[int] = None,
+    parser: Optional[str] = None,
+) -> Optional[str]:
+    """
+    extract the visible text from the given html
+
+    Args:
+        html_chunks(Iterable[bytes]): the html as bytes or an iterable of chunks of bytes
+        charset(str): the declared charset
+        max_bytes(int): maximum number of bytes to consume
+        parser(str): "lxml" or "bs4" - default: "lxml" if available
+
+    Returns:
+        str: the normalized text of the body or None if there is no body
+    """
+    if isinstance(html_chunks, (bytes, bytearray)):
+        html_chunks = [bytes(html_chunks)]
+    extractor = HtmlTextExtractor(charset=charset, max_bytes=max_bytes, parser=parser)
+    for chunk in html_chunks:
+        extractor.feed(chunk)
+        if extractor.full:
+            break
+    text = extractor.close()
+    return text
@@ -0,0 +1,142 @@
+"""
+Created on 2024-03-14
+
+@author: wf
+"""
+import threading
+from email.message import Message
+from typing import Dict, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from sempubflow.version import Version
+
+
+class HttpClient:
+    """
+    shared outbound HTTP client of the process
+
+    a single requests session keeps pooled keep-alive connections per host
+    so that repeated calls to the same server do not pay for DNS, TCP and TLS
+    setup again. The pool of each host is limited to per_host_limit connections -
+    further requests wait for a free connection. All requests share the
+    default timeout and the retry policy for connection errors and
+    temporary failures like 429 and 503.
+    """
+
+    # configurations of the shared instances by profile name
+    profiles: Dict[str, Dict] = {
+        "default": {},
+        # availability probes are rescheduled by the HomepageScheduler instead
+        "probe": {"max_retries": 0},
+    }
+    instances: Dict[str, "HttpClient"] = {}
+    instances_lock = threading.Lock()
+
+    def __init__(
+        self,
+        per_host_limit: int = 10,
+        max_hosts: int = 100,
+        timeout: Union[float, Tuple[float, float]] = (3.05, 10.0),
+        max_retries: int = 2,
+        backoff_factor: float = 0.5,
+        user_agent: Optional[str] = None,
+    ):
+        """
+        constructor
+
+        Args:
+            per_host_limit(int): the maximum number of connections per host
+            max_hosts(int): the maximum number of hosts to keep connection pools for
+            timeout(float|Tuple[float, float]): the default connect and read timeout in seconds
+            max_retries(int): the maximum number of retries of idempotent requests
+            backoff_factor(float): the factor of the exponential backoff between retries
+            user_agent(str): the User-Agent header - default: sempubflow/<version>
+        """
+        self.timeout = timeout
+        if max_retries:
+            retry = Retry(
+                total=max_retries,
+                backoff_factor=backoff_factor,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset({"GET", "HEAD", "OPTIONS"}),
+                raise_on_status=False,
+            )
+        else:
+            retry = Retry(0, read=False)
+        adapter = HTTPAdapter(
+            pool_connections=max_hosts,
+            pool_maxsize=per_host_limit,
+            pool_block=True,
+            max_retries=retry,
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        user_agent = user_agent or f"{Version.name}/{Version.version}"
+        self.session.headers["User-Agent"] = user_agent
+
+    @classmethod
+    def get_instance(cls, profile: str = "default") -> "HttpClient":
+        """
+        get the shared instance for the given profile
+
+        Args:
+            profile(str): "default" or "probe" for requests without retries
+        """
+        with cls.instances_lock:
+            instance = cls.instances.get(profile)
+            if instance is None:
+                instance = cls(**cls.profiles[profile])
+                cls.instances[profile] = instance
+        return instance
+
+    @staticmethod
+    def charset_of(response: requests.Response) -> Optional[str]:
+        """
+        get the charset declared in the Content-Type header of the given response
+
+        Returns:
+            str: the lowercase charset or None if none is declared
+        """
+        message = Message()
+        message["Content-Type"] = response.headers.get("Content-Type", "")
+        return message.get_content_charset()
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        send a request with my default timeout
+
+        Args:
+            method(str): the HTTP method
+            url(str): the url
+            **kwargs: further arguments of requests.Session.request
+
+        Returns:
+            requests.Response: the response
+        """
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        response = self.session.request(method, url, **kwargs)
+        return response
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """
+        send a GET request - see request
+        """
+        return self.request("GET", url, **kwargs)
+
+    def head(self, url: str, **kwargs) -> requests.Response:
+        """
+        send a HEAD request following redirects - see request
+        """
+        kwargs.setdefault("allow_redirects", True)
+        return self.request("HEAD", url, **kwargs)
+
+    def close(self):
+        """
+        close all pooled connections
+        """
+        self.session.close()
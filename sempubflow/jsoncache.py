@@ -4,24 +4,70 @@ Created on 2023-06-19
 @author: wf
 """
 import os
-import urllib
+import sys
+import tempfile
+import time
+import zlib
+from datetime import datetime
 from pathlib import Path
+from typing import Any, Dict, Optional
 
 import orjson
 
+from sempubflow.http_client import HttpClient
+from sempubflow.jsonl_cache import JsonLinesCache
+
+try:
+    import zstandard
+
+    HAS_ZSTD = True
+except ImportError:  # pragma: no cover - zstandard is optional
+    HAS_ZSTD = False
+
 
 class JsonCacheManager:
     """
     a json based cache manager
+
+    besides the .json files a memory mapped JSON lines copy with an index
+    may be used for large caches - see open_lod
+
+    store writes atomically via a temporary file and a rename so that
+    readers in other processes see either the old or the new cache. A small
+    <name>.meta.json header file next to the cache holds the schema version,
+    the record count and the size of the cache for cheap staleness checks.
+    The cache itself stays a plain .json file compatible with pyCEURmake unless
+    zstd compression is asked for.
+
+    A cache missing locally is downloaded from the base url and stored. Such
+    downloaded caches are revalidated with a conditional request once they
+    have not been checked for revalidate_after seconds.
     """
 
-    def __init__(self, base_url: str = "http://cvb.bitplan.com"):
+    schema_version = 1
+
+    # the key fields for the random access to the records of the caches
+    keys: Dict[str, str] = {"volumes": "number"}
+
+    def __init__(
+        self,
+        base_url: str = "http://cvb.bitplan.com",
+        root_path: Optional[str] = None,
+        remote_ext: str = ".json",
+        revalidate_after: Optional[float] = 24 * 3600,
+    ):
         """
         constructor
 
         base_url(str): the base url to use for the json provider
+        root_path(str): the directory of the cache files - default: ~/.ceurws
+        remote_ext(str): the extension of the remote files - ".json.gz" for gzipped files
+        revalidate_after(float): seconds after which a downloaded cache is revalidated - None for never
         """
         self.base_url = base_url
+        self.root_path = root_path or f"{Path.home()}/.ceurws"
+        self.remote_ext = remote_ext
+        self.revalidate_after = revalidate_after
 
     def json_path(self, lod_name: str) -> str:
         """
@@ -33,11 +79,149 @@ class JsonCacheManager:
         Returns:
             str: the path to the list of dict cache
         """
-        root_path = f"{Path.home()}/.ceurws"
-        os.makedirs(root_path, exist_ok=True)
-        json_path = f"{root_path}/{lod_name}.json"
+        json_path = f"{self.root_path}/{lod_name}.json"
+        # names like dblp/papers are kept in sub directories
+        os.makedirs(os.path.dirname(json_path), exist_ok=True)
         return json_path
 
+    def zst_path(self, lod_name: str) -> str:
+        """
+        get the path of the zstd compressed json for the given list of dicts name
+        """
+        return f"{self.json_path(lod_name)}.zst"
+
+    def meta_path(self, lod_name: str) -> str:
+        """
+        get the path of the header file for the given list of dicts name
+        """
+        return f"{self.root_path}/{lod_name}.meta.json"
+
+    def data_path(self, lod_name: str) -> Optional[str]:
+        """
+        get the path of the stored cache - the newer one if there is a plain
+        and a compressed version
+
+        Returns:
+            str: the path or None if the cache has not been stored
+        """
+        paths = [
+            path
+            for path in [self.json_path(lod_name), self.zst_path(lod_name)]
+            if os.path.isfile(path)
+        ]
+        data_path = max(paths, key=os.path.getmtime) if paths else None
+        return data_path
+
+    @staticmethod
+    def write_atomic(path: str, data: bytes):
+        """
+        write the given data to a temporary file in the directory of the
+        given path and rename it to the path
+
+        Args:
+            path(str): the target path
+            data(bytes): the content
+        """
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(path), prefix=f".{os.path.basename(path)}."
+        )
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                tmp_file.write(data)
+                tmp_file.flush()
+                os.fsync(tmp_file.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def get_meta(self, lod_name: str) -> Optional[Dict[str, Any]]:
+        """
+        get the header of the given cache without reading the cache
+
+        Returns:
+            dict: schema_version, count, size, compression and timestamp
+                or None if there is no valid header
+        """
+        meta = None
+        try:
+            with open(self.meta_path(lod_name), "rb") as meta_file:
+                meta = orjson.loads(meta_file.read())
+        except (OSError, orjson.JSONDecodeError):
+            pass
+        return meta
+
+    def is_stale(self, lod_name: str, max_age: Optional[float] = None) -> bool:
+        """
+        check cheaply whether the given cache needs to be refreshed
+
+        Args:
+            lod_name(str): the name of the list of dicts cache
+            max_age(float): the maximum age in seconds - default: no limit
+
+        Returns:
+            bool: True if the cache is missing, has no matching header
+                e.g. since it was written by another tool, has an older schema version
+                or is older than max_age
+        """
+        meta = self.get_meta(lod_name)
+        data_path = self.data_path(lod_name)
+        if meta is None or data_path is None:
+            return True
+        if meta.get("schema_version") != self.schema_version:
+            return True
+        if meta.get("size") != os.path.getsize(data_path):
+            return True
+        if max_age is not None:
+            return time.time() - os.path.getmtime(data_path) > max_age
+        return False
+
+    def jsonl_path(self, lod_name: str) -> str:
+        """
+        get the JSON lines path for the given list of dicts name
+
+        Args:
+            lod_name(str): the name of the list of dicts cache
+
+        Returns:
+            str: the path to the JSON lines copy of the cache
+        """
+        jsonl_path = f"{os.path.splitext(self.json_path(lod_name))[0]}.jsonl"
+        return jsonl_path
+
+    def is_jsonl_current(self, lod_name: str) -> bool:
+        """
+        check whether the JSON lines copy of the given cache exists with
+        its matching index and is not older than the .json file
+        """
+        data_path = self.data_path(lod_name)
+        jsonl_path = self.jsonl_path(lod_name)
+        index_path = JsonLinesCache.index_path_of(jsonl_path)
+        if not JsonLinesCache.is_valid(jsonl_path):
+            return False
+        if data_path:
+            return os.path.getmtime(index_path) >= os.path.getmtime(data_path)
+        return True
+
+    def open_lod(self, lod_name: str, key: Optional[str] = None) -> JsonLinesCache:
+        """
+        open the memory mapped JSON lines copy of my list of dicts
+
+        the copy is created from the .json file or the download on first use
+
+        Args:
+            lod_name(str): the name of the list of dicts cache to open
+            key(str): the key field for random access - default: see keys
+
+        Returns:
+            JsonLinesCache: the cache - to be closed by the caller
+        """
+        jsonl_path = self.jsonl_path(lod_name)
+        if not self.is_jsonl_current(lod_name):
+            lod = self.load_lod(lod_name)
+            JsonLinesCache.write(lod, jsonl_path, key or self.keys.get(lod_name))
+        return JsonLinesCache(jsonl_path)
+
     def load_lod(self, lod_name: str) -> list:
         """
         load my list of dicts
@@ -48,35 +232,160 @@ class JsonCacheManager:
         Returns:
             list: the list of dicts
         """
-        json_path = self.json_path(lod_name)
-        if os.path.isfile(json_path):
+        json_path = self.data_path(lod_name)
+        if json_path and self.needs_revalidation(lod_name):
+            try:
+                self.download(lod_name)
+                json_path = self.data_path(lod_name)
+            except Exception as ex:
+                # the local copy is still usable
+                print(f"Could not revalidate {lod_name}: {str(ex)}", file=sys.stderr)
+        if json_path:
             try:
-                with open(json_path) as json_file:
+                with open(json_path, "rb") as json_file:
                     json_str = json_file.read()
-                    lod = orjson.loads(json_str)
+                if json_path.endswith(".zst"):
+                    json_str = zstandard.ZstdDecompressor().decompress(json_str)
+                lod = orjson.loads(json_str)
             except Exception as ex:
                 msg = f"Could not read {lod_name} from {json_path} due to {str(ex)}"
                 raise Exception(msg)
+        elif self.is_jsonl_current(lod_name):
+            with JsonLinesCache(self.jsonl_path(lod_name)) as jsonl_cache:
+                lod = list(jsonl_cache)
         else:
             try:
-                url = f"{self.base_url}/{lod_name}.json"
-                with urllib.request.urlopen(url) as source:
-                    json_str = source.read()
-                    lod = orjson.loads(json_str)
+                lod = self.download(lod_name)
             except Exception as ex:
-                msg = f"Could not read {lod_name} from {url} due to {str(ex)}"
+                msg = f"Could not read {lod_name} from {self.remote_url(lod_name)} due to {str(ex)}"
                 raise Exception(msg)
         return lod
 
-    def store(self, lod_name: str, lod: list):
+    def remote_url(self, lod_name: str) -> str:
+        """
+        get the url of the remote copy of the given cache
+        """
+        return f"{self.base_url}/{lod_name}{self.remote_ext}"
+
+    def needs_revalidation(self, lod_name: str) -> bool:
+        """
+        check whether the given cache was downloaded and has not been
+        checked for revalidate_after seconds
+        """
+        if self.revalidate_after is None:
+            return False
+        meta = self.get_meta(lod_name) or {}
+        remote = meta.get("remote")
+        if not remote or remote.get("url") != self.remote_url(lod_name):
+            return False
+        return time.time() - remote.get("checked", 0) > self.revalidate_after
+
+    @staticmethod
+    def read_stream(response, gzipped: bool, chunk_size: int = 64 * 1024) -> bytes:
+        """
+        read the body of the given streamed response - decompressing a gzipped
+        file chunk by chunk
+
+        Args:
+            response(requests.Response): the response
+            gzipped(bool): True if the body is a gzip file
+            chunk_size(int): the size of the chunks to read
+
+        Returns:
+            bytes: the (decompressed) body
+        """
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzipped else None
+        body = bytearray()
+        for chunk in response.iter_content(chunk_size):
+            body += decompressor.decompress(chunk) if decompressor else chunk
+        if decompressor:
+            body += decompressor.flush()
+        return bytes(body)
+
+    def download(self, lod_name: str) -> Optional[list]:
+        """
+        download the given cache from my base url and store it
+
+        if the cache was downloaded before the request is conditional
+        on the ETag and Last-Modified validators of the former download
+
+        Args:
+            lod_name(str): the name of the list of dicts cache to download
+
+        Returns:
+            list: the list of dicts or None if the stored cache is still current
+        """
+        url = self.remote_url(lod_name)
+        meta = self.get_meta(lod_name) or {}
+        remote = meta.get("remote") or {}
+        headers = {}
+        if self.data_path(lod_name) and remote.get("url") == url:
+            if remote.get("etag"):
+                headers["If-None-Match"] = remote["etag"]
+            if remote.get("last_modified"):
+                headers["If-Modified-Since"] = remote["last_modified"]
+        http_client = HttpClient.get_instance()
+        with http_client.get(url, headers=headers, stream=True) as response:
+            if response.status_code == 304:
+                remote["checked"] = time.time()
+                meta["remote"] = remote
+                self.write_atomic(self.meta_path(lod_name), orjson.dumps(meta))
+                return None
+            response.raise_for_status()
+            json_str = self.read_stream(response, gzipped=url.endswith(".gz"))
+        lod = orjson.loads(json_str)
+        remote = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "checked": time.time(),
+        }
+        self.store(
+            lod_name, lod, compress=meta.get("compression") is not None, remote=remote
+        )
+        return lod
+
+    def store(
+        self,
+        lod_name: str,
+        lod: list,
+        compress: bool = False,
+        remote: Optional[Dict[str, Any]] = None,
+    ):
         """
-        store my list of dicts
+        store my list of dicts atomically together with its header
 
         Args:
             lod_name(str): the name of the list of dicts cache to write
             lod(list): the list of dicts to write
+            compress(bool): if True write a zstd compressed .json.zst instead of the .json
+                if zstandard is installed
+            remote(dict): the url and validators if the list of dicts was downloaded
         """
-        with open(self.json_path(lod_name), "wb") as json_file:
-            json_str = orjson.dumps(lod)
-            json_file.write(json_str)
-            pass
+        json_str = orjson.dumps(lod)
+        compression = "zstd" if compress and HAS_ZSTD else None
+        if compression:
+            data = zstandard.ZstdCompressor(level=10).compress(json_str)
+            data_path, other_path = self.zst_path(lod_name), self.json_path(lod_name)
+        else:
+            data = json_str
+            data_path, other_path = self.json_path(lod_name), self.zst_path(lod_name)
+        self.write_atomic(data_path, data)
+        meta = {
+            "schema_version": self.schema_version,
+            "count": len(lod),
+            "size": len(data),
+            "compression": compression,
+            "timestamp": datetime.now().isoformat(),
+        }
+        if remote:
+            meta["remote"] = remote
+        self.write_atomic(self.meta_path(lod_name), orjson.dumps(meta))
+        # the other version is outdated now
+        if os.path.isfile(other_path):
+            os.remove(other_path)
+        # keep the JSON lines copy in sync if there is one
+        if os.path.isfile(self.jsonl_path(lod_name)):
+            JsonLinesCache.write(
+                lod, self.jsonl_path(lod_name), self.keys.get(lod_name)
+            )
@@ -0,0 +1,296 @@
+"""
+Created on 2024-03-16
+
+@author: wf
+"""
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import orjson
+
+
+class JsonLinesCache:
+    """
+    memory mapped list of dicts cache
+
+    the records are kept as JSON lines and a sidecar index file holds the
+    offsets of the lines and - if a key field is given - the records sorted
+    by the 64 bit hash of their key. Only the records that are accessed
+    are decoded so that iterating, projecting and looking up records
+    of large caches does not need the memory for the whole list of dicts.
+
+    the index header holds the size and modification time of the JSON lines
+    file it was written for so that a pair of files from different writes
+    is detected on open.
+    """
+
+    magic = b"SPFJLX02"
+    # magic, record count, key count, data size, data modification time in ns
+    header = struct.Struct("<8sQQQQ")
+    offset = struct.Struct("<Q")
+    key_entry = struct.Struct("<QQ")
+
+    def __init__(self, path: str):
+        """
+        constructor
+
+        Args:
+            path(str): the path of the JSON lines file - the index is expected at path.idx
+        """
+        self.path = path
+        self.index_path = self.index_path_of(path)
+        self.file = open(path, "rb")
+        self.index_file = open(self.index_path, "rb")
+        # an empty file can not be memory mapped
+        self.mm = (
+            mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            if os.path.getsize(path) > 0
+            else b""
+        )
+        self.index = mmap.mmap(self.index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if not self.matches(self.header.unpack_from(self.index, 0), path):
+            self.close()
+            raise ValueError(f"{self.index_path} is not the index of {path}")
+        _magic, self.count, self.key_count, _size, _mtime = self.header.unpack_from(
+            self.index, 0
+        )
+        self.offsets_start = self.header.size
+        self.keys_start = self.offsets_start + (self.count + 1) * self.offset.size
+        self.key_field = None
+        if self.key_count:
+            key_field_start = self.keys_start + self.key_count * self.key_entry.size
+            self.key_field = self.index[key_field_start:].decode("utf-8")
+
+    def close(self):
+        """
+        close my memory maps and files
+        """
+        if isinstance(self.mm, mmap.mmap):
+            self.mm.close()
+        self.index.close()
+        self.file.close()
+        self.index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_args):
+        self.close()
+
+    @staticmethod
+    def index_path_of(path: str) -> str:
+        """
+        get the path of the index file for the given JSON lines file
+        """
+        return f"{path}.idx"
+
+    @classmethod
+    def matches(cls, header: tuple, path: str) -> bool:
+        """
+        check whether the given index header belongs to the given JSON lines file
+
+        Args:
+            header(tuple): the unpacked index header
+            path(str): the path of the JSON lines file
+
+        Returns:
+            bool: True if the magic, the size and the modification time match
+        """
+        magic, _count, _key_count, size, mtime_ns = header
+        stat = os.stat(path)
+        return magic == cls.magic and (size, mtime_ns) == (
+            stat.st_size,
+            stat.st_mtime_ns,
+        )
+
+    @classmethod
+    def is_valid(cls, path: str) -> bool:
+        """
+        check whether the given JSON lines file and its index exist and
+        belong to the same write - only the header of the index is read
+
+        Args:
+            path(str): the path of the JSON lines file
+
+        Returns:
+            bool: True if the cache can be opened
+        """
+        try:
+            with open(cls.index_path_of(path), "rb") as index_file:
+                header = index_file.read(cls.header.size)
+            return len(header) == cls.header.size and cls.matches(
+                cls.header.unpack(header), path
+            )
+        except OSError:
+            return False
+
+    @staticmethod
+    def temp_file(path: str):
+        """
+        create a unique temporary file in the directory of the given path
+
+        Returns:
+            tuple: the open binary file and its path
+        """
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(path) or ".", prefix=f".{os.path.basename(path)}."
+        )
+        return os.fdopen(fd, "wb"), tmp_path
+
+    @staticmethod
+    def hash_of(key: Any) -> int:
+        """
+        get the 64 bit hash of the given key value
+        """
+        digest = hashlib.blake2b(str(key).encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "little")
+
+    @classmethod
+    def write(
+        cls, lod: Iterable[Dict[str, Any]], path: str, key: Optional[str] = None
+    ) -> int:
+        """
+        write the given list of dicts as JSON lines with an index
+
+        the files are written to unique temporary files first and then renamed
+        so that readers never see a partial cache - the index records the size
+        and modification time of the data so that a reader detects a data file
+        without its matching index e.g. after a crash between the renames
+
+        Args:
+            lod(Iterable[Dict]): the records
+            path(str): the path of the JSON lines file
+            key(str): optional name of the field for the random access by key
+
+        Returns:
+            int: the number of records written
+        """
+        offsets = [0]
+        key_entries = []
+        index_path = cls.index_path_of(path)
+        jsonl_file, tmp_path = cls.temp_file(path)
+        tmp_index_path = None
+        try:
+            with jsonl_file:
+                for row, record in enumerate(lod):
+                    line = orjson.dumps(record) + b"\n"
+                    jsonl_file.write(line)
+                    offsets.append(offsets[-1] + len(line))
+                    if key and record.get(key) is not None:
+                        key_entries.append((cls.hash_of(record[key]), row))
+            key_entries.sort()
+            count = len(offsets) - 1
+            # os.replace keeps the size and modification time of the data
+            stat = os.stat(tmp_path)
+            index_file, tmp_index_path = cls.temp_file(index_path)
+            with index_file:
+                index_file.write(
+                    cls.header.pack(
+                        cls.magic,
+                        count,
+                        len(key_entries),
+                        stat.st_size,
+                        stat.st_mtime_ns,
+                    )
+                )
+                index_file.write(struct.pack(f"<{len(offsets)}Q", *offsets))
+                for key_hash, row in key_entries:
+                    index_file.write(cls.key_entry.pack(key_hash, row))
+                if key_entries:
+                    index_file.write(key.encode("utf-8"))
+            os.replace(tmp_path, path)
+            os.replace(tmp_index_path, index_path)
+        except BaseException:
+            for leftover in (tmp_path, tmp_index_path):
+                if leftover and os.path.isfile(leftover):
+                    os.unlink(leftover)
+            raise
+        return count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def offset_at(self, row: int) -> int:
+        """
+        get the offset of the line of the given row
+        """
+        return self.offset.unpack_from(
+            self.index, self.offsets_start + row * self.offset.size
+        )[0]
+
+    def line_at(self, row: int) -> bytes:
+        """
+        get the JSON line of the given row
+        """
+        if row < 0 or row >= self.count:
+            raise IndexError(f"row {row} out of range 0-{self.count - 1}")
+        return self.mm[self.offset_at(row) : self.offset_at(row + 1)]
+
+    def __getitem__(self, row: int) -> Dict[str, Any]:
+        """
+        get the record of the given row
+        """
+        return orjson.loads(self.line_at(row))
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """
+        iterate over the records decoding one record at a time
+        """
+        for row in range(self.count):
+            yield self[row]
+
+    def project(self, fields: List[str]) -> Iterator[Dict[str, Any]]:
+        """
+        iterate over the given fields of the records
+
+        each record is still decoded completely - only the memory for the
+        whole list of dicts is saved, not the decoding time
+
+        Args:
+            fields(List[str]): the names of the fields
+
+        Yields:
+            Dict[str, Any]: the selected fields of the next record
+        """
+        for record in self:
+            yield {field: record.get(field) for field in fields}
+
+    def get(self, key: Any) -> Optional[Dict[str, Any]]:
+        """
+        get the record with the given key value
+
+        Args:
+            key: the value of the key field
+
+        Returns:
+            Dict[str, Any]: the record or None if there is no record with the given key
+        """
+        if not self.key_count:
+            raise ValueError(f"{self.path} has no key index")
+        key_hash = self.hash_of(key)
+        lo, hi = 0, self.key_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            mid_hash, _row = self.key_entry.unpack_from(
+                self.index, self.keys_start + mid * self.key_entry.size
+            )
+            if mid_hash < key_hash:
+                lo = mid + 1
+            else:
+                hi = mid
+        # check the records with the same hash for the actual key
+        while lo < self.key_count:
+            entry_hash, row = self.key_entry.unpack_from(
+                self.index, self.keys_start + lo * self.key_entry.size
+            )
+            if entry_hash != key_hash:
+                break
+            record = self[row]
+            if str(record.get(self.key_field)) == str(key):
+                return record
+            lo += 1
+        return None
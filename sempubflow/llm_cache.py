@@ -0,0 +1,176 @@
+"""
+Created on 2024-03-08
+
+@author: wf
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+from typing import Optional
+
+
+class LlmResponseCache:
+    """
+    persistent SQLite cache for large language model responses
+
+    the responses are keyed by a hash of prompt, text, model and temperature.
+    If the total size of the responses exceeds max_bytes the least recently
+    used responses are evicted
+    """
+
+    def __init__(
+        self, db_path: Optional[str] = None, max_bytes: int = 64 * 1024 * 1024
+    ):
+        """
+        constructor
+
+        Args:
+            db_path(str): the path to the SQLite database file - default: ~/.ceurws/llm_cache.db
+            max_bytes(int): the maximum total size of the cached responses
+        """
+        self.db_path = db_path or os.path.expanduser("~/.ceurws/llm_cache.db")
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.create_schema()
+
+    def connect(self) -> sqlite3.Connection:
+        """
+        get a connection to my database
+        """
+        connection = sqlite3.connect(self.db_path)
+        return connection
+
+    def create_schema(self):
+        """
+        create my table and index if they do not exist yet
+        """
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with closing(self.connect()) as connection, connection:
+            connection.executescript(
+                """
+CREATE TABLE IF NOT EXISTS llm_response (
+  key TEXT PRIMARY KEY,
+  model TEXT,
+  temperature REAL,
+  response TEXT NOT NULL,
+  size INTEGER NOT NULL,
+  last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS llm_response_last_access
+  ON llm_response(last_access);
+"""
+            )
+
+    @staticmethod
+    def key_of(prompt: str, text: Optional[str], model: str, temperature: float) -> str:
+        """
+        get the cache key for the given request
+
+        Args:
+            prompt(str): the prompt
+            text(str): the text the prompt is applied to
+            model(str): the name of the model
+            temperature(float): the sampling temperature
+
+        Returns:
+            str: the hex sha256 digest of the request
+        """
+        request = json.dumps([prompt, text, model, float(temperature)])
+        return hashlib.sha256(request.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        get the cached response for the given key
+
+        Args:
+            key(str): the cache key
+
+        Returns:
+            str: the response or None if it is not cached
+        """
+        with closing(self.connect()) as connection, connection:
+            row = connection.execute(
+                "SELECT response FROM llm_response WHERE key=?", (key,)
+            ).fetchone()
+            if row:
+                connection.execute(
+                    "UPDATE llm_response SET last_access=? WHERE key=?",
+                    (time.time(), key),
+                )
+        if row:
+            self.hits += 1
+            return row[0]
+        self.misses += 1
+        return None
+
+    def put(self, key: str, response: str, model: str = None, temperature=None):
+        """
+        cache the given response and evict the least recently used
+        responses if the size limit is exceeded
+
+        Args:
+            key(str): the cache key
+            response(str): the response
+            model(str): the name of the model
+            temperature(float): the sampling temperature
+        """
+        size = len(response.encode("utf-8"))
+        with closing(self.connect()) as connection, connection:
+            connection.execute(
+                """INSERT OR REPLACE INTO llm_response
+                (key, model, temperature, response, size, last_access)
+                VALUES (?, ?, ?, ?, ?, ?)""",
+                (key, model, temperature, response, size, time.time()),
+            )
+            self.evict(connection)
+
+    def evict(self, connection: sqlite3.Connection):
+        """
+        delete the least recently used responses until the total size fits into max_bytes
+        """
+        total = connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM llm_response"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for key, size in connection.execute(
+            "SELECT key, size FROM llm_response ORDER BY last_access"
+        ):
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        connection.executemany("DELETE FROM llm_response WHERE key=?", evicted)
+
+    def ask(
+        self, llm, prompt: str, text: Optional[str], model: str, temperature: float
+    ) -> Optional[str]:
+        """
+        ask the given llm unless the response is cached
+
+        Args:
+            llm(LLM): the large language model to ask on a cache miss
+            prompt(str): the prompt
+            text(str): the text the prompt is applied to
+            model(str): the name of the model
+            temperature(float): the sampling temperature
+
+        Returns:
+            str: the response or None if it is not cached and the llm is not available
+        """
+        key = self.key_of(prompt, text, model, temperature)
+        response = self.get(key)
+        if response is None and llm.available():
+            response = llm.ask(
+                f"{prompt}\n{text}", model=model, temperature=temperature
+            )
+            if response is not None:
+                self.put(key, response, model=model, temperature=temperature)
+        return response
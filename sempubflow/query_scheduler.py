@@ -0,0 +1,158 @@
+"""
+Created on 2024-03-11
+
+@author: wf
+"""
+import asyncio
+import functools
+import sys
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, Optional
+
+
+class QueryScheduler:
+    """
+    debouncing and coalescing scheduler for queries triggered by input changes
+
+    a query is started only after the input paused for delay seconds and at
+    least min_interval seconds after the start of the former query. Triggers
+    arriving while a query is running are merged into a single follow up query.
+
+    The number of concurrent backend queries of all schedulers of the server
+    process is limited by max_backend_queries - see backend_slot
+    """
+
+    max_backend_queries = 8
+    # one semaphore per event loop
+    backend_semaphores: Dict[
+        asyncio.AbstractEventLoop, asyncio.Semaphore
+    ] = weakref.WeakKeyDictionary()
+
+    def __init__(
+        self,
+        query: Callable[[], Awaitable],
+        delay: float = 0.3,
+        min_interval: float = 1.0,
+        on_error: Optional[Callable[[Exception], None]] = None,
+    ):
+        """
+        constructor
+
+        Args:
+            query(Callable): the coroutine function to call
+            delay(float): the pause in seconds to wait for after the last trigger
+            min_interval(float): the minimum time in seconds between the starts of two queries
+            on_error(Callable): optional handler for exceptions of the query
+        """
+        self.query = query
+        self.delay = delay
+        self.min_interval = min_interval
+        self.on_error = on_error
+        self.task: Optional[asyncio.Task] = None
+        self.last_trigger = 0.0
+        self.last_start = -min_interval
+        self.trigger_count = 0
+        self.query_count = 0
+
+    @classmethod
+    def backend_semaphore(cls) -> asyncio.Semaphore:
+        """
+        get the semaphore of the global backend query limit of the running event loop
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = cls.backend_semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(cls.max_backend_queries)
+            cls.backend_semaphores[loop] = semaphore
+        return semaphore
+
+    @classmethod
+    @asynccontextmanager
+    async def backend_slot(cls):
+        """
+        async context manager for a slot of the global backend query limit
+        """
+        async with cls.backend_semaphore():
+            yield
+
+    @classmethod
+    async def call_in_slot(cls, func: Callable, *args):
+        """
+        call the given blocking backend query in a thread within a backend slot
+
+        a thread can not be stopped - if the caller is cancelled the slot is
+        only released when the thread has finished so that the limit also
+        holds for abandoned queries
+
+        Args:
+            func(Callable): the blocking function
+            *args: the arguments of the function
+
+        Returns:
+            the result of the function
+        """
+        semaphore = cls.backend_semaphore()
+        await semaphore.acquire()
+        future = asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(func, *args)
+        )
+
+        def release(done: asyncio.Future):
+            semaphore.release()
+            if not done.cancelled():
+                # mark the exception of an abandoned query as retrieved
+                done.exception()
+
+        future.add_done_callback(release)
+        return await asyncio.shield(future)
+
+    def trigger(self, *_args):
+        """
+        request a query - may be used directly as an on_change handler
+        """
+        self.last_trigger = time.monotonic()
+        self.trigger_count += 1
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def run(self):
+        """
+        wait for a pause and run the query until all triggers are handled
+        """
+        while True:
+            due = max(
+                self.last_trigger + self.delay, self.last_start + self.min_interval
+            )
+            wait = due - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            handled = self.trigger_count
+            self.last_start = time.monotonic()
+            self.query_count += 1
+            try:
+                await self.query()
+            except Exception as ex:
+                if self.on_error:
+                    self.on_error(ex)
+                else:
+                    print(str(ex), file=sys.stderr)
+            if self.trigger_count == handled:
+                break
+
+    async def wait(self):
+        """
+        wait until all pending queries are done
+        """
+        while self.task is not None and not self.task.done():
+            await self.task
+
+    def cancel(self):
+        """
+        cancel the pending and running query
+        """
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
@@ -3,15 +3,17 @@ Created 2023
 
 @author: th
 """
-from typing import List, Optional
+import asyncio
+from typing import List, Optional, Tuple
 
 from ngwidgets.profiler import Profiler
 from nicegui import run, ui
 
 from sempubflow.elements.suggestion import ScholarSuggestion
 from sempubflow.models.scholar import Scholar
-from sempubflow.services.dblp import Dblp
-from sempubflow.services.wikidata import Wikidata
+from sempubflow.query_scheduler import QueryScheduler
+from sempubflow.services.scholar_index import ScholarIndex
+from sempubflow.services.scholar_service import ScholarService
 
 
 class ScholarSelector:
@@ -27,10 +29,20 @@ class ScholarSelector:
         self.profilers = {
             "dblp": Profiler("dblp search", profile=True, with_start=False),
             "wikidata": Profiler("wikidata search", profile=True, with_start=False),
+            "total": Profiler("scholar search", profile=True, with_start=False),
         }
+        # the generation of the current input - results of former generations are discarded
+        self.query_generation = 0
+        self.query_tasks: List[asyncio.Task] = []
+        # wait for a pause in typing and merge rapid edits into one query
+        self.query_scheduler = QueryScheduler(
+            self.suggest_scholars, on_error=self.webserver.handle_exception
+        )
         ui.add_head_html(
             '<link rel="stylesheet" href="https://cdn.jsdelivr.net/gh/jpswalsh/academicons@1/css/academicons.min.css">'
         )
+        # local name index for instant completion shared by all sessions - None if not built
+        self.scholar_index = ScholarIndex.get_instance()
         self.selected_scholar: Optional[Scholar] = None
         self.suggestion_list_wd: Optional[ui.element] = None
         self.suggestion_list_dblp: Optional[ui.element] = None
@@ -49,13 +61,13 @@ class ScholarSelector:
                         self.given_name_input = ui.input(
                             label="given_name",
                             placeholder="""given name""",
-                            on_change=self.suggest_scholars,
+                            on_change=self.on_input_change,
                             value=scholar.given_name,
                         )
                         self.family_name_input = ui.input(
                             label="family_name",
                             placeholder="""family name""",
-                            on_change=self.suggest_scholars,
+                            on_change=self.on_input_change,
                             value=scholar.family_name,
                         )
                     with ui.row():
@@ -66,12 +78,12 @@ class ScholarSelector:
                                 "orcid_id": "ORCID",
                             },
                             value="wikidata_id",
-                            on_change=self.suggest_scholars,
+                            on_change=self.on_input_change,
                         ).props("inline")
                         self.identifier_input = ui.input(
                             label="identifier",
                             placeholder="""identifier-""",
-                            on_change=self.suggest_scholars,
+                            on_change=self.on_input_change,
                             value=scholar.wikidata_id,
                         )
                 with splitter.after:
@@ -86,49 +98,140 @@ class ScholarSelector:
                             "rounded-md border-2"
                         )
 
+    def on_input_change(self, _args=None):
+        """
+        react on a change of the search input
+        """
+        self.cancel_queries()
+        self.query_scheduler.trigger()
+
+    def cancel_queries(self):
+        """
+        cancel the queries for the former input and discard their results
+        """
+        self.query_generation += 1
+        for task in self.query_tasks:
+            task.cancel()
+        self.query_tasks = []
+
     async def suggest_scholars(self):
         """
         based on given input suggest potential scholars
 
-        Returns:
-            List of scholars
+        dblp and wikidata are queried concurrently and each suggestion list
+        is updated as soon as its result arrives. New input cancels the
+        queries of the former input.
         """
         search_mask = self._get_search_mask()
         name = search_mask.name
+        self.cancel_queries()
+        generation = self.query_generation
         if len(name) >= 6:  # quick fix to avoid queries on empty input fields
-            self.profilers["dblp"].start()
-            suggested_scholars_dblp = await run.io_bound(
-                Dblp().get_scholar_suggestions, search_mask
-            )
-            self.update_suggestion_list(
-                self.suggestion_list_dblp, suggested_scholars_dblp
+            self.profilers["total"].start()
+            self.query_tasks = [
+                asyncio.create_task(
+                    self.suggest_scholars_from(backend, search_mask, generation)
+                )
+                for backend in ["dblp", "wikidata"]
+            ]
+            await asyncio.gather(*self.query_tasks, return_exceptions=True)
+            if generation == self.query_generation:
+                self.profilers["total"].time(f" {name}")
+
+    async def suggest_scholars_from(
+        self, backend: str, search_mask: Scholar, generation: int
+    ):
+        """
+        query the given backend and show the suggestions
+        unless the input changed in the meantime
+
+        Args:
+            backend: "dblp" or "wikidata"
+            search_mask: the search mask to query for
+            generation: the generation of the input of the search mask
+        """
+        try:
+            self.profilers[backend].start()
+            suggestions = []
+            total = None
+            if backend == "wikidata" and self.scholar_index:
+                # the lookup may touch pages of the index file - keep it off the event loop
+                suggestions = await run.io_bound(
+                    self.scholar_index.get_scholar_suggestions, search_mask
+                )
+            if not suggestions:
+                # the remote query is the fallback for misses of the local index
+                suggestions, total = await self.query_backend(backend, search_mask)
+            if generation != self.query_generation:
+                # stale result of a former input
+                return
+            self.profilers[backend].time(f" {search_mask.name}")
+            container = (
+                self.suggestion_list_dblp
+                if backend == "dblp"
+                else self.suggestion_list_wd
             )
-            self.profilers["dblp"].time(f" {name}")
-            self.profilers["wikidata"].start()
-            suggested_scholars_wd = await run.io_bound(
-                Wikidata().get_scholar_suggestions, search_mask
+            self.update_suggestion_list(container, suggestions, total)
+        except Exception as ex:
+            self.webserver.handle_exception(ex)
+
+    async def query_backend(
+        self, backend: str, search_mask: Scholar
+    ) -> Tuple[List[Scholar], Optional[int]]:
+        """
+        query the suggestions of the given backend and - for wikidata - the
+        number of all matches concurrently
+
+        Args:
+            backend: "dblp" or "wikidata"
+            search_mask: the search mask to query for
+
+        Returns:
+            the suggestions and the total number of matches if known
+        """
+        scholar_service = ScholarService.get_instance()
+
+        async def call(func):
+            # the slot is held until the thread is done even if the query is cancelled
+            return await QueryScheduler.call_in_slot(func, backend, search_mask)
+
+        if backend == "wikidata":
+            suggestions, total = await asyncio.gather(
+                call(scholar_service.get_scholar_suggestions),
+                call(scholar_service.count_scholars),
             )
-            self.profilers["wikidata"].time(f" {name}")
-            self.update_suggestion_list(self.suggestion_list_wd, suggested_scholars_wd)
+        else:
+            suggestions = await call(scholar_service.get_scholar_suggestions)
+            total = len(suggestions)
+        return suggestions, total
 
-    def update_suggestion_list(self, container: ui.element, suggestions: List[Scholar]):
+    def update_suggestion_list(
+        self,
+        container: ui.element,
+        suggestions: List[Scholar],
+        total: Optional[int] = None,
+        max_shown: int = 10,
+    ):
         """
-        update the suggestions list
+        update the suggestions list with the first suggestions and the number of all matches
+
+        Args:
+            container: the suggestion list element
+            suggestions: the suggestions
+            total: the total number of matches - default: the number of suggestions
+            max_shown: the maximum number of suggestions to show
         """
+        total = total if total is not None else len(suggestions)
+        shown = suggestions[:max_shown]
         container.clear()
         with container:
-            if len(suggestions) <= 10:
-                with ui.scroll_area():
-                    for scholar in suggestions:
-                        ScholarSuggestion(
-                            scholar=scholar, on_select=self.select_scholar_suggestion
-                        )
-            else:
-                ui.spinner(size="lg")
-                ui.label(
-                    f"{'>' if len(suggestions) == 10000 else ''}{len(suggestions)} matches..."
-                )
-        return []
+            if total > len(shown):
+                ui.label(f"{len(shown)} of {total} matches")
+            with ui.scroll_area():
+                for scholar in shown:
+                    ScholarSuggestion(
+                        scholar=scholar, on_select=self.select_scholar_suggestion
+                    )
 
     def select_scholar_suggestion(self, scholar: Scholar):
         """
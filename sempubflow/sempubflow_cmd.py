@@ -4,9 +4,15 @@ Created on 2023-06-19
 @author: wf
 """
 import sys
+from argparse import ArgumentParser
 
 from ngwidgets.cmd import WebserverCmd
+from tqdm import tqdm
 
+from sempubflow.homepage import HomepageChecker
+from sempubflow.services.scholar_index import DblpIdIndex, ScholarIndex
+from sempubflow.snapshot_store import SnapshotStore
+from sempubflow.text_extraction import TextExtractionPipeline
 from sempubflow.webserver import SemPubFlowWebServer
 
 
@@ -23,6 +29,121 @@ class SemPubFlowCmd(WebserverCmd):
         WebserverCmd.__init__(self, config, SemPubFlowWebServer, DEBUG)
         pass
 
+    def add_arguments(self, parser: ArgumentParser):
+        """
+        add the Semantic Publishing Workflow specific arguments
+
+        Args:
+            parser (ArgumentParser): the parser to add arguments to
+        """
+        super().add_arguments(parser)
+        parser.add_argument(
+            "--extract-texts",
+            action="store_true",
+            help="extract the texts of the available volume homepages into the homepage cache - use --force to also extract homepages that already have a text [default: %(default)s]",
+        )
+        parser.add_argument(
+            "--build-scholar-index",
+            action="store_true",
+            help="build the local scholar name and dblp id indexes from Wikidata [default: %(default)s]",
+        )
+        parser.add_argument(
+            "--wikidataEndpoint",
+            default=None,
+            help="the Wikidata SPARQL endpoint for --build-scholar-index [default: QLever]",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            type=int,
+            default=100,
+            help="save the homepage cache after this many extracted texts [default: %(default)s]",
+        )
+        parser.add_argument(
+            "--maxConcurrency",
+            type=int,
+            default=16,
+            help="maximum number of downloads in flight [default: %(default)s]",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="number of parser processes [default: number of CPUs]",
+        )
+        parser.add_argument(
+            "--snapshots",
+            action="store_true",
+            help="keep raw html snapshots and replay existing ones [default: %(default)s]",
+        )
+        parser.add_argument(
+            "--offline",
+            action="store_true",
+            help="only replay the raw html snapshots without any download [default: %(default)s]",
+        )
+
+    def extract_texts(self, args):
+        """
+        extract the texts of the available volume homepages
+
+        Args:
+            args: the parsed command line arguments
+        """
+        checker = HomepageChecker(debug=args.debug)
+        snapshot_store = None
+        if args.snapshots or args.offline:
+            snapshot_store = SnapshotStore()
+        progress_bar = tqdm(desc="Extracting homepage texts", unit="page")
+        pipeline = TextExtractionPipeline(
+            checker,
+            max_concurrency=args.maxConcurrency,
+            workers=args.workers,
+            checkpoint_every=args.checkpoint,
+            force=args.force,
+            snapshot_store=snapshot_store,
+            offline=args.offline,
+            progress_bar=progress_bar,
+            debug=args.debug,
+        )
+        pipeline.run()
+        progress_bar.close()
+        print(
+            f"{pipeline.extracted} homepage texts extracted, {pipeline.failed} failed"
+        )
+
+    def build_scholar_index(self, args):
+        """
+        build the local scholar name and dblp id indexes at their default paths
+
+        Args:
+            args: the parsed command line arguments
+        """
+        path = ScholarIndex.default_path()
+        count = ScholarIndex.build_from_wikidata(
+            path,
+            endpoint_url=args.wikidataEndpoint,
+            dblp_path=DblpIdIndex.default_path(),
+        )
+        print(f"{count} scholar index entries written to {path}")
+
+    def handle_args(self, args) -> bool:
+        """
+        handle the command line arguments
+
+        Args:
+            args: the parsed command line arguments
+
+        Returns:
+            bool: True if any argument was handled
+        """
+        handled = super().handle_args(args)
+        if args.build_scholar_index:
+            self.build_scholar_index(args)
+            handled = True
+        if args.extract_texts:
+            self.extract_texts(args)
+            handled = True
+        return handled
+
 
 def main(argv: list = None):
     """
@@ -3,12 +3,13 @@ Created 2023
 
 @author: th
 """
-from typing import List, Optional
+from typing import Iterator, List, Optional
 
-import requests
 from lodstorage.sparql import SPARQL
 
+from sempubflow.http_client import HttpClient
 from sempubflow.models.scholar import Scholar
+from sempubflow.services.scholar_index import DblpIdIndex
 
 
 class Dblp:
@@ -17,35 +18,116 @@ class Dblp:
     https://dblp.org/
     """
 
-    def __init__(self, sparql_endpoint_url: Optional[str] = None, endpoint_url: Optional[str] = None):
+    pid_prefix = "https://dblp.org/pid/"
+
+    def __init__(
+            self,
+            sparql_endpoint_url: Optional[str] = None,
+            endpoint_url: Optional[str] = None,
+            mode: Optional[str] = None,
+            id_index: Optional[DblpIdIndex] = None
+    ):
+        """
+        constructor
+
+        Args:
+            sparql_endpoint_url: the dblp SPARQL endpoint
+            endpoint_url: the dblp author search API
+            mode: "api+sparql" for a second round-trip to the SPARQL endpoint for the
+                Wikidata and ORCID ids recorded by dblp or "api" for a single round-trip to
+                the author search API with the ids taken from the local id index -
+                the id index is built from Wikidata so it misses the ids of dblp persons
+                without a Wikidata item - default: "api+sparql"
+            id_index: the local dblp id index for the "api" mode - default: the index at
+                the default path shared by the process
+        """
+        if mode is None:
+            mode = "api+sparql"
+        if id_index is None and mode == "api":
+            id_index = DblpIdIndex.get_instance()
+        self.id_index = id_index
+        self.mode = mode
         if sparql_endpoint_url is None:
             sparql_endpoint_url = "https://sparql.dblp.org/sparql"
         if endpoint_url is None:
             endpoint_url = "https://dblp.uni-trier.de/search/author/api"
         self.sparql_endpoint = SPARQL(sparql_endpoint_url)
         self.endpoint_url = endpoint_url
+        self.http_client = HttpClient.get_instance()
 
-    def get_scholar_suggestions(self, search_mask: Scholar) -> List[Scholar]:
+    def search_authors(self, search_mask: Scholar) -> List[dict]:
         """
-        Given a search mask query wikidata  for matching scholars
+        query the dblp author search API with the names of the given search mask
+
         Args:
-            search_mask:
+            search_mask: the search mask
 
         Returns:
-
+            the hits of the API
         """
-        payload = {}
-        headers = {}
         params = {
             "format": "json",
             "q": f"{search_mask.given_name} {search_mask.family_name}"
         }
-
-        response = requests.request("GET", self.endpoint_url, headers=headers, data=payload, params=params)
+        response = self.http_client.get(self.endpoint_url, params=params)
         qres = response.json()
         qres_hits = qres.get("result").get("hits").get("hit")
+        return qres_hits or []
+
+    def get_scholar_suggestions(self, search_mask: Scholar) -> List[Scholar]:
+        """
+        Given a search mask query dblp for matching scholars
+        Args:
+            search_mask:
+
+        Returns:
+            the suggested scholars
+        """
+        if self.mode == "api":
+            res = list(self.iter_scholar_suggestions(search_mask))
+        else:
+            res = self.get_scholar_suggestions_via_sparql(search_mask)
+        return res
+
+    def iter_scholar_suggestions(self, search_mask: Scholar) -> Iterator[Scholar]:
+        """
+        Given a search mask get matching scholars with a single round-trip to the
+        dblp author search API - the Wikidata and ORCID ids are looked up in the local id index
+
+        Args:
+            search_mask: the search mask
+
+        the reply of the API is parsed completely before the first scholar is yielded -
+        only the id lookups and the creation of the scholars are done lazily
+
+        Yields:
+            the scholar of each hit
+        """
+        for hit in self.search_authors(search_mask):
+            info = hit.get("info", {})
+            url = info.get("url", "")
+            dblp_author_id = url[len(self.pid_prefix):] if url.startswith(self.pid_prefix) else None
+            scholar = Scholar(label=info.get("author"), dblp_author_id=dblp_author_id)
+            known = self.id_index.lookup(dblp_author_id) if self.id_index and dblp_author_id else None
+            if known is not None:
+                scholar.wikidata_id = known.wikidata_id
+                scholar.orcid_id = known.orcid_id
+            yield scholar
+
+    def get_scholar_suggestions_via_sparql(self, search_mask: Scholar) -> List[Scholar]:
+        """
+        Given a search mask get matching scholars from the author search API
+        and their ids with a second round-trip to the dblp SPARQL endpoint
+
+        Args:
+            search_mask: the search mask
+
+        Returns:
+            the suggested scholars
+        """
+        qres_hits = self.search_authors(search_mask)
         res = []
-        if qres_hits is not None:
+        if qres_hits:
             hits = [hit.get("info").get("url") for hit in qres_hits]
             scholar_urls = "\n".join([f"<{url}>" for url in hits])
             query = f"""
@@ -0,0 +1,450 @@
+"""
+Created on 2024-03-12
+
+@author: wf
+"""
+import mmap
+import os
+import struct
+import threading
+import unicodedata
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from lodstorage.sparql import SPARQL
+
+from sempubflow.models.scholar import Scholar
+
+
+class ScholarIndex:
+    """
+    local name index of scholars with their Wikidata, dblp and ORCID ids
+
+    the index is built offline into a single file that is memory mapped for
+    lookups. The file holds the entries sorted by their normalized name key
+    and an array of the entry offsets for a binary search. Each scholar
+    is indexed as "given family" and "family given" so that a prefix of
+    either name finds it.
+    """
+
+    magic = b"SPFSIX01"
+    header = struct.Struct("<8sQ")
+    offset = struct.Struct("<Q")
+    fields = [
+        "label",
+        "given_name",
+        "family_name",
+        "wikidata_id",
+        "dblp_author_id",
+        "orcid_id",
+    ]
+
+    file_name = "scholars.idx"
+    # the shared instances of the server process by index class
+    instances: Dict[type, "ScholarIndex"] = {}
+    instance_lock = threading.Lock()
+
+    def __init__(self, path: str):
+        """
+        constructor
+
+        Args:
+            path(str): the path of the index file
+        """
+        self.path = path
+        self.file = open(path, "rb")
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = self.header.unpack_from(self.mm, 0)
+        if magic != self.magic:
+            raise ValueError(f"{path} is not a {self.__class__.__name__} file")
+        self.offsets_start = self.header.size
+        self.data_start = self.offsets_start + (self.count + 1) * self.offset.size
+
+    def close(self):
+        """
+        close my memory map and file
+        """
+        self.mm.close()
+        self.file.close()
+
+    @classmethod
+    def default_path(cls) -> str:
+        """
+        get the default path of the index file
+        """
+        return os.path.expanduser(f"~/.ceurws/{cls.file_name}")
+
+    @classmethod
+    def open_default(cls) -> Optional["ScholarIndex"]:
+        """
+        open the index at the default path
+
+        Returns:
+            ScholarIndex: the index or None if it has not been built
+        """
+        path = cls.default_path()
+        if not os.path.isfile(path):
+            return None
+        return cls(path)
+
+    @classmethod
+    def get_instance(cls) -> Optional["ScholarIndex"]:
+        """
+        get the shared index at the default path of the server process
+
+        Returns:
+            ScholarIndex: the index or None if it has not been built yet
+        """
+        with cls.instance_lock:
+            index = cls.instances.get(cls)
+            if index is None:
+                index = cls.open_default()
+                if index is not None:
+                    cls.instances[cls] = index
+        return index
+
+    @staticmethod
+    def normalize(name: Optional[str]) -> str:
+        """
+        normalize the given name to lower case ascii letters where possible
+        and single spaces
+        """
+        if not name:
+            return ""
+        decomposed = unicodedata.normalize("NFKD", name)
+        stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+        normalized = " ".join(stripped.lower().replace("\t", " ").split())
+        return normalized
+
+    @classmethod
+    def keys_of(cls, scholar: Scholar) -> List[str]:
+        """
+        get the name keys of the given scholar
+        """
+        given_name = cls.normalize(scholar.given_name)
+        family_name = cls.normalize(scholar.family_name)
+        if not given_name and not family_name:
+            return [cls.normalize(scholar.label)] if scholar.label else []
+        keys = {f"{given_name} {family_name}".strip()}
+        if given_name and family_name:
+            keys.add(f"{family_name} {given_name}")
+        return sorted(keys)
+
+    @classmethod
+    def build(cls, scholars: Iterable[Scholar], path: str) -> int:
+        """
+        build an index file for the given scholars
+
+        Args:
+            scholars(Iterable[Scholar]): the scholars
+            path(str): the path of the index file
+
+        Returns:
+            int: the number of index entries
+        """
+        entries: List[Tuple[bytes, bytes]] = []
+        for scholar in scholars:
+            values = "\t".join(
+                (getattr(scholar, field) or "").replace("\t", " ").replace("\n", " ")
+                for field in cls.fields
+            )
+            for key in cls.keys_of(scholar):
+                entries.append((key.encode("utf-8"), values.encode("utf-8")))
+        entries = sorted(set(entries))
+        index_dir = os.path.dirname(path)
+        if index_dir:
+            os.makedirs(index_dir, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as index_file:
+            index_file.write(cls.header.pack(cls.magic, len(entries)))
+            offset = 0
+            lines = []
+            for key, values in entries:
+                index_file.write(cls.offset.pack(offset))
+                line = key + b"\t" + values + b"\n"
+                lines.append(line)
+                offset += len(line)
+            index_file.write(cls.offset.pack(offset))
+            for line in lines:
+                index_file.write(line)
+        os.replace(tmp_path, path)
+        return len(entries)
+
+    @classmethod
+    def build_from_wikidata(
+        cls,
+        path: str,
+        endpoint_url: Optional[str] = None,
+        limit: int = 10000000,
+        dblp_path: Optional[str] = None,
+    ) -> int:
+        """
+        build the index for the scholars in Wikidata that have a dblp or ORCID id
+
+        Args:
+            path(str): the path of the index file
+            endpoint_url(str): the SPARQL endpoint - default: QLever Wikidata
+            limit(int): the maximum number of query results
+            dblp_path(str): optional path of a DblpIdIndex file to build from the same scholars
+
+        Returns:
+            int: the number of index entries
+        """
+        endpoint_url = endpoint_url or "https://qlever.cs.uni-freiburg.de/api/wikidata"
+        query = f"""
+            PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+            PREFIX wd: <http://www.wikidata.org/entity/>
+            PREFIX wdt: <http://www.wikidata.org/prop/direct/>
+            SELECT ?scholar ?label ?given_name ?family_name ?dblp_author_id ?orcid_id
+            WHERE
+            {{
+              ?scholar wdt:P31 wd:Q5 .
+              {{ ?scholar wdt:P2456 ?dblp_author_id . }} UNION {{ ?scholar wdt:P496 ?orcid_id . }}
+              OPTIONAL{{ ?scholar rdfs:label ?label FILTER(lang(?label) = "en") }}
+              OPTIONAL{{ ?scholar wdt:P735/rdfs:label ?given_name FILTER(lang(?given_name) = "en") }}
+              OPTIONAL{{ ?scholar wdt:P734/rdfs:label ?family_name FILTER(lang(?family_name) = "en") }}
+            }}
+            LIMIT {limit}
+        """
+        lod = SPARQL(endpoint_url).queryAsListOfDicts(query)
+        # merge the rows of the dblp and ORCID branches
+        scholars: Dict[str, Scholar] = {}
+        for record in lod:
+            qid = record.get("scholar", "").replace(
+                "http://www.wikidata.org/entity/", ""
+            )
+            if not qid:
+                continue
+            scholar = scholars.setdefault(qid, Scholar(wikidata_id=qid))
+            for field in cls.fields:
+                if field != "wikidata_id" and record.get(field):
+                    setattr(scholar, field, getattr(scholar, field) or record[field])
+        count = cls.build(scholars.values(), path)
+        if dblp_path:
+            DblpIdIndex.build(scholars.values(), dblp_path)
+        return count
+
+    def offset_at(self, index: int) -> int:
+        """
+        get the data offset of the entry with the given index
+        """
+        return self.offset.unpack_from(
+            self.mm, self.offsets_start + index * self.offset.size
+        )[0]
+
+    def key_at(self, index: int) -> bytes:
+        """
+        get the key of the entry with the given index
+        """
+        start = self.data_start + self.offset_at(index)
+        end = self.mm.find(b"\t", start)
+        return self.mm[start:end]
+
+    def entry_at(self, index: int) -> Tuple[str, Scholar]:
+        """
+        get the key and scholar of the entry with the given index
+        """
+        start = self.data_start + self.offset_at(index)
+        end = self.data_start + self.offset_at(index + 1) - 1
+        key, *values = self.mm[start:end].decode("utf-8").split("\t")
+        scholar = Scholar(
+            **{field: value or None for field, value in zip(self.fields, values)}
+        )
+        return key, scholar
+
+    def lower_bound(self, key: bytes) -> int:
+        """
+        get the index of the first entry with a key not less than the given key
+        """
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def prefix_search(
+        self,
+        prefix: str,
+        limit: int = 10,
+        predicate: Optional[Callable[[Scholar], bool]] = None,
+        max_scan: Optional[int] = None,
+    ) -> List[Scholar]:
+        """
+        get the scholars with a name starting with the given prefix
+
+        Args:
+            prefix(str): the name prefix
+            limit(int): the maximum number of scholars
+            predicate(Callable): optional filter for the scholars
+            max_scan(int): the maximum number of entries to check - default: no limit
+
+        Returns:
+            List[Scholar]: the scholars in key order
+        """
+        key_prefix = self.normalize(prefix).encode("utf-8")
+        scholars = []
+        seen = set()
+        index = self.lower_bound(key_prefix)
+        end = self.count if max_scan is None else min(self.count, index + max_scan)
+        while index < end and len(scholars) < limit:
+            if not self.key_at(index).startswith(key_prefix):
+                break
+            _key, scholar = self.entry_at(index)
+            scholar_id = scholar.wikidata_id or scholar.dblp_author_id or scholar.label
+            if scholar_id not in seen and (predicate is None or predicate(scholar)):
+                seen.add(scholar_id)
+                scholars.append(scholar)
+            index += 1
+        return scholars
+
+    @staticmethod
+    def distance(a: str, b: str, max_distance: int) -> int:
+        """
+        get the Levenshtein distance of the given strings
+        or max_distance+1 if it is larger than max_distance
+        """
+        if abs(len(a) - len(b)) > max_distance:
+            return max_distance + 1
+        previous = list(range(len(b) + 1))
+        for i, ca in enumerate(a, 1):
+            current = [i]
+            for j, cb in enumerate(b, 1):
+                current.append(
+                    min(
+                        previous[j] + 1,
+                        current[j - 1] + 1,
+                        previous[j - 1] + (ca != cb),
+                    )
+                )
+            if min(current) > max_distance:
+                return max_distance + 1
+            previous = current
+        return previous[-1]
+
+    def fuzzy_search(
+        self,
+        prefix: str,
+        limit: int = 10,
+        max_distance: Optional[int] = None,
+        max_scan: int = 50000,
+    ) -> List[Scholar]:
+        """
+        get the scholars with a name starting with a string close to the given prefix
+
+        the candidates are the entries sharing the first two characters of the prefix
+
+        Args:
+            prefix(str): the name prefix
+            limit(int): the maximum number of scholars
+            max_distance(int): the maximum edit distance - default: 1 for short prefixes and 2 otherwise
+            max_scan(int): the maximum number of candidates to check
+
+        Returns:
+            List[Scholar]: the scholars by ascending distance
+        """
+        query = self.normalize(prefix)
+        if max_distance is None:
+            max_distance = 1 if len(query) <= 5 else 2
+        anchor = query[:2].encode("utf-8")
+        matches = []
+        seen = set()
+        index = self.lower_bound(anchor)
+        end = min(self.count, index + max_scan)
+        while index < end:
+            key = self.key_at(index).decode("utf-8")
+            if not key.encode("utf-8").startswith(anchor):
+                break
+            # compare with the key prefix of the same length for completion
+            distance = self.distance(query, key[: len(query)], max_distance)
+            if distance <= max_distance:
+                _key, scholar = self.entry_at(index)
+                scholar_id = scholar.wikidata_id or scholar.dblp_author_id
+                if scholar_id not in seen:
+                    seen.add(scholar_id)
+                    matches.append((distance, index, scholar))
+            index += 1
+        matches.sort(key=lambda match: match[:2])
+        return [scholar for _distance, _index, scholar in matches[:limit]]
+
+    def get_scholar_suggestions(
+        self, search_mask: Scholar, limit: int = 10, max_scan: int = 5000
+    ) -> List[Scholar]:
+        """
+        get the scholars matching the names of the given search mask
+        by prefix and - if there is no prefix match - by fuzzy search
+
+        with both names given the "family given" key is searched by prefix.
+        Only if there is no match - e.g. for a partial family name - the
+        entries with the family name prefix are checked for the given name
+        up to max_scan entries
+
+        Args:
+            search_mask(Scholar): the search mask
+            limit(int): the maximum number of scholars
+            max_scan(int): the maximum number of entries to check for a partial family name
+
+        Returns:
+            List[Scholar]: the matching scholars - empty for a miss
+        """
+        name = " ".join(
+            part for part in [search_mask.given_name, search_mask.family_name] if part
+        )
+        if not name.strip():
+            return []
+        if search_mask.given_name and search_mask.family_name:
+            given_name = self.normalize(search_mask.given_name)
+            scholars = self.prefix_search(
+                f"{search_mask.family_name} {search_mask.given_name}", limit
+            )
+            if not scholars:
+                scholars = self.prefix_search(
+                    search_mask.family_name,
+                    limit,
+                    predicate=lambda scholar: self.normalize(
+                        scholar.given_name
+                    ).startswith(given_name),
+                    max_scan=max_scan,
+                )
+        else:
+            scholars = self.prefix_search(name, limit)
+        if not scholars:
+            scholars = self.fuzzy_search(name, limit)
+        return scholars
+
+
+class DblpIdIndex(ScholarIndex):
+    """
+    local table of the Wikidata and ORCID ids of scholars by their dblp person id
+
+    uses the file format of the ScholarIndex with the dblp id as key
+    """
+
+    magic = b"SPFDID01"
+    file_name = "dblp_ids.idx"
+
+    @classmethod
+    def keys_of(cls, scholar: Scholar) -> List[str]:
+        """
+        get the dblp id key of the given scholar
+        """
+        key = cls.normalize(scholar.dblp_author_id)
+        return [key] if key else []
+
+    def lookup(self, dblp_author_id: str) -> Optional[Scholar]:
+        """
+        get the scholar with the given dblp id
+
+        Args:
+            dblp_author_id(str): the dblp person id e.g. d/StefanDecker
+
+        Returns:
+            Scholar: the scholar or None if the id is unknown
+        """
+        key = self.normalize(dblp_author_id).encode("utf-8")
+        index = self.lower_bound(key)
+        scholar = None
+        if index < self.count and self.key_at(index) == key:
+            _key, scholar = self.entry_at(index)
+        return scholar
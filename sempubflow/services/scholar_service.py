@@ -0,0 +1,283 @@
+"""
+Created on 2024-03-13
+
+@author: wf
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from functools import partial
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from sempubflow.models.scholar import Scholar
+from sempubflow.services.dblp import Dblp
+from sempubflow.services.wikidata import Wikidata
+
+
+class TTLCache:
+    """
+    thread safe least recently used cache whose entries expire after ttl seconds
+    """
+
+    def __init__(self, max_size: int = 1000, ttl: float = 3600.0):
+        """
+        constructor
+
+        Args:
+            max_size(int): the maximum number of entries
+            ttl(float): the time to live of an entry in seconds
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """
+        get the value for the given key
+
+        Returns:
+            Tuple[bool, Any]: found flag and value
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > time.monotonic():
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self.entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key: Hashable, value: Any):
+        """
+        put the given value and evict the least recently used entries
+        """
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        """
+        remove all entries
+        """
+        with self.lock:
+            self.entries.clear()
+
+
+class SingleFlight:
+    """
+    coalesce concurrent calls with the same key into a single call
+    """
+
+    def __init__(self):
+        """
+        constructor
+        """
+        self.lock = threading.Lock()
+        self.calls: Dict[Hashable, Future] = {}
+
+    def do(self, key: Hashable, func: Callable, *args) -> Any:
+        """
+        call the given function unless a call with the same key is in flight
+        in which case its result is awaited and shared
+
+        Args:
+            key(Hashable): the key of the call
+            func(Callable): the function to call
+            *args: the arguments of the function
+
+        Returns:
+            the result of the function
+        """
+        with self.lock:
+            future = self.calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.calls[key] = future
+        if not leader:
+            return future.result()
+        try:
+            result = func(*args)
+            future.set_result(result)
+            return result
+        except BaseException as ex:
+            future.set_exception(ex)
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+
+
+class ClientPool:
+    """
+    pool of service clients that are not thread safe
+
+    each client is used by a single thread at a time and
+    kept for reuse after the call
+    """
+
+    def __init__(self, factory: Callable[[], Any], max_idle: int = 8):
+        """
+        constructor
+
+        Args:
+            factory(Callable): creates a new client
+            max_idle(int): the maximum number of idle clients to keep
+        """
+        self.factory = factory
+        self.max_idle = max_idle
+        self.idle: List[Any] = []
+        self.lock = threading.Lock()
+        self.created = 0
+
+    @contextmanager
+    def client(self):
+        """
+        context manager for an idle or new client
+        """
+        with self.lock:
+            client = self.idle.pop() if self.idle else None
+        if client is None:
+            client = self.factory()
+            with self.lock:
+                self.created += 1
+        try:
+            yield client
+        finally:
+            with self.lock:
+                if len(self.idle) < self.max_idle:
+                    self.idle.append(client)
+
+
+class ScholarService:
+    """
+    shared access to the scholar suggestion backends of the server process
+
+    clients are pooled, results are cached by the normalized search mask
+    and concurrent identical queries share one backend request
+    """
+
+    # the Wikidata suggestions are capped to the best ranked scholars - see count_scholars
+    factories: Dict[str, Callable[[], Any]] = {
+        "dblp": Dblp,
+        "wikidata": partial(Wikidata, top_k=10),
+    }
+    instance: Optional["ScholarService"] = None
+    instance_lock = threading.Lock()
+
+    def __init__(
+        self,
+        factories: Optional[Dict[str, Callable[[], Any]]] = None,
+        max_size: int = 1000,
+        ttl: float = 3600.0,
+    ):
+        """
+        constructor
+
+        Args:
+            factories(Dict[str, Callable]): client factories by backend name - default: dblp and wikidata
+            max_size(int): the maximum number of cached results
+            ttl(float): the time to live of the cached results in seconds
+        """
+        factories = factories or self.factories
+        self.pools = {name: ClientPool(factory) for name, factory in factories.items()}
+        self.cache = TTLCache(max_size=max_size, ttl=ttl)
+        self.single_flight = SingleFlight()
+        self.lock = threading.Lock()
+        self.backend_calls = 0
+
+    @classmethod
+    def get_instance(cls) -> "ScholarService":
+        """
+        get the shared instance of the server process
+        """
+        with cls.instance_lock:
+            if cls.instance is None:
+                cls.instance = cls()
+        return cls.instance
+
+    @staticmethod
+    def search_key(backend: str, search_mask: Scholar) -> Tuple:
+        """
+        get the cache key for the given backend and search mask
+
+        whitespace is normalized and empty fields are ignored - the case is
+        kept since e.g. the Wikidata REGEX filter is case sensitive
+        """
+        values = []
+        for field in [
+            "given_name",
+            "family_name",
+            "wikidata_id",
+            "dblp_author_id",
+            "orcid_id",
+        ]:
+            value = getattr(search_mask, field, None)
+            value = " ".join(value.split()) if value else None
+            values.append(value or None)
+        return (backend, *values)
+
+    def query(self, key: Tuple, backend: str, method: str, search_mask: Scholar) -> Any:
+        """
+        call the given method of a pooled client of the given backend and cache the result
+        """
+        with self.lock:
+            self.backend_calls += 1
+        with self.pools[backend].client() as client:
+            result = getattr(client, method)(search_mask)
+        # cache before the single flight call ends so that no later call misses
+        self.cache.put(key, result)
+        return result
+
+    def call(self, backend: str, method: str, search_mask: Scholar) -> Any:
+        """
+        get the cached result of the given method of the given backend for the
+        given search mask or call it once for all concurrent callers
+        """
+        key = (method, *self.search_key(backend, search_mask))
+        found, result = self.cache.get(key)
+        if not found:
+            result = self.single_flight.do(
+                key, self.query, key, backend, method, search_mask
+            )
+        return result
+
+    def get_scholar_suggestions(
+        self, backend: str, search_mask: Scholar
+    ) -> List[Scholar]:
+        """
+        get the scholar suggestions of the given backend for the given search mask
+
+        Args:
+            backend(str): "dblp" or "wikidata"
+            search_mask(Scholar): the search mask
+
+        Returns:
+            List[Scholar]: the suggested scholars
+        """
+        scholars = self.call(backend, "get_scholar_suggestions", search_mask)
+        return scholars
+
+    def count_scholars(self, backend: str, search_mask: Scholar) -> int:
+        """
+        count the scholars of the given backend matching the given search mask
+
+        Args:
+            backend(str): a backend with a count_scholars method e.g. "wikidata"
+            search_mask(Scholar): the search mask
+
+        Returns:
+            int: the number of matching scholars
+        """
+        count = self.call(backend, "count_scholars", search_mask)
+        return count
@@ -15,57 +15,97 @@ class Wikidata:
     Wikdata access
     """
 
-    def __init__(self, endpoint_url: Optional[str] = None, limit:int=5000):
+    def __init__(self, endpoint_url: Optional[str] = None, limit:int=5000, top_k: Optional[int] = None):
+        """
+        constructor
+
+        Args:
+            endpoint_url: the SPARQL endpoint - default: QLever Wikidata
+            limit: the maximum number of rows of a full suggestion query
+            top_k: if set get_scholar_suggestions only returns the k best ranked scholars
+        """
         if endpoint_url is None:
             endpoint_url = "https://qlever.cs.uni-freiburg.de/api/wikidata"
         self.endpoint = SPARQL(endpoint_url)
         self.limit=limit
+        self.top_k = top_k
 
-    def get_scholar_suggestions(self, search_mask: Scholar) -> List[Scholar]:
+    @staticmethod
+    def literal(value: str) -> str:
         """
-        Given a search mask query wikidata  for matching scholars
-        Args:
-            search_mask:
-
-        Returns:
+        get the given value as SPARQL string literal
+        """
+        escaped = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+        return f'"{escaped}"'
 
+    def get_filters(self, search_mask: Scholar) -> str:
+        """
+        get the filters for the given search mask
         """
         filters = ""
         if search_mask.given_name:
-            filters += f"""\nFILTER(REGEX(?given_name, "{search_mask.given_name}"))"""
+            filters += f"""\nFILTER(REGEX(?given_name, {self.literal(search_mask.given_name)}))"""
         if search_mask.family_name:
-            filters += f"""\nFILTER(REGEX(?family_name, "{search_mask.family_name}"))"""
+            filters += f"""\nFILTER(REGEX(?family_name, {self.literal(search_mask.family_name)}))"""
         if search_mask.wikidata_id:
-            filters += f"""VALUES ?scholar {{wd:{search_mask.wikidata_id} }}"""
-        query = f"""
-            PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-            PREFIX wd: <http://www.wikidata.org/entity/>
-            PREFIX wdt: <http://www.wikidata.org/prop/direct/>
-            SELECT *
-            WHERE 
-            {{
+            filters += f"""\nVALUES ?scholar {{wd:{search_mask.wikidata_id} }}"""
+        return filters
+
+    def get_name_pattern(self, search_mask: Scholar) -> str:
+        """
+        get the graph pattern for the scholars with names matching the given search mask
+        """
+        pattern = f"""
               ?scholar wdt:P31 wd:Q5 .
               ?scholar wdt:P735 ?_given_name .
               ?_given_name rdfs:label ?given_name .
               ?scholar wdt:P734 ?_family_name .
               ?_family_name rdfs:label ?family_name .
-              OPTIONAL{{ ?scholar rdfs:label ?label FILTER(lang(?label) = "en") }}.
-              OPTIONAL{{?scholar wdt:P2456 ?dblp_author_id .}}
-              OPTIONAL{{?scholar wdt:P496 ?orcid_id . }}
-              OPTIONAL{{?scholar wdt:P18 ?image . }}
               FILTER(lang(?given_name) = "en")
               FILTER(lang(?family_name) = "en")
-              {filters}
-              
-            }}
-            LIMIT {self.limit}
+              {self.get_filters(search_mask)}
+        """
+        return pattern
+
+    def get_prefixes(self) -> str:
+        """
+        get the prefixes of my queries
+        """
+        prefixes = """
+            PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+            PREFIX wd: <http://www.wikidata.org/entity/>
+            PREFIX wdt: <http://www.wikidata.org/prop/direct/>
+        """
+        return prefixes
+
+    def get_score(self, search_mask: Scholar) -> str:
+        """
+        get the expression for the rank of a scholar for the given search mask
+
+        exact matches of the given names come first then scholars with a
+        dblp id and then scholars with an ORCID id
+        """
+        exact = []
+        for var, value in [("given_name", search_mask.given_name), ("family_name", search_mask.family_name)]:
+            if value:
+                exact.append(f"LCASE(STR(?{var})) = {self.literal(value.strip().lower())}")
+        exact_score = f"IF({' && '.join(exact)}, 4, 0)" if exact else "0"
+        score = f"{exact_score} + IF(BOUND(?dblp_author_id), 2, 0) + IF(BOUND(?orcid_id), 1, 0)"
+        return score
+
+    def get_scholars(self, query: str) -> List[Scholar]:
+        """
+        get the scholars for the given query - rows of the same scholar are merged
         """
         lod = self.endpoint.queryAsListOfDicts(query)
         res = []
+        scholars = {}
         for d in lod:
             qid = d.get("scholar", None)
             if qid:
                 qid = qid.replace("http://www.wikidata.org/entity/", "")
+                if qid in scholars:
+                    continue
                 scholar = Scholar(
                     label=d.get("label", None),
                     given_name=d.get("given_name", None),
@@ -74,6 +114,91 @@ class Wikidata:
                     orcid_id=d.get("orcid_id", None),
                     dblp_author_id=d.get("dblp_author_id", None),
                     image=d.get("image", None),
-            )
-            res.append(scholar)
-        return res
\ No newline at end of file
+                )
+                scholars[qid] = scholar
+                res.append(scholar)
+        return res
+
+    def get_scholar_suggestions(self, search_mask: Scholar) -> List[Scholar]:
+        """
+        Given a search mask query wikidata  for matching scholars
+        Args:
+            search_mask:
+
+        Returns:
+            the top_k ranked scholars if top_k is set otherwise up to limit scholars
+        """
+        if self.top_k:
+            return self.get_top_scholars(search_mask, self.top_k)
+        query = f"""{self.get_prefixes()}
+            SELECT *
+            WHERE
+            {{
+              {self.get_name_pattern(search_mask)}
+              OPTIONAL{{ ?scholar rdfs:label ?label FILTER(lang(?label) = "en") }}.
+              OPTIONAL{{?scholar wdt:P2456 ?dblp_author_id .}}
+              OPTIONAL{{?scholar wdt:P496 ?orcid_id . }}
+              OPTIONAL{{?scholar wdt:P18 ?image . }}
+            }}
+            LIMIT {self.limit}
+        """
+        return self.get_scholars(query)
+
+    def count_scholars(self, search_mask: Scholar) -> int:
+        """
+        count the scholars matching the given search mask without transferring them
+
+        Args:
+            search_mask: the search mask
+
+        Returns:
+            the number of matching scholars
+        """
+        query = f"""{self.get_prefixes()}
+            SELECT (COUNT(DISTINCT ?scholar) AS ?count)
+            WHERE
+            {{
+              {self.get_name_pattern(search_mask)}
+            }}
+        """
+        lod = self.endpoint.queryAsListOfDicts(query)
+        count = int(lod[0].get("count", 0)) if lod else 0
+        return count
+
+    def get_top_scholars(self, search_mask: Scholar, k: int = 10) -> List[Scholar]:
+        """
+        get the k best ranked scholars matching the given search mask - see get_score
+
+        Args:
+            search_mask: the search mask
+            k: the number of scholars
+
+        Returns:
+            the scholars by descending rank
+        """
+        query = f"""{self.get_prefixes()}
+            SELECT ?scholar ?label ?given_name ?family_name ?dblp_author_id ?orcid_id ?image ?rank
+            WHERE
+            {{
+              {{
+                SELECT ?scholar (MAX(?score) AS ?rank)
+                WHERE
+                {{
+                  {self.get_name_pattern(search_mask)}
+                  OPTIONAL{{?scholar wdt:P2456 ?dblp_author_id .}}
+                  OPTIONAL{{?scholar wdt:P496 ?orcid_id . }}
+                  BIND({self.get_score(search_mask)} AS ?score)
+                }}
+                GROUP BY ?scholar
+                ORDER BY DESC(?rank) ?scholar
+                LIMIT {k}
+              }}
+              {self.get_name_pattern(search_mask)}
+              OPTIONAL{{ ?scholar rdfs:label ?label FILTER(lang(?label) = "en") }}.
+              OPTIONAL{{?scholar wdt:P2456 ?dblp_author_id .}}
+              OPTIONAL{{?scholar wdt:P496 ?orcid_id . }}
+              OPTIONAL{{?scholar wdt:P18 ?image . }}
+            }}
+            ORDER BY DESC(?rank) ?scholar
+        """
+        return self.get_scholars(query)
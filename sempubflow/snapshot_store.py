@@ -0,0 +1,184 @@
+"""
+Created on 2024-03-07
+
+@author: wf
+"""
+import hashlib
+import os
+import tempfile
+import zlib
+from typing import Iterator, Optional
+
+from sempubflow.html_text import extract_text
+
+try:
+    import zstandard
+
+    HAS_ZSTD = True
+except ImportError:  # pragma: no cover - zstandard is optional
+    HAS_ZSTD = False
+
+
+class SnapshotStore:
+    """
+    content addressed store for raw html snapshots
+
+    each snapshot is kept once per sha256 hash of its bytes in a file
+    named by the hash below a two character fan out directory. The files are
+    zstd compressed if zstandard is installed and zlib compressed otherwise
+    """
+
+    def __init__(self, root: Optional[str] = None, level: int = 10):
+        """
+        constructor
+
+        Args:
+            root(str): the root directory - default: ~/.ceurws/snapshots
+            level(int): the compression level
+        """
+        self.root = root or os.path.expanduser("~/.ceurws/snapshots")
+        self.level = level
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def hash_of(html: bytes) -> str:
+        """
+        get the content hash of the given html
+
+        Args:
+            html(bytes): the raw html
+
+        Returns:
+            str: the hex sha256 digest
+        """
+        return hashlib.sha256(html).hexdigest()
+
+    def path_for(self, digest: str, ext: Optional[str] = None) -> str:
+        """
+        get the path of the snapshot with the given digest
+
+        Args:
+            digest(str): the content hash
+            ext(str): the file extension - default: the one of my compression
+        """
+        if ext is None:
+            ext = ".zst" if HAS_ZSTD else ".z"
+        path = os.path.join(self.root, digest[:2], f"{digest}{ext}")
+        return path
+
+    def find(self, digest: Optional[str]) -> Optional[str]:
+        """
+        find the file of the snapshot with the given digest in any compression
+
+        Returns:
+            str: the path or None if there is no such snapshot
+        """
+        if digest:
+            for ext in (".zst", ".z"):
+                path = self.path_for(digest, ext)
+                if os.path.isfile(path):
+                    return path
+        return None
+
+    def has(self, digest: Optional[str]) -> bool:
+        """
+        check whether there is a snapshot with the given digest
+        """
+        return self.find(digest) is not None
+
+    def compress(self, html: bytes) -> bytes:
+        """
+        compress the given html with zstd or zlib as a fallback
+        """
+        if HAS_ZSTD:
+            data = zstandard.ZstdCompressor(level=self.level).compress(html)
+        else:
+            data = zlib.compress(html, min(self.level, 9))
+        return data
+
+    def put(self, html: bytes) -> str:
+        """
+        store the given html unless a snapshot with the same content exists
+
+        Args:
+            html(bytes): the raw html
+
+        Returns:
+            str: the content hash
+        """
+        digest = self.hash_of(html)
+        if not self.has(digest):
+            path = self.path_for(digest)
+            snapshot_dir = os.path.dirname(path)
+            os.makedirs(snapshot_dir, exist_ok=True)
+            # write to a temporary file first so that readers never see partial snapshots
+            fd, tmp_path = tempfile.mkstemp(dir=snapshot_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as tmp_file:
+                    tmp_file.write(self.compress(html))
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        """
+        get the html of the snapshot with the given digest
+
+        Args:
+            digest(str): the content hash
+
+        Returns:
+            bytes: the raw html
+
+        Raises:
+            KeyError: if there is no such snapshot
+        """
+        path = self.find(digest)
+        if path is None:
+            raise KeyError(digest)
+        with open(path, "rb") as snapshot_file:
+            data = snapshot_file.read()
+        if path.endswith(".zst"):
+            if not HAS_ZSTD:
+                raise ValueError(f"zstandard is needed to read {path}")
+            html = zstandard.ZstdDecompressor().decompress(data)
+        else:
+            html = zlib.decompress(data)
+        return html
+
+    def get_text(
+        self,
+        digest: str,
+        charset: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        parser: Optional[str] = None,
+    ) -> Optional[str]:
+        """
+        replay the text extraction for the snapshot with the given digest
+
+        Args:
+            digest(str): the content hash
+            charset(str): the charset declared when the snapshot was taken
+            max_bytes(int): maximum number of bytes to consume
+            parser(str): "lxml" or "bs4" - default: "lxml" if available
+
+        Returns:
+            str: the normalized text of the body or None if there is no body
+        """
+        html = self.get(digest)
+        text = extract_text(html, charset=charset, max_bytes=max_bytes, parser=parser)
+        return text
+
+    def digests(self) -> Iterator[str]:
+        """
+        iterate over the digests of all snapshots
+        """
+        for sub_dir in sorted(os.listdir(self.root)):
+            snapshot_dir = os.path.join(self.root, sub_dir)
+            if os.path.isdir(snapshot_dir):
+                for file_name in sorted(os.listdir(snapshot_dir)):
+                    digest, ext = os.path.splitext(file_name)
+                    if ext in (".zst", ".z"):
+                        yield digest
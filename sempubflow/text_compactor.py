@@ -0,0 +1,144 @@
+"""
+Created on 2024-03-10
+
+@author: wf
+"""
+import re
+from typing import List, Tuple
+
+
+class TextCompactor:
+    """
+    compact a homepage text to a token budget by keeping the segments
+    that most likely hold event signature elements such as dates, acronyms,
+    ordinals and locations
+    """
+
+    months = (
+        "january|february|march|april|may|june|july|august|september|"
+        "october|november|december|jan|feb|mar|apr|jun|jul|aug|sep|sept|oct|nov|dec"
+    )
+    # pattern name -> (regular expression, weight, flags)
+    patterns = {
+        "iso_date": (r"\b(19|20)\d\d-\d\d-\d\d\b", 3.0, 0),
+        "date": (
+            rf"\b(\d{{1,2}}(st|nd|rd|th)?\s*(-|–|to)?\s*\d{{0,2}}\s*({months})\b|\b({months})\.?\s+\d{{1,2}}\b)",
+            3.0,
+            re.IGNORECASE,
+        ),
+        "year": (r"\b(19|20)\d\d\b", 1.0, 0),
+        "acronym": (
+            r"\b[A-Z][A-Za-z]*[A-Z][A-Za-z\-]*(['’]?\s?(19|20)?\d\d)?\b",
+            1.5,
+            0,
+        ),
+        "ordinal": (
+            r"\b(\d+(st|nd|rd|th)|first|second|third|fourth|fifth|sixth|seventh|eighth|ninth|tenth)\b",
+            2.0,
+            re.IGNORECASE,
+        ),
+        "event": (
+            r"\b(workshop|conference|symposium|challenge|proceedings|international|annual|co-located|held)\b",
+            2.0,
+            re.IGNORECASE,
+        ),
+        "location": (
+            r"\b(held in|venue|location|[A-Z][a-z]+(\s[A-Z][a-z]+)?,\s+[A-Z][a-z]+)\b",
+            2.0,
+            0,
+        ),
+    }
+
+    def __init__(self, token_budget: int = 1000, chars_per_token: float = 4.0):
+        """
+        constructor
+
+        Args:
+            token_budget(int): the maximum number of tokens of the compacted text
+            chars_per_token(float): the number of characters per token for the estimation
+        """
+        self.token_budget = token_budget
+        self.chars_per_token = chars_per_token
+        self.regexes = {
+            name: (re.compile(pattern, flags), weight)
+            for name, (pattern, weight, flags) in self.patterns.items()
+        }
+
+    def estimate_tokens(self, text: str) -> int:
+        """
+        estimate the number of tokens of the given text
+        """
+        return int(len(text) / self.chars_per_token) + 1
+
+    def score(self, segment: str, position: int = 0) -> float:
+        """
+        score the given segment by the signature elements it holds
+
+        Args:
+            segment(str): the segment
+            position(int): the index of the segment - earlier segments get a small bonus
+
+        Returns:
+            float: the score
+        """
+        score = 0.0
+        for regex, weight in self.regexes.values():
+            if regex.search(segment):
+                score += weight
+        if score > 0:
+            # title and dates tend to be at the top of a homepage
+            score += 1.0 / (1 + position)
+        return score
+
+    def segments(self, text: str) -> List[str]:
+        """
+        split the given text into segments - the lines of the normalized text
+        """
+        return [line.strip() for line in text.splitlines() if line.strip()]
+
+    def rank(self, text: str) -> List[Tuple[float, int, str]]:
+        """
+        rank the segments of the given text
+
+        Returns:
+            List[Tuple[float,int,str]]: score, position and segment by descending score
+        """
+        ranked = [
+            (self.score(segment, position), position, segment)
+            for position, segment in enumerate(self.segments(text))
+        ]
+        ranked.sort(key=lambda entry: (-entry[0], entry[1]))
+        return ranked
+
+    def compact(self, text: str, token_budget: int = None) -> str:
+        """
+        compact the given text to the token budget
+
+        the best scoring segments are selected until the budget is used
+        and joined in their original order
+
+        Args:
+            text(str): the text
+            token_budget(int): the budget - default: my token_budget
+
+        Returns:
+            str: the compacted text or the text itself if it fits into the budget
+        """
+        if text is None:
+            return None
+        budget = self.token_budget if token_budget is None else token_budget
+        if self.estimate_tokens(text) <= budget:
+            return text
+        selected = []
+        used = 0
+        for score, position, segment in self.rank(text):
+            if score <= 0:
+                break
+            tokens = self.estimate_tokens(segment)
+            if used + tokens > budget:
+                continue
+            selected.append((position, segment))
+            used += tokens
+        selected.sort()
+        compacted = "\n".join(segment for _position, segment in selected)
+        return compacted
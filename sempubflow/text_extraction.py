@@ -0,0 +1,193 @@
+"""
+Created on 2024-03-06
+
+@author: wf
+"""
+import asyncio
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+from sempubflow.homepage import Homepage, HomepageChecker
+from sempubflow.homepage_crawler import HomepageCrawler
+from sempubflow.html_text import extract_text
+from sempubflow.snapshot_store import SnapshotStore
+
+
+class TextExtractionPipeline:
+    """
+    bulk extraction of the texts of the homepage corpus
+
+    the html is fetched with async I/O in a bounded thread pool while the
+    CPU bound parsing runs in a process pool. The results are checkpointed
+    into the homepage cache every checkpoint_every pages.
+
+    With a snapshot store the raw html is kept and homepages that have a
+    snapshot are replayed from it - in offline mode only those are processed
+    """
+
+    def __init__(
+        self,
+        checker: HomepageChecker,
+        max_concurrency: int = 16,
+        per_host_limit: int = 2,
+        workers: Optional[int] = None,
+        checkpoint_every: int = 100,
+        max_content_len: Optional[int] = 100000,
+        force: bool = False,
+        snapshot_store: Optional[SnapshotStore] = None,
+        offline: bool = False,
+        progress_bar=None,
+        debug: bool = False,
+    ):
+        """
+        constructor
+
+        Args:
+            checker(HomepageChecker): the checker holding the homepage cache
+            max_concurrency(int): maximum number of downloads in flight
+            per_host_limit(int): maximum number of downloads in flight per host
+            workers(int): number of parser processes - default: number of CPUs
+            checkpoint_every(int): save the cache after this many extracted pages
+            max_content_len(int): skip homepages with a larger content length - None for no limit
+            force(bool): if True also extract homepages that already have a text
+            snapshot_store(SnapshotStore): optional store for the raw html snapshots
+            offline(bool): if True only replay the snapshots without any download
+            progress_bar: optional tqdm progress bar to update per homepage
+            debug(bool): if True show errors
+        """
+        self.checker = checker
+        self.max_concurrency = max_concurrency
+        self.per_host_limit = per_host_limit
+        self.workers = workers
+        self.checkpoint_every = checkpoint_every
+        self.max_content_len = max_content_len
+        self.force = force
+        self.snapshot_store = snapshot_store
+        self.offline = offline
+        if offline and snapshot_store is None:
+            raise ValueError("offline extraction needs a snapshot store")
+        self.progress_bar = progress_bar
+        self.debug = debug
+        self.extracted = 0
+        self.failed = 0
+        self.checkpoints = 0
+
+    def select_homepages(self) -> List[Homepage]:
+        """
+        select the available homepages that need a text
+
+        Returns:
+            List[Homepage]: the homepages to extract
+        """
+        selected = []
+        for homepage in self.checker.homepages.homepages:
+            if homepage.text and not self.force:
+                continue
+            if self.offline:
+                if self.snapshot_store.has(homepage.html_hash):
+                    selected.append(homepage)
+                continue
+            if not homepage.available or not homepage.url:
+                continue
+            # pages without a known content length are extracted
+            if (
+                self.max_content_len is not None
+                and homepage.content_len is not None
+                and homepage.content_len > self.max_content_len
+            ):
+                continue
+            selected.append(homepage)
+        return selected
+
+    async def checkpoint(self):
+        """
+        save the homepage cache in a thread so that the downloads go on
+        """
+        async with self.checkpoint_lock:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.checker.save_homepages_cache)
+            self.checkpoints += 1
+
+    async def extract(self, homepage: Homepage):
+        """
+        fetch and parse the text of a single homepage
+
+        Args:
+            homepage(Homepage): the homepage
+        """
+        try:
+            loop = asyncio.get_running_loop()
+            if self.snapshot_store is not None and self.snapshot_store.has(
+                homepage.html_hash
+            ):
+                # replay - reading and decompressing is done by the worker
+                text = await loop.run_in_executor(
+                    self.process_pool,
+                    self.snapshot_store.get_text,
+                    homepage.html_hash,
+                    homepage.charset,
+                )
+            else:
+                if self.snapshot_store is not None:
+                    await self.crawler.call(
+                        homepage, homepage.snapshot, self.snapshot_store
+                    )
+                    html = homepage.html
+                else:
+                    html = await self.crawler.call(homepage, homepage.read)
+                text = await loop.run_in_executor(
+                    self.process_pool, extract_text, html, homepage.charset
+                )
+            homepage.text = text
+            self.extracted += 1
+            if self.extracted % self.checkpoint_every == 0:
+                await self.checkpoint()
+        except Exception as ex:
+            self.failed += 1
+            if self.debug:
+                print(f"{homepage.volume}:{homepage.url} {str(ex)}", file=sys.stderr)
+        if self.progress_bar:
+            self.progress_bar.update(1)
+
+    async def run_async(self, homepages: Optional[List[Homepage]] = None) -> int:
+        """
+        extract the texts of the given or selected homepages
+
+        Args:
+            homepages(List[Homepage]): the homepages - default: select_homepages()
+
+        Returns:
+            int: the number of extracted texts
+        """
+        if homepages is None:
+            homepages = self.select_homepages()
+        if self.progress_bar:
+            self.progress_bar.total = len(homepages)
+        self.crawler = HomepageCrawler(
+            max_concurrency=self.max_concurrency, per_host_limit=self.per_host_limit
+        )
+        self.crawler.open()
+        self.checkpoint_lock = asyncio.Lock()
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as self.process_pool:
+                tasks = [self.extract(homepage) for homepage in homepages]
+                await asyncio.gather(*tasks)
+        finally:
+            self.crawler.close()
+            if self.extracted % self.checkpoint_every != 0:
+                await self.checkpoint()
+        return self.extracted
+
+    def run(self, homepages: Optional[List[Homepage]] = None) -> int:
+        """
+        extract the texts from synchronous code
+
+        Args:
+            homepages(List[Homepage]): the homepages - default: select_homepages()
+
+        Returns:
+            int: the number of extracted texts
+        """
+        extracted = asyncio.run(self.run_async(homepages))
+        return extracted
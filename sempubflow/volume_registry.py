@@ -0,0 +1,223 @@
+"""
+Created on 2024-03-21
+
+@author: wf
+"""
+import threading
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+import numpy as np
+
+from sempubflow.jsoncache import JsonCacheManager
+
+
+class VolumeIndex:
+    """
+    the indexes of a list of CEUR-WS volume records
+
+    lookups by number, acronym, URN and homepage host use dicts, filters
+    use numpy columns of the year and the homepage availability
+    """
+
+    def __init__(self, volumes: List[Dict[str, Any]]):
+        """
+        constructor
+
+        Args:
+            volumes(List[Dict]): the volume records
+        """
+        self.volumes = volumes
+        self.by_number: Dict[int, Dict[str, Any]] = {}
+        self.by_acronym: Dict[str, List[Dict[str, Any]]] = {}
+        self.by_urn: Dict[str, Dict[str, Any]] = {}
+        self.by_host: Dict[str, List[Dict[str, Any]]] = {}
+        years = np.full(len(volumes), -1, dtype=np.int32)
+        has_homepage = np.zeros(len(volumes), dtype=bool)
+        for row, volume in enumerate(volumes):
+            number = VolumeRegistry.as_int(volume.get("number"))
+            if number is not None:
+                self.by_number[number] = volume
+            acronym = volume.get("acronym")
+            if acronym:
+                self.by_acronym.setdefault(acronym.strip().lower(), []).append(volume)
+            urn = volume.get("urn")
+            if urn:
+                self.by_urn[urn.strip().lower()] = volume
+            host = VolumeRegistry.host_of(volume.get("homepage"))
+            if host:
+                has_homepage[row] = True
+                self.by_host.setdefault(host, []).append(volume)
+            year = VolumeRegistry.as_int(volume.get("year"))
+            if year is not None:
+                years[row] = year
+        self.years = years
+        self.has_homepage = has_homepage
+
+
+class VolumeRegistry:
+    """
+    the CEUR-WS volumes of the process loaded lazily once
+
+    use get_instance for the shared registry of the volumes cache or
+    the constructor for a registry of a given list of volume records
+    """
+
+    instance = None
+    instance_lock = threading.Lock()
+
+    def __init__(
+        self,
+        volumes: Optional[List[Dict[str, Any]]] = None,
+        cache_manager: Optional[JsonCacheManager] = None,
+        lod_name: str = "volumes",
+    ):
+        """
+        constructor
+
+        Args:
+            volumes(List[Dict]): the volume records - default: load them from the cache on first use
+            cache_manager(JsonCacheManager): the cache to load the volumes from
+            lod_name(str): the name of the volumes cache
+        """
+        self.cache_manager = cache_manager or JsonCacheManager()
+        self.lod_name = lod_name
+        self.lock = threading.Lock()
+        self.index = VolumeIndex(volumes) if volumes is not None else None
+
+    @classmethod
+    def get_instance(cls) -> "VolumeRegistry":
+        """
+        get the shared registry of the process
+        """
+        with cls.instance_lock:
+            if cls.instance is None:
+                cls.instance = cls()
+        return cls.instance
+
+    @staticmethod
+    def as_int(value) -> Optional[int]:
+        """
+        get the given value as integer
+
+        Returns:
+            int: the value or None if it is not a number
+        """
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def host_of(url: Optional[str]) -> Optional[str]:
+        """
+        get the lower case host name of the given url
+        """
+        if not url or not url.strip():
+            return None
+        try:
+            host = urlparse(url.strip()).hostname
+        except ValueError:
+            return None
+        return host
+
+    def is_available(self) -> bool:
+        """
+        check whether the volumes are loaded or stored locally
+        """
+        return (
+            self.index is not None
+            or self.cache_manager.data_path(self.lod_name) is not None
+        )
+
+    def get_index(self) -> VolumeIndex:
+        """
+        get my index - loading the volumes on first use
+        """
+        if self.index is None:
+            with self.lock:
+                if self.index is None:
+                    self.index = VolumeIndex(self.cache_manager.load_lod(self.lod_name))
+        return self.index
+
+    def reload(self) -> List[Dict[str, Any]]:
+        """
+        reload the volumes from the cache - readers keep the former index until the new one is complete
+
+        Returns:
+            List[Dict]: the volume records
+        """
+        index = VolumeIndex(self.cache_manager.load_lod(self.lod_name))
+        self.index = index
+        return index.volumes
+
+    @property
+    def volumes(self) -> List[Dict[str, Any]]:
+        """
+        the volume records
+        """
+        return self.get_index().volumes
+
+    def __len__(self) -> int:
+        return len(self.volumes)
+
+    def by_number(self, number) -> Optional[Dict[str, Any]]:
+        """
+        get the volume with the given number
+
+        Args:
+            number: the volume number as int or string
+        """
+        return self.get_index().by_number.get(self.as_int(number))
+
+    def by_acronym(self, acronym: str) -> List[Dict[str, Any]]:
+        """
+        get the volumes with the given acronym - ignoring the case
+        """
+        return self.get_index().by_acronym.get(acronym.strip().lower(), [])
+
+    def by_urn(self, urn: str) -> Optional[Dict[str, Any]]:
+        """
+        get the volume with the given URN e.g. urn:nbn:de:0074-3344-9
+        """
+        return self.get_index().by_urn.get(urn.strip().lower())
+
+    def by_host(self, host: str) -> List[Dict[str, Any]]:
+        """
+        get the volumes whose homepage is on the given host
+        """
+        return self.get_index().by_host.get(host.strip().lower(), [])
+
+    def mask(
+        self,
+        year_from: Optional[int] = None,
+        year_to: Optional[int] = None,
+        has_homepage: Optional[bool] = None,
+    ) -> np.ndarray:
+        """
+        get the boolean mask of the volumes matching the given filters
+
+        Args:
+            year_from(int): the first year - volumes without year are excluded
+            year_to(int): the last year - volumes without year are excluded
+            has_homepage(bool): True for volumes with a homepage, False for volumes without
+
+        Returns:
+            np.ndarray: True for the rows of the matching volumes
+        """
+        index = self.get_index()
+        mask = np.ones(len(index.volumes), dtype=bool)
+        if year_from is not None:
+            mask &= index.years >= year_from
+        if year_to is not None:
+            mask &= (index.years <= year_to) & (index.years >= 0)
+        if has_homepage is not None:
+            mask &= index.has_homepage == has_homepage
+        return mask
+
+    def select(self, **filters) -> List[Dict[str, Any]]:
+        """
+        get the volumes matching the given filters - see mask
+        """
+        index = self.get_index()
+        return [index.volumes[row] for row in np.flatnonzero(self.mask(**filters))]
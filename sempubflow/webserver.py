@@ -3,6 +3,7 @@ Created on 2023-06-19
 
 @author: wf
 """
+from ceurws.wikidatasync import DblpEndpoint
 from fastapi.responses import RedirectResponse
 from ngwidgets.input_webserver import InputWebserver, InputWebSolution
 from ngwidgets.login import Login
@@ -11,11 +12,14 @@ from ngwidgets.webserver import WebserverConfig
 from nicegui import Client, app, ui
 
 from sempubflow.admin import Admin
+from sempubflow.cache_warmer import CacheWarmer
+from sempubflow.dblp_delta import DblpDeltaRefresh
 from sempubflow.elements.proceedings_form import ProceedingsForm
 from sempubflow.homepage_selector import HomePageSelector
 from sempubflow.orcid_auth import ORCIDAuth
 from sempubflow.scholar_selector import ScholarSelector
 from sempubflow.version import Version
+from sempubflow.volume_registry import VolumeRegistry
 
 
 
@@ -45,7 +49,11 @@ class SemPubFlowWebServer(InputWebserver):
         users = Users("~/.sempubflow/")
         self.login = Login(self, users)
         self.orcid_auth = ORCIDAuth()
-        pass
+        # preload the caches at startup and keep them fresh in the background
+        self.cache_warmer = CacheWarmer()
+        self.add_warm_caches()
+        app.on_startup(self.cache_warmer.start)
+        app.on_shutdown(self.cache_warmer.stop)
 
         @ui.page("/")
         async def home(client: Client):
@@ -85,6 +93,40 @@ class SemPubFlowWebServer(InputWebserver):
         async def login(client: Client) -> None:
             return await self.page(client, SemPubFlowSolution.show_login)
 
+    def add_warm_caches(self):
+        """
+        register the caches to be preloaded by my cache warmer
+        """
+        day = 24 * 3600
+        self.cache_warmer.add(
+            "volumes",
+            VolumeRegistry.get_instance().reload,
+            refresh_interval=day,
+        )
+        self.cache_warmer.add("dblp", self.load_dblp_caches, refresh_interval=day)
+
+    def load_dblp_caches(self) -> DblpEndpoint:
+        """
+        load the caches of the default dblp endpoint - called from a worker thread
+
+        the first load uses the stored caches, the scheduled refreshes query
+        the endpoint - incrementally for the caches keyed by volume number
+
+        Returns:
+            DblpEndpoint: the endpoint with its caches loaded
+        """
+        refresh = self.cache_warmer.caches["dblp"].load_count > 0
+        endpoint = DblpEndpoint(Admin.default_endpoint_url)
+        for cache_name, cache_function in endpoint.cache_functions.items():
+            if refresh and DblpDeltaRefresh.supports(cache_name):
+                DblpDeltaRefresh(endpoint).refresh(cache_name)
+                # load the merged cache
+                cache_function(force_query=False)
+            else:
+                cache_function(force_query=refresh)
+        return endpoint
+
+
 class SemPubFlowSolution(InputWebSolution):
     """
     the Solution for the Semantic Publishing Workflow
@@ -129,7 +171,7 @@ class SemPubFlowSolution(InputWebSolution):
         """
 
         def show():
-            self.admin_view = Admin(self)
+            self.admin_view = Admin(self, cache_warmer=self.webserver.cache_warmer)
 
         await self.setup_content_div(show)
 
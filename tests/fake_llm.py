@@ -0,0 +1,68 @@
+"""
+Created on 2024-03-08
+
+@author: wf
+"""
+import threading
+import time
+
+
+class RateLimitError(Exception):
+    """
+    stand in for openai.RateLimitError
+    """
+
+    status_code = 429
+
+
+class FakeLLM:
+    """
+    stand in for the large language model counting the requests
+
+    answers with a minimal event record and can simulate latency
+    and rate limit errors
+    """
+
+    def __init__(
+        self,
+        is_available: bool = True,
+        delay: float = 0.0,
+        rate_limited: int = 0,
+        answer=None,
+    ):
+        """
+        constructor
+
+        Args:
+            is_available(bool): the result of available()
+            delay(float): the latency of each answer in seconds
+            rate_limited(int): the number of requests to fail with a RateLimitError
+            answer(Callable): optional function creating the answer from the prompt text
+        """
+        self.is_available = is_available
+        self.delay = delay
+        self.rate_limited = rate_limited
+        self.answer = answer
+        self.prompts = []
+        self.inflight = 0
+        self.max_inflight = 0
+        self.lock = threading.Lock()
+
+    def available(self) -> bool:
+        return self.is_available
+
+    def ask(self, prompt_text: str, model: str = None, temperature: float = 0.7):
+        with self.lock:
+            if self.rate_limited > 0:
+                self.rate_limited -= 1
+                raise RateLimitError("rate limit exceeded")
+            self.prompts.append(prompt_text)
+            count = len(self.prompts)
+            self.inflight += 1
+            self.max_inflight = max(self.max_inflight, self.inflight)
+        time.sleep(self.delay)
+        with self.lock:
+            self.inflight -= 1
+        if self.answer:
+            return self.answer(prompt_text)
+        return f"acronym: ASK{count}\nmodel: {model}\n"
@@ -0,0 +1,213 @@
+"""
+Created on 2024-03-01
+
+@author: wf
+"""
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict
+
+
+class LocalHttpServer:
+    """
+    a local HTTP stand-in for tests
+
+    routes map a path to a handler function that gets the
+    BaseHTTPRequestHandler and is responsible for the response
+    """
+
+    def __init__(self, keep_alive: bool = False):
+        """
+        constructor
+
+        Args:
+            keep_alive(bool): if True use HTTP/1.1 persistent connections
+        """
+        self.routes: Dict[str, Callable[[BaseHTTPRequestHandler], None]] = {}
+        self.requests = []
+        self.inflight = 0
+        self.max_inflight = 0
+        self.connection_count = 0
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" if keep_alive else "HTTP/1.0"
+
+            def setup(self):
+                super().setup()
+                # avoid the delayed ACK stall between headers and body on kept alive connections
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with server.lock:
+                    server.connection_count += 1
+
+            def handle_request(self):
+                path = self.path.split("?")[0]
+                with server.lock:
+                    server.requests.append(
+                        (self.command, self.path, dict(self.headers))
+                    )
+                    server.inflight += 1
+                    server.max_inflight = max(server.max_inflight, server.inflight)
+                try:
+                    route = server.routes.get(path)
+                    if route:
+                        route(self)
+                    else:
+                        self.send_error(404)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    with server.lock:
+                        server.inflight -= 1
+
+            def do_GET(self):
+                self.handle_request()
+
+            def do_HEAD(self):
+                self.handle_request()
+
+            def do_POST(self):
+                content_len = int(self.headers.get("Content-Length", 0))
+                self.body = self.rfile.read(content_len)
+                self.handle_request()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self.base_url = f"http://127.0.0.1:{self.port}"
+
+    def url(self, path: str) -> str:
+        """
+        get the url for the given path
+        """
+        return f"{self.base_url}{path}"
+
+    def start(self) -> "LocalHttpServer":
+        """
+        start serving in a background thread
+        """
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """
+        stop serving
+        """
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def add_html(
+        self,
+        path: str,
+        html: str,
+        delay: float = 0.0,
+        headers: dict = None,
+        etag: str = None,
+        last_modified: str = None,
+        allow_head: bool = True,
+        allow_range: bool = True,
+        encoding: str = "utf-8",
+    ):
+        """
+        serve the given html at the given path optionally after a delay
+
+        supports conditional requests if etag or last_modified are given
+        and single byte ranges if allow_range is set
+        """
+        body = html.encode(encoding)
+
+        def route(handler: BaseHTTPRequestHandler):
+            if delay:
+                time.sleep(delay)
+            if handler.command == "HEAD" and not allow_head:
+                handler.send_error(405)
+                return
+            validators = {}
+            if etag:
+                validators["ETag"] = etag
+            if last_modified:
+                validators["Last-Modified"] = last_modified
+            if_none_match = handler.headers.get("If-None-Match")
+            if_modified_since = handler.headers.get("If-Modified-Since")
+            if (etag and if_none_match == etag) or (
+                not if_none_match
+                and last_modified
+                and if_modified_since == last_modified
+            ):
+                handler.send_response(304)
+                for key, value in validators.items():
+                    handler.send_header(key, value)
+                handler.end_headers()
+                return
+            content = body
+            byte_range = handler.headers.get("Range")
+            if allow_range and byte_range and byte_range.startswith("bytes="):
+                start, end = byte_range[len("bytes=") :].split("-")
+                content = body[int(start) : int(end) + 1]
+                handler.send_response(206)
+                handler.send_header("Content-Range", f"bytes {start}-{end}/{len(body)}")
+            else:
+                handler.send_response(200)
+            handler.send_header("Content-Type", f"text/html; charset={encoding}")
+            handler.send_header("Content-Length", str(len(content)))
+            for key, value in {**validators, **(headers or {})}.items():
+                handler.send_header(key, value)
+            handler.end_headers()
+            if handler.command != "HEAD":
+                handler.wfile.write(content)
+
+        self.routes[path] = route
+
+    def add_json(
+        self,
+        path: str,
+        json_str: str,
+        delay: float = 0.0,
+        content_type: str = "application/json",
+    ):
+        """
+        serve the given json at the given path optionally after a delay
+        """
+        body = json_str.encode("utf-8")
+
+        def route(handler: BaseHTTPRequestHandler):
+            if delay:
+                time.sleep(delay)
+            handler.send_response(200)
+            handler.send_header("Content-Type", content_type)
+            handler.send_header("Content-Length", str(len(body)))
+            handler.end_headers()
+            if handler.command != "HEAD":
+                handler.wfile.write(body)
+
+        self.routes[path] = route
+
+    def add_redirect(self, path: str, location: str, code: int = 302):
+        """
+        redirect the given path to the given location
+        """
+
+        def route(handler: BaseHTTPRequestHandler):
+            handler.send_response(code)
+            handler.send_header("Location", location)
+            handler.send_header("Content-Length", "0")
+            handler.end_headers()
+
+        self.routes[path] = route
+
+    @staticmethod
+    def dead_url(path: str = "/") -> str:
+        """
+        get a url of a local port nobody listens on
+        """
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        return f"http://127.0.0.1:{port}{path}"
@@ -0,0 +1,160 @@
+"""
+Created on 2024-03-15
+
+@author: wf
+"""
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from ngwidgets.basetest import Basetest
+
+from sempubflow.models.scholar import Scholar
+from sempubflow.services.dblp import Dblp
+from sempubflow.services.scholar_index import DblpIdIndex
+from tests.local_http_server import LocalHttpServer
+
+
+class TestDblpSuggestions(Basetest):
+    """
+    test the dblp suggestion modes against a local stand-in of the
+    author search API and the SPARQL endpoint
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        # simulated round-trip time of the dblp servers
+        self.rtt = 0.03
+        hits = [
+            {
+                "info": {
+                    "author": "Stefan Decker",
+                    "url": "https://dblp.org/pid/d/StefanDecker",
+                }
+            },
+            {
+                "info": {
+                    "author": "Stefan Decker 0002",
+                    "url": "https://dblp.org/pid/12/3456-2",
+                }
+            },
+        ]
+        bindings = [
+            {
+                "author": {
+                    "type": "uri",
+                    "value": "https://dblp.org/pid/d/StefanDecker",
+                },
+                "label": {"type": "literal", "value": "Stefan Decker"},
+                "dblp_author_id": {"type": "literal", "value": "d/StefanDecker"},
+                "wikidata_id": {"type": "literal", "value": "Q54303353"},
+                "orcid_id": {"type": "literal", "value": "0000-0001-6324-7164"},
+            },
+            {
+                "author": {"type": "uri", "value": "https://dblp.org/pid/12/3456-2"},
+                "label": {"type": "literal", "value": "Stefan Decker 0002"},
+                "dblp_author_id": {"type": "literal", "value": "12/3456-2"},
+            },
+        ]
+        sparql_result = {
+            "head": {
+                "vars": ["author", "label", "dblp_author_id", "wikidata_id", "orcid_id"]
+            },
+            "results": {"bindings": bindings},
+        }
+        self.server = LocalHttpServer(keep_alive=True)
+        self.server.add_json(
+            "/search/author/api",
+            json.dumps({"result": {"hits": {"hit": hits}}}),
+            delay=self.rtt,
+        )
+        self.server.add_json(
+            "/sparql",
+            json.dumps(sparql_result),
+            delay=self.rtt,
+            content_type="application/sparql-results+json",
+        )
+        self.server.start()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmpdir.name, "dblp_ids.idx")
+        DblpIdIndex.build(
+            [
+                Scholar(
+                    label="Stefan Decker",
+                    dblp_author_id="d/StefanDecker",
+                    wikidata_id="Q54303353",
+                    orcid_id="0000-0001-6324-7164",
+                )
+            ],
+            path,
+        )
+        self.id_index = DblpIdIndex(path)
+        self.search_mask = Scholar(given_name="Stefan", family_name="Decker")
+
+    def tearDown(self):
+        self.id_index.close()
+        self.tmpdir.cleanup()
+        self.server.stop()
+        Basetest.tearDown(self)
+
+    def get_dblp(self, mode: str) -> Dblp:
+        """
+        get a dblp access for the given mode using the local stand-in
+        """
+        dblp = Dblp(
+            sparql_endpoint_url=self.server.url("/sparql"),
+            endpoint_url=self.server.url("/search/author/api"),
+            mode=mode,
+            id_index=self.id_index,
+        )
+        return dblp
+
+    def test_modes(self):
+        """
+        test that both modes suggest the same scholars
+        """
+        expected = [
+            ("Stefan Decker", "d/StefanDecker", "Q54303353", "0000-0001-6324-7164"),
+            ("Stefan Decker 0002", "12/3456-2", None, None),
+        ]
+        for mode in ["api", "api+sparql"]:
+            with self.subTest(mode=mode):
+                scholars = self.get_dblp(mode).get_scholar_suggestions(self.search_mask)
+                self.assertEqual(
+                    expected,
+                    [
+                        (s.label, s.dblp_author_id, s.wikidata_id, s.orcid_id)
+                        for s in scholars
+                    ],
+                )
+        self.assertIsNone(self.id_index.lookup("d/StefanDeck"))
+        # the ids recorded by dblp are used unless the api mode is requested
+        self.assertEqual("api+sparql", self.get_dblp(None).mode)
+
+    def test_incremental(self):
+        """
+        test that the first scholar is available before all hits are resolved
+        """
+        scholars = self.get_dblp("api").iter_scholar_suggestions(self.search_mask)
+        self.assertEqual("Stefan Decker", next(scholars).label)
+        self.assertEqual(1, len(self.server.requests))
+
+    def test_median_latency(self):
+        """
+        measure the median suggestion latency of both modes
+        """
+        medians = {}
+        for mode in ["api+sparql", "api"]:
+            dblp = self.get_dblp(mode)
+            latencies = []
+            for _i in range(10):
+                start_time = time.perf_counter()
+                dblp.get_scholar_suggestions(self.search_mask)
+                latencies.append(time.perf_counter() - start_time)
+            medians[mode] = statistics.median(latencies)
+            if self.debug:
+                print(f"{mode}: median latency {medians[mode] * 1000:.1f} ms")
+        self.assertLess(medians["api"], medians["api+sparql"])
+        self.assertLess(medians["api"], 2 * self.rtt)
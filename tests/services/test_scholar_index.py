@@ -0,0 +1,112 @@
+"""
+Created on 2024-03-12
+
+@author: wf
+"""
+import os
+import tempfile
+import time
+
+from ngwidgets.basetest import Basetest
+
+from sempubflow.models.scholar import Scholar
+from sempubflow.services.scholar_index import ScholarIndex
+
+
+class TestScholarIndex(Basetest):
+    """
+    test the local scholar name index
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "scholars.idx")
+        scholars = [
+            Scholar(
+                label="Stefan Decker",
+                given_name="Stefan",
+                family_name="Decker",
+                wikidata_id="Q54303353",
+                dblp_author_id="d/StefanDecker",
+                orcid_id="0000-0001-6324-7164",
+            ),
+            Scholar(
+                label="Wolfgang Fahl",
+                given_name="Wolfgang",
+                family_name="Fahl",
+                wikidata_id="Q110462723",
+            ),
+            Scholar(
+                label="Sören Auer",
+                given_name="Sören",
+                family_name="Auer",
+                wikidata_id="Q27453085",
+            ),
+        ]
+        # synthetic scholars to get a realistic number of entries
+        given_names = ["Anna", "Bernd", "Carla", "Dieter", "Eva", "Frank", "Greta"]
+        for i in range(20000):
+            given_name = given_names[i % len(given_names)]
+            scholars.append(
+                Scholar(
+                    label=f"{given_name} Name{i}",
+                    given_name=given_name,
+                    family_name=f"Name{i}",
+                    wikidata_id=f"Q{1000000 + i}",
+                )
+            )
+        self.entry_count = ScholarIndex.build(scholars, self.path)
+        self.index = ScholarIndex(self.path)
+
+    def tearDown(self):
+        self.index.close()
+        self.tmpdir.cleanup()
+        Basetest.tearDown(self)
+
+    def test_prefix_search(self):
+        """
+        test prefix completion on given and family names
+        """
+        self.assertEqual(2 * 20003, self.entry_count)
+        scholars = self.index.prefix_search("Stef")
+        self.assertEqual(["Q54303353"], [scholar.wikidata_id for scholar in scholars])
+        self.assertEqual("d/StefanDecker", scholars[0].dblp_author_id)
+        self.assertEqual("0000-0001-6324-7164", scholars[0].orcid_id)
+        # family name first and accents folded
+        self.assertEqual("Sören", self.index.prefix_search("auer so")[0].given_name)
+        self.assertEqual(10, len(self.index.prefix_search("name1")))
+        self.assertEqual([], self.index.prefix_search("zz"))
+        # partial given and family names like the old regex filter
+        mask = Scholar(given_name="Ste", family_name="Decke")
+        scholars = self.index.get_scholar_suggestions(mask)
+        self.assertEqual(["Q54303353"], [scholar.wikidata_id for scholar in scholars])
+        # full family name found via the "family given" key
+        mask = Scholar(given_name="Sö", family_name="Auer")
+        scholars = self.index.get_scholar_suggestions(mask)
+        self.assertEqual("Sören", scholars[0].given_name)
+
+    def test_fuzzy_search(self):
+        """
+        test the fuzzy fallback for typos
+        """
+        mask = Scholar(given_name="Wolfgagn", family_name="Fahl")
+        scholars = self.index.get_scholar_suggestions(mask)
+        self.assertEqual(["Q110462723"], [scholar.wikidata_id for scholar in scholars])
+        self.assertEqual(2, ScholarIndex.distance("decker", "dekcer", 2))
+        self.assertEqual(2, ScholarIndex.distance("abcdef", "xyz", 1))
+
+    def test_speed(self):
+        """
+        test that lookups take milliseconds
+        """
+        queries = ["Stef", "Anna Name1", "auer", "Wolfgagn Fahl", "greta name19"]
+        start_time = time.perf_counter()
+        for _i in range(20):
+            for query in queries:
+                if not self.index.prefix_search(query):
+                    self.index.fuzzy_search(query)
+        elapsed = (time.perf_counter() - start_time) / (20 * len(queries))
+        if self.debug:
+            print(f"{elapsed * 1000:.2f} ms per lookup")
+        self.assertLess(elapsed, 0.05)
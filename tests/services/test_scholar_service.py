@@ -0,0 +1,123 @@
+"""
+Created on 2024-03-13
+
+@author: wf
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ngwidgets.basetest import Basetest
+
+from sempubflow.models.scholar import Scholar
+from sempubflow.services.scholar_service import ScholarService, TTLCache
+
+
+class FakeBackend:
+    """
+    stand in for a scholar suggestion backend that is not thread safe
+    """
+
+    instances = []
+    lock = threading.Lock()
+
+    def __init__(self):
+        self.busy = False
+        self.calls = 0
+        with FakeBackend.lock:
+            FakeBackend.instances.append(self)
+
+    def get_scholar_suggestions(self, search_mask: Scholar):
+        if self.busy:
+            raise RuntimeError("client used concurrently")
+        self.busy = True
+        self.calls += 1
+        time.sleep(0.05)
+        self.busy = False
+        return [Scholar(label=f"{search_mask.given_name} {search_mask.family_name}")]
+
+    def count_scholars(self, search_mask: Scholar):
+        self.calls += 1
+        return 42
+
+
+class TestScholarService(Basetest):
+    """
+    test the shared scholar service layer
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        FakeBackend.instances = []
+        self.service = ScholarService(factories={"fake": FakeBackend})
+
+    def test_single_flight(self):
+        """
+        test that concurrent identical queries share one backend request
+        """
+        masks = [Scholar(given_name="Stefan", family_name=" Decker ")] * 10
+        masks += [Scholar(given_name="Stefan  ", family_name="Decker")] * 10
+        with ThreadPoolExecutor(max_workers=20) as executor:
+            results = list(
+                executor.map(
+                    lambda mask: self.service.get_scholar_suggestions("fake", mask),
+                    masks,
+                )
+            )
+        self.assertEqual(1, self.service.backend_calls)
+        self.assertTrue(all(result == results[0] for result in results))
+        # cached afterwards
+        self.service.get_scholar_suggestions("fake", masks[0])
+        self.assertEqual(1, self.service.backend_calls)
+
+    def test_client_pool(self):
+        """
+        test that clients are reused but never shared between threads
+        """
+        masks = [Scholar(given_name="Given", family_name=f"Name{i}") for i in range(12)]
+        for _round in range(2):
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                list(
+                    executor.map(
+                        lambda mask: self.service.get_scholar_suggestions("fake", mask),
+                        masks,
+                    )
+                )
+            self.service.cache.clear()
+        self.assertEqual(24, self.service.backend_calls)
+        self.assertLessEqual(len(FakeBackend.instances), 4)
+        self.assertEqual(24, sum(client.calls for client in FakeBackend.instances))
+
+    def test_count_scholars(self):
+        """
+        test that counts are cached separately from the suggestions
+        """
+        mask = Scholar(given_name="Stefan", family_name="Decker")
+        for _i in range(3):
+            self.assertEqual(42, self.service.count_scholars("fake", mask))
+            self.assertEqual(1, len(self.service.get_scholar_suggestions("fake", mask)))
+        self.assertEqual(2, self.service.backend_calls)
+
+    def test_ttl_cache(self):
+        """
+        test expiry and least recently used eviction
+        """
+        cache = TTLCache(max_size=2, ttl=0.05)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual((True, 1), cache.get("a"))
+        cache.put("c", 3)
+        self.assertEqual((False, None), cache.get("b"))
+        self.assertEqual((True, 3), cache.get("c"))
+        time.sleep(0.06)
+        self.assertEqual((False, None), cache.get("a"))
+        self.assertEqual(2, cache.hits)
+
+    def test_search_key(self):
+        """
+        test the normalization of the search mask
+        """
+        key = ScholarService.search_key(
+            "wikidata", Scholar(given_name=" Ste ", family_name="", orcid_id=None)
+        )
+        self.assertEqual(("wikidata", "Ste", None, None, None, None), key)
@@ -0,0 +1,104 @@
+"""
+Created on 2024-03-15
+
+@author: wf
+"""
+import json
+from urllib.parse import parse_qs
+
+from ngwidgets.basetest import Basetest
+
+from sempubflow.models.scholar import Scholar
+from sempubflow.services.wikidata import Wikidata
+from tests.local_http_server import LocalHttpServer
+
+
+class TestWikidataQueries(Basetest):
+    """
+    test the count and top-k scholar queries against a local SPARQL stand-in
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        self.queries = []
+        self.server = LocalHttpServer()
+        self.server.routes["/sparql"] = self.sparql
+        self.server.start()
+        self.wikidata = Wikidata(endpoint_url=self.server.url("/sparql"))
+        self.search_mask = Scholar(given_name="Stefan", family_name="Decker")
+
+    def tearDown(self):
+        self.server.stop()
+        Basetest.tearDown(self)
+
+    def sparql(self, handler):
+        """
+        answer count queries with a count and other queries with two
+        rows of the same scholar
+        """
+        query = parse_qs(handler.body.decode())["query"][0]
+        self.queries.append(query)
+        if "COUNT(DISTINCT ?scholar)" in query:
+            variables = ["count"]
+            bindings = [
+                {
+                    "count": {
+                        "type": "literal",
+                        "datatype": "http://www.w3.org/2001/XMLSchema#integer",
+                        "value": "4711",
+                    }
+                }
+            ]
+        else:
+            variables = ["scholar", "label", "orcid_id"]
+            bindings = [
+                {
+                    "scholar": {
+                        "type": "uri",
+                        "value": "http://www.wikidata.org/entity/Q54303353",
+                    },
+                    "label": {"type": "literal", "value": "Stefan Decker"},
+                    "orcid_id": {"type": "literal", "value": orcid_id},
+                }
+                for orcid_id in ["0000-0001-6324-7164", "0000-0000-0000-0000"]
+            ]
+        body = json.dumps(
+            {"head": {"vars": variables}, "results": {"bindings": bindings}}
+        ).encode()
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/sparql-results+json")
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def test_count_scholars(self):
+        """
+        test the count only query
+        """
+        self.assertEqual(4711, self.wikidata.count_scholars(self.search_mask))
+        query = self.queries[0]
+        self.assertNotIn("LIMIT", query)
+        self.assertNotIn("OPTIONAL", query)
+
+    def test_top_scholars(self):
+        """
+        test the ranked top-k query and the merging of rows of the same scholar
+        """
+        scholars = self.wikidata.get_top_scholars(self.search_mask, k=10)
+        self.assertEqual(["Q54303353"], [scholar.wikidata_id for scholar in scholars])
+        self.assertEqual("0000-0001-6324-7164", scholars[0].orcid_id)
+        query = self.queries[0]
+        self.assertIn("LIMIT 10", query)
+        self.assertIn('LCASE(STR(?given_name)) = "stefan"', query)
+        self.assertIn("ORDER BY DESC(?rank)", query)
+        # top_k mode of the suggestions
+        Wikidata(
+            endpoint_url=self.server.url("/sparql"), top_k=5
+        ).get_scholar_suggestions(self.search_mask)
+        self.assertIn("LIMIT 5\n", self.queries[-1])
+
+    def test_literal(self):
+        """
+        test escaping of the search input
+        """
+        self.assertEqual('"O\\"Neil \\\\"', Wikidata.literal('O"Neil \\'))
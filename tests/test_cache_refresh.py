@@ -0,0 +1,119 @@
+"""
+Created on 2024-03-18
+
+@author: wf
+"""
+import asyncio
+import threading
+import time
+
+from ngwidgets.basetest import Basetest
+
+from sempubflow.cache_refresh import CacheRefreshScheduler
+
+
+class TestCacheRefreshScheduler(Basetest):
+    """
+    test the parallel dependency aware cache refresh
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        self.lock = threading.Lock()
+        self.calls = []
+        self.inflight = 0
+        self.max_inflight = 0
+        self.failures = {}
+
+    def cache_function(self, name: str, duration: float = 0.1):
+        """
+        get a fake cache function that takes the given duration
+        and fails as often as configured in self.failures
+        """
+
+        def refresh(force_query: bool = False):
+            with self.lock:
+                self.calls.append(name)
+                self.inflight += 1
+                self.max_inflight = max(self.max_inflight, self.inflight)
+            try:
+                time.sleep(duration)
+                if self.failures.get(name, 0) > 0:
+                    self.failures[name] -= 1
+                    raise RuntimeError(f"{name} query timed out")
+            finally:
+                with self.lock:
+                    self.inflight -= 1
+
+        return refresh
+
+    def get_scheduler(self, **kwargs) -> CacheRefreshScheduler:
+        names = ["dblp/authors", "dblp/editors", "dblp/papers", "dblp/volumes"]
+        scheduler = CacheRefreshScheduler(
+            cache_functions={name: self.cache_function(name) for name in names},
+            dependencies={
+                "dblp/papers": ["dblp/authors"],
+                "dblp/volumes": ["dblp/editors", "dblp/papers"],
+            },
+            retry_delay=0.01,
+            **kwargs,
+        )
+        return scheduler
+
+    def test_parallel(self):
+        """
+        test that independent caches are refreshed in parallel and
+        dependent ones after their dependencies
+        """
+        progress = []
+        scheduler = self.get_scheduler(
+            max_concurrency=2,
+            on_progress=lambda state: progress.append((state.name, state.status)),
+        )
+        start_time = time.time()
+        states = asyncio.run(scheduler.run())
+        elapsed = time.time() - start_time
+        self.assertTrue(all(state.status == "done" for state in states.values()))
+        self.assertEqual(2, self.max_inflight)
+        # authors and editors in parallel then papers then volumes
+        self.assertLess(elapsed, 0.38)
+        self.assertEqual({"dblp/authors", "dblp/editors"}, set(self.calls[:2]))
+        self.assertEqual(["dblp/papers", "dblp/volumes"], self.calls[2:])
+        self.assertIn(("dblp/volumes", "waiting"), progress)
+        self.assertEqual(("dblp/volumes", "done"), progress[-1])
+
+    def test_retry(self):
+        """
+        test that a failing cache is retried individually
+        """
+        self.failures = {"dblp/editors": 1, "dblp/authors": 5}
+        scheduler = self.get_scheduler(max_concurrency=4, max_retries=2)
+        states = asyncio.run(scheduler.run())
+        self.assertEqual("done", states["dblp/editors"].status)
+        self.assertEqual(2, states["dblp/editors"].attempts)
+        self.assertEqual("failed", states["dblp/authors"].status)
+        self.assertEqual(3, states["dblp/authors"].attempts)
+        self.assertEqual("dblp/authors query timed out", states["dblp/authors"].error)
+        # dependent caches are skipped
+        self.assertEqual("skipped", states["dblp/papers"].status)
+        self.assertEqual("skipped", states["dblp/volumes"].status)
+        self.assertEqual(5, len(self.calls))
+
+    def test_selection(self):
+        """
+        test refreshing a single cache with its dependencies
+        """
+        scheduler = self.get_scheduler()
+        states = asyncio.run(scheduler.run(names=["dblp/papers"]))
+        self.assertEqual(["dblp/authors", "dblp/papers"], list(states))
+        self.assertEqual(["dblp/authors", "dblp/papers"], self.calls)
+
+    def test_cycle(self):
+        """
+        test that cyclic dependencies are rejected
+        """
+        with self.assertRaises(ValueError):
+            CacheRefreshScheduler(
+                cache_functions={"a": self.cache_function("a"), "b": None},
+                dependencies={"a": ["b"], "b": ["a"]},
+            )
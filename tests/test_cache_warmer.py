@@ -0,0 +1,108 @@
+"""
+Created on 2024-03-20
+
+@author: wf
+"""
+import asyncio
+import time
+
+from ngwidgets.basetest import Basetest
+
+from sempubflow.cache_warmer import CacheWarmer
+
+
+class TestCacheWarmer(Basetest):
+    """
+    test the background cache warmer
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        self.calls = []
+
+    def loader(self, name: str, value, duration: float = 0.05, fail: bool = False):
+        """
+        get a fake loader that takes the given duration
+        """
+
+        def load():
+            self.calls.append(name)
+            time.sleep(duration)
+            if fail:
+                raise Exception(f"{name} not available")
+            return value() if callable(value) else value
+
+        return load
+
+    async def run_for(self, warmer: CacheWarmer, seconds: float):
+        """
+        run the given warmer in the background for the given time
+
+        Args:
+            warmer: the cache warmer
+            seconds: the time to run
+
+        Returns:
+            int: the number of ticks of the event loop while the warmer was running
+        """
+        warmer.start()
+        tick_count = 0
+        end_time = time.time() + seconds
+        while time.time() < end_time:
+            await asyncio.sleep(0.01)
+            tick_count += 1
+        warmer.stop()
+        return tick_count
+
+    def test_warm_with_dependencies(self):
+        """
+        test that caches are preloaded after their dependencies
+        without blocking the event loop
+        """
+        warmer = CacheWarmer(check_interval=0.05)
+        warmer.add(
+            "homepages",
+            self.loader("homepages", lambda: len(warmer.get("volumes"))),
+            depends_on=["volumes"],
+        )
+        warmer.add("volumes", self.loader("volumes", [1, 2, 3], duration=0.2))
+        ticks = asyncio.run(self.run_for(warmer, 0.5))
+        self.assertEqual(["volumes", "homepages"], self.calls)
+        self.assertEqual(3, warmer.get("homepages"))
+        self.assertEqual("warm", warmer.caches["homepages"].status)
+        # the event loop kept running while the volumes were loading
+        self.assertGreater(ticks, 20)
+        rows = warmer.get_rows()
+        if self.debug:
+            print(rows)
+        self.assertEqual(["homepages", "volumes"], [row["name"] for row in rows])
+
+    def test_scheduled_refresh(self):
+        """
+        test that caches are refreshed when due
+        """
+        counter = iter(range(100))
+        warmer = CacheWarmer(check_interval=0.05)
+        warmer.add("volumes", self.loader("volumes", lambda: next(counter)), 0.2)
+        warmer.add("once", self.loader("once", "static"))
+        asyncio.run(self.run_for(warmer, 0.9))
+        volumes = warmer.caches["volumes"]
+        self.assertGreaterEqual(volumes.load_count, 3)
+        self.assertEqual(volumes.load_count - 1, warmer.get("volumes"))
+        self.assertEqual(1, warmer.caches["once"].load_count)
+        self.assertIsNotNone(volumes.next_refresh)
+
+    def test_failure(self):
+        """
+        test the state of failing caches and their dependents
+        """
+        warmer = CacheWarmer(max_retries=1, retry_delay=0.05, check_interval=0.05)
+        warmer.add("dblp", self.loader("dblp", None, fail=True))
+        warmer.add("authors", self.loader("authors", []), depends_on=["dblp"])
+        asyncio.run(self.run_for(warmer, 0.4))
+        self.assertEqual(["dblp", "dblp"], self.calls)
+        dblp = warmer.caches["dblp"]
+        self.assertEqual("failed", dblp.status)
+        self.assertEqual("dblp not available", dblp.error)
+        self.assertEqual("failed", warmer.caches["authors"].status)
+        self.assertIsNone(warmer.get("authors"))
@@ -0,0 +1,172 @@
+"""
+Created on 2024-03-19
+
+@author: wf
+"""
+import re
+import tempfile
+from types import SimpleNamespace
+
+from ngwidgets.basetest import Basetest
+
+from sempubflow.dblp_delta import DblpDeltaRefresh
+from sempubflow.jsoncache import JsonCacheManager
+from tests.local_http_server import LocalHttpServer
+
+
+class FakeSparql:
+    """
+    SPARQL stand-in that answers window queries from a list of papers
+
+    the volume numbers are string literals as in dblp
+    """
+
+    def __init__(self, papers: list):
+        self.papers = papers
+        self.queries = []
+        # volume numbers without answers e.g. due to a flaky endpoint
+        self.missing = set()
+
+    def queryAsListOfDicts(self, query: str) -> list:
+        self.queries.append(query)
+        if "MAX(xsd:integer(?volume_number))" in query:
+            numbers = [int(paper["volume_number"]) for paper in self.papers]
+            return [{"max_key": max(numbers)}] if numbers else []
+        match = re.search(
+            r"FILTER\(xsd:integer\(\?volume_number\) >= (\d+) && "
+            r"xsd:integer\(\?volume_number\) < (\d+)\)",
+            query,
+        )
+        lo, hi = (int(match.group(1)), int(match.group(2))) if match else (0, 10**9)
+        return [
+            dict(paper)
+            for paper in self.papers
+            if lo <= int(paper["volume_number"]) < hi
+            and int(paper["volume_number"]) not in self.missing
+        ]
+
+
+class TestDblpDeltaRefresh(Basetest):
+    """
+    test the incremental dblp cache refresh
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.papers = [
+            {"paper": f"p{volume}-{i}", "volume_number": str(volume), "title": "old"}
+            for volume in range(1, 3001)
+            for i in range(3)
+        ]
+        self.sparql = FakeSparql(self.papers)
+        query = """PREFIX dblp: <https://dblp.org/rdf/schema#>
+PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+SELECT ?paper ?volume_number (SAMPLE(?_title) as ?title) WHERE{
+    ?proceeding dblp:publishedIn "CEUR Workshop Proceedings".
+    ?proceeding dblp:publishedInSeriesVolume ?volume_number.
+    ?paper dblp:publishedAsPartOf ?proceeding.
+    OPTIONAL{?paper dblp:title ?_title .}
+}
+GROUP BY ?paper ?volume_number"""
+        self.endpoint = SimpleNamespace(
+            sparql=self.sparql,
+            qm=SimpleNamespace(
+                queriesByName={"CEUR-WS all Papers": SimpleNamespace(query=query)}
+            ),
+            json_cache_manager=JsonCacheManager(
+                base_url=LocalHttpServer.dead_url(""), root_path=self.tmpdir.name
+            ),
+        )
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+        Basetest.tearDown(self)
+
+    def test_window_query(self):
+        """
+        test the keyset window and the max key query of an aggregating query
+        """
+        query = self.endpoint.qm.queriesByName["CEUR-WS all Papers"].query
+        delta = DblpDeltaRefresh(self.endpoint)
+        window_query = delta.window_query(query, "volume_number", 3001, 3101)
+        self.assertTrue(window_query.startswith("PREFIX xsd:"))
+        self.assertEqual(3, window_query.count("PREFIX"))
+        range_filter = (
+            "FILTER(xsd:integer(?volume_number) >= 3001 && "
+            "xsd:integer(?volume_number) < 3101)"
+        )
+        # the filter is applied before the grouping - not to the aggregate
+        self.assertIn(
+            f"?proceeding dblp:publishedInSeriesVolume ?volume_number.\n    {range_filter}",
+            window_query,
+        )
+        self.assertLess(
+            window_query.index(range_filter), window_query.index("GROUP BY")
+        )
+        self.assertEqual(1, window_query.count("SELECT"))
+        max_key_query = delta.max_key_query(query, "volume_number")
+        self.assertIn(
+            "SELECT (MAX(xsd:integer(?volume_number)) AS ?max_key)", max_key_query
+        )
+        self.assertNotIn("GROUP BY", max_key_query)
+        self.assertNotIn("publishedAsPartOf", max_key_query)
+
+    def test_delta(self):
+        """
+        test that only new and recent volumes are fetched and merged
+        """
+        delta = DblpDeltaRefresh(self.endpoint, overlap=10, window=100)
+        result = delta.refresh("dblp/papers")
+        self.assertIsNone(result.start)
+        self.assertEqual(9000, result.added)
+        # new volumes and a late change of a recent volume
+        self.papers.extend(
+            {"paper": f"p{volume}-0", "volume_number": str(volume), "title": "new"}
+            for volume in range(3001, 3151)
+        )
+        self.papers[-151]["title"] = "changed"
+        result = delta.refresh("dblp/papers")
+        self.assertEqual(2991, result.start)
+        self.assertEqual(150, result.added)
+        self.assertEqual(30, result.replaced)
+        self.assertEqual(180, result.fetched)
+        self.assertEqual(2, result.pages)
+        self.assertEqual("+150", str(result))
+        lod = self.endpoint.json_cache_manager.load_lod("dblp/papers")
+        self.assertEqual(9150, len(lod))
+        self.assertEqual(
+            sorted(self.papers, key=lambda p: p["paper"]),
+            sorted(lod, key=lambda p: p["paper"]),
+        )
+        self.assertFalse(DblpDeltaRefresh.supports("dblp/authors"))
+
+    def test_empty_window(self):
+        """
+        test that cached volumes without an answer keep their records
+        """
+        delta = DblpDeltaRefresh(self.endpoint, overlap=10, window=100)
+        delta.refresh("dblp/papers")
+        self.sparql.missing = set(range(2991, 3001))
+        result = delta.refresh("dblp/papers")
+        self.assertEqual(0, result.fetched)
+        self.assertEqual(0, result.replaced)
+        self.assertEqual(0, result.added)
+        lod = self.endpoint.json_cache_manager.load_lod("dblp/papers")
+        self.assertEqual(9000, len(lod))
+
+    def test_numbering_gap(self):
+        """
+        test that new volumes after a gap of more than a window are fetched
+        """
+        delta = DblpDeltaRefresh(self.endpoint, overlap=10, window=100)
+        delta.refresh("dblp/papers")
+        self.papers.extend(
+            {"paper": f"p{volume}-0", "volume_number": str(volume), "title": "new"}
+            for volume in [3001, 3002, 3350]
+        )
+        result = delta.refresh("dblp/papers")
+        self.assertEqual(3, result.added)
+        self.assertEqual(4, result.pages)
+        lod = self.endpoint.json_cache_manager.load_lod("dblp/papers")
+        self.assertEqual("3350", lod[-1]["volume_number"])
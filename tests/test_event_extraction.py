@@ -0,0 +1,134 @@
+"""
+Created on 2024-03-09
+
+@author: wf
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+import yaml
+from ngwidgets.basetest import Basetest
+
+from sempubflow.event import Event
+from sempubflow.event_extraction import EventExtractionRunner, TokenBucket
+from sempubflow.homepage import Homepage
+from sempubflow.llm_cache import LlmResponseCache
+from tests.fake_llm import FakeLLM, RateLimitError
+
+
+class TestEventExtraction(Basetest):
+    """
+    test the batched concurrent event extraction
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.output_path = os.path.join(self.tmpdir.name, "events.yaml")
+        self.homepages = [
+            Homepage(
+                volume=volume,
+                url=f"http://example.org/{volume}",
+                text=f"{volume}th Workshop on Knowledge Graphs",
+            )
+            for volume in range(1, 9)
+        ]
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+        Basetest.tearDown(self)
+
+    def test_run(self):
+        """
+        test concurrent extraction with retries and appending
+        """
+        llm = FakeLLM(delay=0.05, rate_limited=2)
+        runner = EventExtractionRunner(
+            llm,
+            self.output_path,
+            max_concurrency=3,
+            requests_per_minute=6000,
+            retry_delay=0.01,
+        )
+        events = runner.run(self.homepages)
+        self.assertEqual(8, len(events))
+        self.assertEqual((8, 0, 2), (runner.extracted, runner.failed, runner.retries))
+        self.assertLessEqual(llm.max_inflight, 3)
+        self.assertGreater(llm.max_inflight, 1)
+        with open(self.output_path) as yaml_file:
+            record = yaml.safe_load(yaml_file)
+        self.assertEqual(
+            list(range(1, 9)), sorted(event["volume"] for event in record["events"])
+        )
+
+    def test_resume(self):
+        """
+        test that a rerun only extracts the missing volumes
+        """
+        llm = FakeLLM()
+        runner = EventExtractionRunner(llm, self.output_path)
+        runner.run(self.homepages[:5])
+        self.homepages.append(Homepage(volume=9, url="http://example.org/9"))
+        runner = EventExtractionRunner(llm, self.output_path, max_retries=0)
+        events = runner.run(self.homepages)
+        self.assertEqual([6, 7, 8], sorted(event.volume for event in events))
+        # volume 9 has no text
+        self.assertEqual(1, runner.failed)
+        self.assertEqual(8, len(llm.prompts))
+        self.assertEqual(set(range(1, 9)), runner.load_done_volumes())
+
+    def test_rate_limits(self):
+        """
+        test the token bucket and the retry limit
+        """
+        self.assertTrue(EventExtractionRunner.is_rate_limit_error(RateLimitError()))
+        self.assertFalse(EventExtractionRunner.is_rate_limit_error(ValueError()))
+        runner = EventExtractionRunner(
+            FakeLLM(rate_limited=10), self.output_path, max_retries=1, retry_delay=0.01
+        )
+        self.assertEqual([], runner.run(self.homepages[:1]))
+        self.assertEqual((1, 1), (runner.failed, runner.retries))
+        # a bucket of 600 per minute refills 10 tokens per second
+        bucket = TokenBucket(600)
+        bucket.tokens = 0
+        start_time = time.monotonic()
+        asyncio.run(bucket.acquire(2))
+        self.assertGreaterEqual(time.monotonic() - start_time, 0.15)
+
+    def test_event_from_yaml(self):
+        """
+        test parsing the llm answer
+        """
+        event = Event.from_yaml(
+            """# KGW 2024
+acronym: "KGW 2024"
+year: 2024
+start_date: 2024-05-26
+comments: "not an event field"
+"""
+        )
+        self.assertEqual("KGW 2024", event.acronym)
+        self.assertEqual("2024-05-26", event.start_date)
+        with self.assertRaises(ValueError):
+            Event.from_yaml("just text")
+
+    def test_cached_answers(self):
+        """
+        test that cached answers do not use up the rate limits
+        """
+        llm = FakeLLM()
+        llm_cache = LlmResponseCache(os.path.join(self.tmpdir.name, "llm_cache.db"))
+        runner = EventExtractionRunner(llm, self.output_path, llm_cache=llm_cache)
+        self.assertEqual(8, len(runner.run(self.homepages)))
+        # a single request per minute would block the rerun if hits were charged
+        rerun_path = os.path.join(self.tmpdir.name, "events-rerun.yaml")
+        runner = EventExtractionRunner(
+            llm, rerun_path, requests_per_minute=1, llm_cache=llm_cache
+        )
+        start_time = time.monotonic()
+        self.assertEqual(8, len(runner.run(self.homepages)))
+        self.assertLess(time.monotonic() - start_time, 5)
+        self.assertEqual(8, len(llm.prompts))
+        self.assertEqual(1, runner.request_bucket.tokens)
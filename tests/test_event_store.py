@@ -0,0 +1,213 @@
+"""
+Created on 2024-03-22
+
+@author: wf
+"""
+import os
+import random
+import tempfile
+import time
+
+from ngwidgets.basetest import Basetest
+
+from sempubflow.event import Event, Events
+from sempubflow.event_evaluation import EventEvaluation
+from sempubflow.event_store import EventStore
+
+
+class TestEventStore(Basetest):
+    """
+    test the columnar events store and the vectorized evaluation
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        self.cities = ["Heraklion", "Udine", "Aachen", "Bonn"]
+        self.volumes = [
+            {
+                "number": number,
+                "acronym": f"WS{number}",
+                "city": self.cities[number % len(self.cities)],
+                "year": 2000 + number % 20,
+                "title": "N/A" if number % 7 == 0 else f"Workshop {number}",
+                "dateFrom": f"{2000 + number % 20}-05-{1 + number % 28:02d}",
+                "dateTo": f"{2000 + number % 20}-05-{2 + number % 27:02d}",
+                "loc_region": "DEU" if number % 3 else None,
+            }
+            for number in range(1, 201)
+        ]
+
+    def random_events(self, rnd: random.Random, count: int):
+        """
+        get the given number of randomly corrupted events
+        """
+        events = []
+        for _i in range(count):
+            number = rnd.randint(1, 220)
+            start_date = f"{2000 + number % 20}-05-{1 + number % 28:02d}"
+            end_date = f"{2000 + number % 20}-05-{2 + number % 27:02d}"
+            event = Event(
+                volume=number,
+                acronym=rnd.choice([f"ws{number} ", f"WS{number + 1}", None]),
+                city=rnd.choice(self.cities + [None, "N/A"]),
+                year=rnd.choice([2000 + number % 20, 1999, None]),
+                title=rnd.choice([f"Workshop {number}", "", None]),
+                start_date=rnd.choice([start_date, end_date, None]),
+                end_date=rnd.choice([end_date, start_date, None]),
+                region=rnd.choice(["DEU", "deu ", "ITA", None]),
+            )
+            events.append(event)
+        return events
+
+    def reference_scores(self, events, event_attr: str, volume_attr: str):
+        """
+        calculate precision, recall and F1 score with plain Python loops
+        """
+
+        def normalize(value):
+            value = None if value is None else str(value).strip().lower()
+            return None if not value or value == "n/a" else value
+
+        volumes_by_number = {volume["number"]: volume for volume in self.volumes}
+        correct = predicted = expected = 0
+        for event in events:
+            volume = volumes_by_number.get(event.volume)
+            gt_value = normalize(volume.get(volume_attr)) if volume else None
+            if gt_value is None:
+                continue
+            expected += 1
+            value = normalize(getattr(event, event_attr))
+            if value is not None:
+                predicted += 1
+                correct += value == gt_value
+        precision = correct / predicted if predicted else 0.0
+        recall = correct / expected if expected else 0.0
+        f1 = (
+            2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        )
+        return precision, recall, f1
+
+    def test_evaluate_runs(self):
+        """
+        test the vectorized evaluation of several runs against plain loops
+        """
+        rnd = random.Random(42)
+        runs = {f"run{i}": self.random_events(rnd, 500) for i in range(5)}
+        evaluation = EventEvaluation(self.volumes)
+        start_time = time.time()
+        scores = evaluation.evaluate_runs(runs)
+        duration = time.time() - start_time
+        if self.debug:
+            print(f"evaluated {len(runs)} runs in {duration*1000:.1f} ms")
+        self.assertEqual(list(runs), list(scores))
+        # the date and region ground truth has different attribute names
+        self.assertGreater(scores["run0"]["start_date"][2], 0.0)
+        self.assertGreater(scores["run0"]["region"][2], 0.0)
+        for run_name, events in runs.items():
+            for event_attr, volume_attr in evaluation.attribute_map.items():
+                expected = self.reference_scores(events, event_attr, volume_attr)
+                for actual_score, expected_score in zip(
+                    scores[run_name][event_attr], expected
+                ):
+                    self.assertAlmostEqual(expected_score, actual_score)
+        # the single run api gives the same results
+        self.assertEqual(scores["run1"], evaluation.evaluate(runs["run1"]))
+        self.assertEqual(
+            scores["run2"]["city"],
+            evaluation.evaluate_attribute(runs["run2"], "city", "city"),
+        )
+
+    def test_hand_computed_scores(self):
+        """
+        test the scores of two runs and two attributes against hand computed values
+        """
+        volumes = [
+            {"number": 1, "city": "Bonn", "year": 2020},
+            {"number": 2, "city": "Udine", "year": "N/A"},
+            {"number": 3, "city": "Aachen", "year": 2022},
+        ]
+        runs = {
+            "a": [
+                Event(volume=1, city="bonn ", year=2020),
+                Event(volume=2, city="Rome", year=2021),
+                Event(volume=3, year=2022),
+            ],
+            "b": [
+                Event(volume=1, city="Bonn", year=2019),
+                Event(volume=3, city="Aachen"),
+                # no ground truth
+                Event(volume=4, city="Bonn", year=2024),
+            ],
+        }
+        evaluation = EventEvaluation(volumes)
+        store = EventStore()
+        for run_name, events in runs.items():
+            store.add_events(events, run_name)
+        attribute_map = {"city": "city", "year": "year"}
+        counts = evaluation.count(store, attribute_map)
+        # attribute x run
+        self.assertEqual([[3, 2], [2, 2]], counts["expected"].tolist())
+        self.assertEqual([[2, 2], [2, 1]], counts["predicted"].tolist())
+        self.assertEqual([[1, 2], [2, 0]], counts["correct"].tolist())
+        scores = evaluation.evaluate_store(store, attribute_map)
+        expected_scores = {
+            # city a: 1 of 2 predicted and 1 of 3 expected are correct
+            "a": {"city": (1 / 2, 1 / 3, 0.4), "year": (1.0, 1.0, 1.0)},
+            # year b: the only predicted year is wrong
+            "b": {"city": (1.0, 1.0, 1.0), "year": (0.0, 0.0, 0.0)},
+        }
+        for run_name, attr_scores in expected_scores.items():
+            for attr, expected in attr_scores.items():
+                for expected_score, actual_score in zip(
+                    expected, scores[run_name][attr]
+                ):
+                    self.assertAlmostEqual(expected_score, actual_score)
+
+    def test_unique_and_table(self):
+        """
+        test counting only the first event of each volume
+        """
+        events = [
+            Event(volume=1, city="Udine"),
+            Event(volume=1, city="Bonn"),
+            Event(volume=2, city="Heraklion"),
+            Event(volume=300, city="Bonn"),
+        ]
+        store = EventStore.from_events(events)
+        self.assertEqual([0, 2, 3], list(store.unique_rows()))
+        self.assertEqual([0, 1], list(store.rows_of_volume(1)))
+        evaluation = EventEvaluation(self.volumes)
+        rows = evaluation.score_table(store, {"city": "city"})
+        self.assertEqual(1, len(rows))
+        row = rows[0]
+        self.assertEqual(3, row["events"])
+        self.assertEqual(2, row["expected"])
+        self.assertEqual(1, row["correct"])
+        self.assertEqual(0.5, row["prec"])
+        scores = evaluation.evaluate_store(store, {"city": "city"})
+        self.assertAlmostEqual(1 / 3, scores["events"]["city"][0])
+
+    def test_from_files(self):
+        """
+        test loading events files as runs
+        """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for run in range(3):
+                events = Events(
+                    [
+                        Event(volume=number, city="Bonn", year=2000 + run)
+                        for number in range(1, run + 2)
+                    ]
+                )
+                events.save_to_yaml_file(os.path.join(tmpdir, f"events-{run}.yaml"))
+            store = EventStore.from_files(os.path.join(tmpdir, "events-*.yaml"))
+            self.assertEqual(["events-0", "events-1", "events-2"], store.run_names)
+            self.assertEqual(6, len(store))
+            self.assertEqual(
+                Event(volume=2, city="Bonn", year=2002), store.get_event(4)
+            )
+            merged = EventStore.from_files(
+                os.path.join(tmpdir, "events-*.yaml"), run_name="all"
+            )
+            self.assertEqual(["all"], merged.run_names)
+            self.assertEqual(3, len(merged.unique_rows()))
@@ -3,17 +3,18 @@ Created on 22.12.2023
 
 @author: wf
 """
-import glob
 import json
 import os
 from statistics import median  # Importing median function from statistics module
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional
 
 from ngwidgets.basetest import Basetest
-from sklearn.metrics import precision_recall_fscore_support
 from tabulate import tabulate
 
 from sempubflow.event import Event, Events
+from sempubflow.event_evaluation import EventEvaluation
+from sempubflow.event_store import EventStore
+from sempubflow.volume_registry import VolumeRegistry
 
 
 class TestEvents(Basetest):
@@ -24,11 +25,8 @@ class TestEvents(Basetest):
     def setUp(self, debug=True, profile=True):
         Basetest.setUp(self, debug=debug, profile=profile)
         self.ceurws_path = os.path.expanduser("~/.ceurws")
-        self.volumes_path = os.path.join(self.ceurws_path, "volumes.json")
+        self.registry = VolumeRegistry.get_instance()
         self.volumes = self.get_volumes()
-        self.volumes_by_number = {
-            volume["number"]: volume for volume in self.volumes if "number" in volume
-        }
         self.event_attribute_map = {
             "acronym": "acronym",  # str - "ALPSWS2008"
             "city": "city",  # str - "Udine"
@@ -47,19 +45,14 @@ class TestEvents(Basetest):
         }
 
     def get_volumes(self) -> Optional[List[Dict]]:
-        """Retrieve the volumes data from a JSON file.
+        """Retrieve the volumes data from the shared VolumeRegistry.
 
         Returns:
-            Optional[List[Dict]]: A list of volume dictionaries or None if file not found.
+            Optional[List[Dict]]: A list of volume dictionaries or None if the volumes are not cached.
         """
-        # Path to the volumes.json file
-        # Ensure the file exists
-        if not os.path.exists(self.volumes_path):
+        if not self.registry.is_available():
             return None
-        # Read the JSON data
-        with open(self.volumes_path, "r") as file:
-            volumes_data = json.load(file)
-        return volumes_data
+        return self.registry.volumes
 
     def test_events(self):
         """
@@ -124,168 +117,6 @@ subject: "Bayesian Modeling Applications"
             print(event)
         self.assertEqual("Amsterdam", event.city)
 
-    def get_events(self, date_iso: str) -> List[Event]:
-        """
-        Get the cached event results.
-
-        Args:
-            date_iso (str): Date in ISO format to use as wildcard.
-            for event entries created on that date
-
-        Returns:
-            List[Event]: A list of Event objects.
-        """
-        # Define the directory and date_iso according to your requirements
-        home_directory = os.path.expanduser("~/.ceurws/llm/")
-        pattern = os.path.join(home_directory, f"events-{date_iso}*.yaml")
-        yaml_files = glob.glob(pattern)
-        events = Events()
-        for yaml_file in yaml_files:
-            yf_events = Events.load_from_file(yaml_file)
-            events.events.extend(yf_events.events)
-        if self.debug:
-            print(
-                f"loaded {len(events.events)} events from {len(yaml_files)} YAML files"
-            )
-        return events.events
-
-    def get_unique_events(self, events: List[Event]) -> List[Event]:
-        """
-        Filter events to remove duplicates, keeping only unique ones.
-
-        Args:
-            events (List[Event]): A list of Event objects.
-
-        Returns:
-            List[Event]: A list of unique Event objects.
-        """
-        unique_events = []
-        seen_volumes = {}
-        for event in events:
-            if event.volume not in seen_volumes:
-                unique_events.append(event)
-                seen_volumes[event.volume] = event
-            else:
-                # Directly compare the two event dataclasses
-                if self.debug:
-                    original_event = seen_volumes[event.volume]
-                    if event == original_event:
-                        print(
-                            f"Duplicate identical event for volume {event.volume} removed"
-                        )
-                    else:
-                        print(
-                            f"Warning: Duplicate event for volume {event.volume} differs from original."
-                        )
-        sorted_events = sorted(unique_events, key=lambda x: x.volume)
-        return sorted_events
-
-    def calculate_precision_recall(
-        self,
-        gt_records: List[Dict],
-        pred_records: List[Dict],
-        gt_attr: str,
-        pred_attr: str,
-    ) -> Tuple[float, float, float]:
-        """
-        Calculate the precision, recall, and F1 score for given attributes.
-
-        Args:
-            gt_records (List[Dict]): Ground truth records.
-            pred_records (List[Dict]): Prediction records.
-            gt_attr (str): The attribute name in ground truth records.
-            pred_attr (str): The attribute name in prediction records.
-
-        Returns:
-            Tuple[float, float, float]: Precision, recall, and F1 score.
-        """
-        aligned_gt_values = []
-        aligned_pred_values = []
-
-        # Align records by primary key and ensure both gt and pred values are present
-        for key in gt_records:
-            if key in pred_records:
-                gt_record = gt_records[key]
-                pred_record = pred_records[key]
-
-                if gt_attr in gt_record and pred_attr in pred_record:
-                    gt_value = gt_record[gt_attr]
-                    pred_value = pred_record[pred_attr]
-
-                    if gt_value is not None and pred_value is not None:
-                        aligned_gt_values.append(str(gt_value))
-                        aligned_pred_values.append(str(pred_value))
-        # Ensure the lists have the same length
-        if len(aligned_gt_values) != len(aligned_pred_values):
-            # Handle this case as needed, e.g., by logging a warning
-            return (0.0, 0.0, 0.0)
-        else:
-            sample_len = 10
-        if self.debug:
-            print("Sample GT:", aligned_gt_values[:sample_len])
-            print("Sample Predictions:", aligned_pred_values[:sample_len])
-
-        precision, recall, f1, _ = precision_recall_fscore_support(
-            aligned_gt_values, aligned_pred_values, average="weighted", zero_division=0
-        )
-        return precision, recall, f1
-
-    def get_events_and_volumes(self, iso_date: str) -> Tuple[List[Event], List[Dict]]:
-        """
-        Get events and corresponding volumes for a given ISO date.
-
-        This function retrieves events created on a specific date and fetches the corresponding volume information.
-        It ensures that each event is unique and correlates with the volumes data.
-
-        Args:
-            iso_date (str): The ISO format date to filter events.
-
-        Returns:
-            Tuple[List[Event], List[Dict]]: A tuple containing a list of unique events and a list of their corresponding volumes.
-        """
-        events = self.get_events(
-            iso_date
-        )  # Replace with the actual date you want to use
-        unique_events = self.get_unique_events(events)
-        volumes = [
-            volume
-            for volume in self.volumes
-            if "number" in volume
-            and volume["number"] in [event.volume for event in events]
-        ]
-        # Checking if the lengths of events and volumes are the same
-        if len(unique_events) != len(volumes):
-            print(
-                f"Warning: The number of events ({len(unique_events)}) does not match the number of volumes ({len(volumes)})."
-            )
-        return unique_events, volumes
-
-    def get_valid_records(
-        self, lod: List[Dict], pkey_attr: str, attr: str, na: str = "N/A"
-    ) -> Dict[str, Dict]:
-        """
-        Get valid records from a list of dictionaries based on attribute presence and value, indexed by a primary key.
-
-        Args:
-            lod (List[Dict]): List of dictionaries representing records (events or volumes).
-            pkey_attr (str): The primary key attribute to use for indexing in the return dictionary.
-            attr (str): The attribute name to check in each record.
-            na (str): Placeholder for missing or unavailable data (default is "N/A").
-
-        Returns:
-            Dict[str, Dict]: A dictionary of dictionaries where the specified attribute is valid, indexed by the primary key.
-        """
-        valid_records = {}
-        for record in lod:
-            if not isinstance(record, dict):
-                record = record.__dict__  # Convert to dictionary if not already
-            if attr in record and pkey_attr in record:
-                value = record[attr]
-                pkey = record[pkey_attr]
-                if value and value != na:
-                    valid_records[pkey] = record
-        return valid_records
-
     def calc_list_stats(self, somelist: List[float]) -> dict:
         """
         Calculate and return the statistical summary (min, max, average, median) of a list of numbers.
@@ -324,77 +155,42 @@ subject: "Bayesian Modeling Applications"
             "median": median_value,
         }
 
-    from typing import Dict, List
-
-    def stat_availability(
-        self, stat: Dict[str, float], prefix: str, lod: List[any], valid_lod: List[any]
-    ) -> float:
-        """
-        Add a statistics entry about the availability to the provided statistics dictionary.
-
-        This method calculates the total number of items, the number of available (valid) items,
-        and the percentage of items that are available. It updates the 'stat' dictionary with these
-        values prefixed by the given prefix.
-
-        Args:
-            stat (Dict[str, float]): The dictionary to update with statistics.
-            prefix (str): A string prefix used for the keys in 'stat'.
-            lod (List[any]): The list of all items.
-            valid_lod (List[any]): The list of available (valid) items.
-
-        Returns:
-            float: The percentage of available items in the list.
-
-        Example:
-            If you call `stat_availability(stat, "prefix", [1,2,3], [1,2])`,
-            it will calculate the availability as 66.7 and update the 'stat' dictionary with
-            'prefix total', 'prefix #', and 'prefix %' keys.
-        """
-        # Calculate total, available, and percentage
-
-        total = len(lod)
-        available = len(valid_lod)
-        percent = available / total * 100
-        stat[f"{prefix} total"] = total
-        stat[f"{prefix} #"] = available
-        stat[f"{prefix} %"] = f"{percent:7.1f}"
-        return percent
-
     def test_collect_and_parse_yaml_files(self):
         """
-        Test for collecting YAML files and parsing them into events.
+        Test for collecting YAML files and evaluating their events against the volumes.
         """
-        if self.inPublicCI():
+        if self.inPublicCI() or self.volumes is None:
             return
-        unique_events, volumes = self.get_events_and_volumes("2023-12-")
+        pattern = os.path.join(
+            os.path.expanduser("~/.ceurws/llm/"), "events-2023-12-*.yaml"
+        )
+        store = EventStore.from_files(pattern, run_name="2023-12")
+        if self.debug:
+            print(f"loaded {len(store)} events of {len(store.unique_rows())} volumes")
+        attribute_map = {
+            event_attr: vol_attr
+            for event_attr, vol_attr in self.event_attribute_map.items()
+            if vol_attr
+        }
+        evaluation = EventEvaluation()
+        rows = evaluation.score_table(store, attribute_map, unique=True)
         stats = []
         avails = []
-        # Iterate through each attribute in the event attribute map
-        for event_attr, vol_attr in self.event_attribute_map.items():
-            # Check and print availability stats for each attribute
-            event_records = self.get_valid_records(unique_events, "volume", event_attr)
-            stat = {}
-            attr = f"{event_attr}"
-            # if vol_attr and vol_attr!=event_attr:
-            #    attr+=f"/{vol_attr}"
-
-            if vol_attr:
-                stat["attr"] = attr
-                avail = self.stat_availability(
-                    stat, "event", unique_events, event_records.values()
-                )
-                avails.append(avail)
-
-                volume_records = self.get_valid_records(volumes, "number", vol_attr)
-                self.stat_availability(stat, "volume", volumes, volume_records.values())
-                if vol_attr and event_attr:
-                    precision, recall, f1 = self.calculate_precision_recall(
-                        volume_records, event_records, vol_attr, event_attr
-                    )
-                    stat["prec"] = f"{precision:.2f}" if precision else ""
-                    stat["recall"] = f"{recall:.2f}" if recall else ""
-                    stat["f1"] = f"{f1:.2f}" if f1 else ""
-                stats.append(stat)
+        for row in rows:
+            total = row["events"]
+            avail = row["available"] / total * 100 if total else 0.0
+            avails.append(avail)
+            stat = {
+                "attr": row["attr"],
+                "event total": total,
+                "event #": row["available"],
+                "event %": f"{avail:7.1f}",
+                "volume #": row["expected"],
+                "prec": f"{row['prec']:.2f}" if row["prec"] else "",
+                "recall": f"{row['recall']:.2f}" if row["recall"] else "",
+                "f1": f"{row['f1']:.2f}" if row["f1"] else "",
+            }
+            stats.append(stat)
         markup = tabulate(stats, headers="keys", tablefmt="latex")
         print(markup)
         list_stats = self.calc_list_stats(avails)
@@ -0,0 +1,105 @@
+"""
+Created on 2024-03-02
+
+@author: wf
+"""
+from ngwidgets.basetest import Basetest
+
+from sempubflow.homepage import Homepage
+from tests.local_http_server import LocalHttpServer
+
+
+class TestHomepage(Basetest):
+    """
+    test probing a single homepage against a local HTTP stand-in
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        self.html = "<html><body>" + "CEUR-WS workshop 2024 " * 100 + "</body></html>"
+        self.server = LocalHttpServer()
+        self.server.add_html(
+            "/etag",
+            self.html,
+            etag='"v1"',
+            last_modified="Fri, 01 Mar 2024 10:00:00 GMT",
+        )
+        self.server.add_html(
+            "/modified", self.html, last_modified="Fri, 01 Mar 2024 10:00:00 GMT"
+        )
+        self.server.add_html("/nohead", self.html, allow_head=False)
+        self.server.add_html("/norange", self.html, allow_head=False, allow_range=False)
+        self.server.add_redirect("/redirect", "/etag")
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+        Basetest.tearDown(self)
+
+    def methods(self):
+        """
+        get the HTTP methods of the requests so far
+        """
+        return [method for method, _path, _headers in self.server.requests]
+
+    def test_head_first(self):
+        """
+        test that a HEAD request is enough if the server supports it
+        """
+        homepage = Homepage(volume=1, url=self.server.url("/etag"))
+        self.assertTrue(homepage.check_url())
+        self.assertEqual(["HEAD"], self.methods())
+        self.assertEqual(len(self.html), homepage.content_len)
+        self.assertEqual('"v1"', homepage.etag)
+        self.assertEqual("Fri, 01 Mar 2024 10:00:00 GMT", homepage.last_modified)
+
+    def test_head_redirect(self):
+        """
+        test that HEAD is kept when following a redirect
+        """
+        homepage = Homepage(volume=1, url=self.server.url("/redirect"))
+        self.assertTrue(homepage.check_url())
+        self.assertEqual(["HEAD", "HEAD"], self.methods())
+
+    def test_ranged_get_fallback(self):
+        """
+        test the fallback to a GET for the first byte if HEAD is not allowed
+        """
+        for path in ["/nohead", "/norange"]:
+            with self.subTest(path=path):
+                homepage = Homepage(volume=1, url=self.server.url(path))
+                self.assertTrue(homepage.check_url())
+                self.assertEqual(len(self.html), homepage.content_len)
+                _method, _path, headers = self.server.requests[-1]
+                self.assertEqual("bytes=0-0", headers.get("Range"))
+        self.assertEqual(["HEAD", "GET", "HEAD", "GET"], self.methods())
+
+    def test_conditional_revalidation(self):
+        """
+        test that a recheck sends the validators and detects an unchanged page
+        """
+        for path, header in [
+            ("/etag", "If-None-Match"),
+            ("/modified", "If-Modified-Since"),
+        ]:
+            with self.subTest(path=path):
+                homepage = Homepage(volume=1, url=self.server.url(path))
+                self.assertTrue(homepage.check_url())
+                self.assertFalse(homepage.not_modified)
+                content_len = homepage.content_len
+                self.assertTrue(homepage.check_url())
+                self.assertTrue(homepage.not_modified)
+                self.assertEqual(content_len, homepage.content_len)
+                _method, _path, headers = self.server.requests[-1]
+                self.assertIn(header, headers)
+                # without revalidation the page is checked again
+                self.assertTrue(homepage.check_url(revalidate=False))
+                self.assertFalse(homepage.not_modified)
+
+    def test_dead(self):
+        """
+        test an url nobody listens on
+        """
+        homepage = Homepage(volume=1, url=LocalHttpServer.dead_url())
+        self.assertFalse(homepage.check_url())
+        self.assertIsNone(homepage.content_len)
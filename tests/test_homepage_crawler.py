@@ -0,0 +1,108 @@
+"""
+Created on 2024-03-01
+
+@author: wf
+"""
+import os
+import tempfile
+
+from ngwidgets.basetest import Basetest
+
+from sempubflow.homepage import Homepage, HomepageChecker
+from sempubflow.homepage_crawler import HomepageCrawler
+from tests.local_http_server import LocalHttpServer
+
+
+class TestHomepageCrawler(Basetest):
+    """
+    test the concurrent homepage availability crawler
+    against a local HTTP stand-in
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        self.server = LocalHttpServer()
+        self.server.add_html("/ok", "<html><body>ok</body></html>")
+        self.server.add_html("/busy", "<html><body>busy</body></html>", delay=0.2)
+        self.server.add_html("/slow", "<html><body>slow</body></html>", delay=2.0)
+        self.server.add_redirect("/redirect", "/ok")
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+        Basetest.tearDown(self)
+
+    def test_check_homepages(self):
+        """
+        test checking ok, slow, dead and redirecting urls
+        """
+        urls = {
+            "/ok": True,
+            "/redirect": True,
+            "/slow": False,
+            "/missing": False,
+        }
+        homepages = [
+            Homepage(volume=i + 1, url=self.server.url(path))
+            for i, path in enumerate(urls)
+        ]
+        homepages.append(Homepage(volume=5, url=LocalHttpServer.dead_url()))
+        homepages.append(Homepage(volume=6, url=None))
+        expected = list(urls.values()) + [False, False]
+        crawler = HomepageCrawler(max_concurrency=8, per_host_limit=8, timeout=0.5)
+        results = crawler.run(homepages)
+        self.assertEqual(expected, results)
+        self.assertEqual(expected, [homepage.available for homepage in homepages])
+
+    def test_per_host_limit(self):
+        """
+        test that no more than per_host_limit requests hit a host at a time
+        """
+        homepages = [Homepage(volume=i, url=self.server.url("/busy")) for i in range(8)]
+        checked = []
+        crawler = HomepageCrawler(
+            max_concurrency=8,
+            per_host_limit=2,
+            timeout=2.0,
+            on_checked=checked.append,
+        )
+        results = crawler.run(homepages)
+        self.assertTrue(all(results))
+        self.assertEqual(8, len(checked))
+        self.assertLessEqual(self.server.max_inflight, 2)
+        self.assertEqual(2, self.server.max_inflight)
+
+    def test_max_concurrency(self):
+        """
+        test the global bound on requests in flight
+        """
+        homepages = [Homepage(volume=i, url=self.server.url("/busy")) for i in range(9)]
+        crawler = HomepageCrawler(max_concurrency=3, per_host_limit=8, timeout=2.0)
+        results = crawler.run(homepages)
+        self.assertTrue(all(results))
+        self.assertEqual(9, len(self.server.requests))
+        self.assertEqual(3, self.server.max_inflight)
+
+    def test_process_samples_concurrent(self):
+        """
+        test that the concurrent checker gives the same results as the serial one
+        """
+        paths = ["/ok", "/redirect", "/missing", "/ok", "/busy", "/redirect"]
+        volumes = [
+            {"number": i + 1, "homepage": self.server.url(path)}
+            for i, path in enumerate(paths)
+        ]
+        volumes.append({"number": 7, "homepage": LocalHttpServer.dead_url()})
+        outputs = []
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for max_concurrency in [1, 4]:
+                cache_file = os.path.join(tmpdir, f"homepages-{max_concurrency}.yaml")
+                checker = HomepageChecker(volumes, cache_file=cache_file)
+                checker.process_samples(set_number=2, max_concurrency=max_concurrency)
+                outputs.append((checker.results, checker.prepare_summary_data()))
+                if self.debug:
+                    print(checker.generate_summary_table())
+        self.assertEqual(outputs[0], outputs[1])
+        results, summary = outputs[1]
+        self.assertEqual(6, len(results))
+        self.assertEqual(2, summary[0]["Accessible"])
@@ -0,0 +1,158 @@
+"""
+Created on 2024-03-03
+
+@author: wf
+"""
+import os
+import sqlite3
+import tempfile
+from contextlib import closing
+from datetime import datetime, timedelta
+
+from ngwidgets.basetest import Basetest
+
+from sempubflow import homepage_scheduler
+from sempubflow.homepage import Homepage, HomepageChecker, Homepages
+from sempubflow.homepage_store import HomepageStore
+from tests.local_http_server import LocalHttpServer
+
+
+class TestHomepageScheduler(Basetest):
+    """
+    test the TTL aware homepage recheck scheduler
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        self.now = datetime(2024, 3, 3, 12, 0, 0)
+        self.policy = homepage_scheduler.RecheckPolicy(
+            available_ttl=timedelta(days=30),
+            unavailable_ttl=timedelta(days=1),
+            backoff_factor=2.0,
+            max_ttl=timedelta(days=10),
+        )
+
+    def homepage(self, volume: int, age_days: float, available: bool, failures=0):
+        """
+        create a homepage checked the given number of days ago
+        """
+        homepage = Homepage(
+            volume=volume,
+            url=f"http://example.org/{volume}",
+            available=available,
+            availability_check=self.now - timedelta(days=age_days),
+            failure_count=failures,
+        )
+        return homepage
+
+    def test_ttl(self):
+        """
+        test separate ttls and the exponential backoff
+        """
+        ttl_days = [
+            self.policy.ttl(self.homepage(1, 0, available=True)).days,
+            self.policy.ttl(self.homepage(2, 0, available=False, failures=1)).days,
+            self.policy.ttl(self.homepage(3, 0, available=False, failures=2)).days,
+            self.policy.ttl(self.homepage(4, 0, available=False, failures=4)).days,
+            self.policy.ttl(self.homepage(5, 0, available=False, failures=1000)).days,
+        ]
+        # the available ttl and the backoff are capped by max_ttl
+        self.assertEqual([10, 1, 2, 8, 10], ttl_days)
+
+    def test_select_stale(self):
+        """
+        test selecting the stale slice most overdue first
+        """
+        homepages = [
+            self.homepage(1, age_days=5, available=True),
+            self.homepage(2, age_days=12, available=True),
+            self.homepage(3, age_days=2, available=False, failures=1),
+            self.homepage(4, age_days=2, available=False, failures=3),
+            self.homepage(5, age_days=20, available=False, failures=50),
+        ]
+        scheduler = homepage_scheduler.HomepageRecheckScheduler(policy=self.policy)
+        stale = scheduler.select_stale(homepages, now=self.now)
+        self.assertEqual([5, 2, 3], [hp.volume for hp in stale])
+        stale = scheduler.select_stale(homepages, now=self.now, max_count=2)
+        self.assertEqual([5, 2], [hp.volume for hp in stale])
+
+    def test_never_checked(self):
+        """
+        test that a homepage row with a NULL availability check is stale first
+        """
+        homepages = [
+            self.homepage(1, age_days=20, available=True),
+            Homepage(volume=2, url="http://example.org/2"),
+            self.homepage(3, age_days=1, available=True),
+        ]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = os.path.join(tmpdir, "volume_homepages.db")
+            store = HomepageStore(db_path)
+            store.save(Homepages(homepages))
+            # e.g. a row imported without a check
+            with closing(sqlite3.connect(db_path)) as connection, connection:
+                connection.execute(
+                    "UPDATE homepage SET availability_check=NULL WHERE volume=2"
+                )
+            loaded = store.load().homepages
+        self.assertIsNone(loaded[1].availability_check)
+        scheduler = homepage_scheduler.HomepageRecheckScheduler(policy=self.policy)
+        stale = scheduler.select_stale(loaded, now=self.now)
+        self.assertEqual([2, 1], [hp.volume for hp in stale])
+        self.assertTrue(self.policy.is_stale(loaded[1], now=self.now))
+
+    def test_run_with_time_budget(self):
+        """
+        test that a run stops starting new batches when the time budget is used
+        """
+        server = LocalHttpServer()
+        server.add_html("/busy", "<html><body>busy</body></html>", delay=0.3)
+        server.start()
+        try:
+            homepages = []
+            for volume in range(1, 7):
+                homepage = self.homepage(volume, age_days=100, available=False)
+                homepage.url = server.url("/busy")
+                homepages.append(homepage)
+            scheduler = homepage_scheduler.HomepageRecheckScheduler(
+                policy=self.policy,
+                max_concurrency=2,
+                per_host_limit=2,
+                batch_size=2,
+                timeout=2.0,
+            )
+            rechecked = scheduler.run(homepages, time_budget=0.1)
+            self.assertEqual(2, len(rechecked))
+            for homepage in rechecked:
+                self.assertTrue(homepage.available)
+                self.assertEqual(0, homepage.failure_count)
+                self.assertFalse(self.policy.is_stale(homepage))
+            # the next run picks up the rest
+            rechecked = scheduler.run(homepages)
+            self.assertEqual(4, len(rechecked))
+        finally:
+            server.stop()
+
+    def test_checker_recheck_stale(self):
+        """
+        test rechecking via the HomepageChecker including failure counting
+        """
+        dead_url = LocalHttpServer.dead_url()
+        volumes = [{"number": 1, "homepage": dead_url}]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache_file = os.path.join(tmpdir, "homepages.yaml")
+            checker = HomepageChecker(volumes, cache_file=cache_file)
+            checker.process_samples()
+            homepage = checker.homepages_by_volume[1]
+            self.assertEqual(1, homepage.failure_count)
+            # just checked - nothing is stale
+            self.assertEqual([], checker.recheck_stale(policy=self.policy))
+            homepage.availability_check -= timedelta(days=1)
+            rechecked = checker.recheck_stale(policy=self.policy)
+            self.assertEqual([homepage], rechecked)
+            self.assertEqual(2, homepage.failure_count)
+            # a changed url is rechecked immediately
+            checker.volumes[0]["homepage"] = LocalHttpServer.dead_url("/new")
+            rechecked = checker.recheck_stale(policy=self.policy)
+            self.assertEqual(1, len(rechecked))
+            self.assertTrue(homepage.url.endswith("/new"))
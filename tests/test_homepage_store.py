@@ -0,0 +1,157 @@
+"""
+Created on 2024-03-04
+
+@author: wf
+"""
+import os
+import sqlite3
+import tempfile
+from datetime import datetime
+
+from ngwidgets.basetest import Basetest
+
+from sempubflow.homepage import Homepage, HomepageChecker, Homepages
+from sempubflow.homepage_store import HomepageStore
+
+
+class TestHomepageStore(Basetest):
+    """
+    test the SQLite homepage store
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "volume_homepages.db")
+        self.homepages = Homepages(
+            [
+                Homepage(
+                    volume=volume,
+                    url=f"http://example.org/{volume}",
+                    text=f"Workshop {volume}\n" * 200 if volume % 2 else None,
+                    available=bool(volume % 2),
+                    content_len=1000 + volume,
+                    availability_check=datetime(2024, 3, volume),
+                    etag=f'"{volume}"',
+                    failure_count=0 if volume % 2 else volume,
+                )
+                for volume in range(1, 11)
+            ]
+        )
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+        Basetest.tearDown(self)
+
+    def write_yaml(self, homepages: Homepages, yaml_path: str):
+        """
+        write the given homepages as legacy YAML cache
+        """
+        with open(yaml_path, "w") as yaml_file:
+            yaml_file.write(homepages.to_yaml())
+
+    def test_round_trip(self):
+        """
+        test saving and loading all fields
+        """
+        store = HomepageStore(self.db_path)
+        self.assertEqual(10, store.save(self.homepages))
+        loaded = HomepageStore(self.db_path).load()
+        self.assertEqual(self.homepages, loaded)
+        self.assertEqual(self.homepages.homepages[0].text, store.get_text(1))
+        self.assertIsNone(store.get_text(2))
+        # texts are stored compressed
+        with sqlite3.connect(self.db_path) as connection:
+            size = connection.execute(
+                "SELECT SUM(LENGTH(text)) FROM homepage_text"
+            ).fetchone()[0]
+        text_size = sum(len(hp.text) for hp in self.homepages.homepages if hp.text)
+        self.assertLess(size * 10, text_size)
+
+    def test_upsert_changed_only(self):
+        """
+        test that only changed rows are written
+        """
+        store = HomepageStore(self.db_path)
+        store.save(self.homepages)
+        self.assertEqual(0, store.save(self.homepages))
+        self.homepages.homepages[1].available = True
+        self.homepages.homepages[2].text = "changed"
+        self.homepages.homepages[4].text = None
+        self.homepages.homepages.append(Homepage(volume=11, url="http://example.org"))
+        self.assertEqual(4, store.save(self.homepages))
+        self.assertEqual(0, store.save(self.homepages))
+        loaded = HomepageStore(self.db_path).load()
+        self.assertEqual(self.homepages, loaded)
+
+    def test_load_without_text(self):
+        """
+        test that saving homepages loaded without text keeps the stored texts
+        """
+        HomepageStore(self.db_path).save(self.homepages)
+        store = HomepageStore(self.db_path)
+        homepages = store.load(with_text=False)
+        self.assertTrue(all(hp.text is None for hp in homepages.homepages))
+        homepages.homepages[0].failure_count = 3
+        self.assertEqual(1, store.save(homepages))
+        self.assertEqual(self.homepages.homepages[0].text, store.get_text(1))
+
+    def test_import_and_checker(self):
+        """
+        test importing legacy homepages and using the store via the checker
+        """
+        store = HomepageStore(self.db_path)
+        self.assertEqual(10, store.import_homepages(self.homepages))
+        volumes = [{"number": 12, "homepage": None}]
+        checker = HomepageChecker(volumes, cache_file=self.db_path)
+        self.assertEqual(10, len(checker.homepages.homepages))
+        checker.process_samples(with_save=True)
+        self.assertEqual(11, len(HomepageStore(self.db_path).load().homepages))
+
+    def test_schema_upgrade(self):
+        """
+        test that databases of former versions get the new columns
+        """
+        with sqlite3.connect(self.db_path) as connection:
+            connection.execute(
+                """CREATE TABLE homepage (volume INTEGER PRIMARY KEY, url TEXT,
+                available INTEGER NOT NULL, content_len INTEGER, availability_check TEXT,
+                etag TEXT, last_modified TEXT, failure_count INTEGER NOT NULL DEFAULT 0)"""
+            )
+            connection.execute(
+                "INSERT INTO homepage (volume, url, available) VALUES (1, 'http://example.org', 1)"
+            )
+        connection.close()
+        store = HomepageStore(self.db_path)
+        homepage = store.load().homepages[0]
+        self.assertIsNone(homepage.html_hash)
+        homepage.html_hash = "0" * 64
+        self.assertEqual(1, store.save(Homepages([homepage])))
+        self.assertEqual(
+            "0" * 64, HomepageStore(self.db_path).load().homepages[0].html_hash
+        )
+
+    def test_migrate_from_yaml(self):
+        """
+        test the migration of a legacy YAML cache into a new store
+        """
+        yaml_path = os.path.join(self.tmpdir.name, "volume_homepages.yaml")
+        self.write_yaml(self.homepages, yaml_path)
+        store = HomepageStore(os.path.join(self.tmpdir.name, "direct.db"))
+        self.assertEqual(10, store.migrate_from_yaml(yaml_path))
+        self.assertEqual(self.homepages, store.load())
+
+    def test_automatic_migration(self):
+        """
+        test that the checker migrates the YAML cache next to a new store once
+        """
+        yaml_path = os.path.join(self.tmpdir.name, "volume_homepages.yaml")
+        self.write_yaml(self.homepages, yaml_path)
+        checker = HomepageChecker([], cache_file=self.db_path)
+        self.assertTrue(os.path.exists(self.db_path))
+        self.assertEqual(self.homepages, checker.homepages)
+        # a changed YAML cache is not migrated again
+        self.write_yaml(Homepages(self.homepages.homepages[:3]), yaml_path)
+        checker = HomepageChecker([], cache_file=self.db_path)
+        self.assertEqual(10, len(checker.homepages.homepages))
+        self.assertEqual(self.homepages, HomepageStore(self.db_path).load())
@@ -3,20 +3,20 @@ Created on 2023-12-20
 
 @author: wf
 """
-import json
 import os
 import random
-import sys
 from datetime import datetime
 
 from ngwidgets.basetest import Basetest
 from ngwidgets.llm import LLM
 from tqdm import tqdm
 
-from sempubflow.event import Event, Events
-from sempubflow.event_info import EventInfo
+from sempubflow.event import Event
+from sempubflow.event_extraction import EventExtractionRunner
 from sempubflow.homepage import HomepageChecker, PercentageTable
+from sempubflow.llm_cache import LlmResponseCache
 from sempubflow.plot import Histogram
+from sempubflow.volume_registry import VolumeRegistry
 
 
 class TestHomepages(Basetest):
@@ -28,19 +28,15 @@ class TestHomepages(Basetest):
         Basetest.setUp(self, debug=debug, profile=profile)
         self.llm = LLM()
         self.ceurws_path = os.path.expanduser("~/.ceurws")
-        self.volumes_path = os.path.join(self.ceurws_path, "volumes.json")
         self.volumes = self.get_volumes()
         self.checker = self.get_checker()
 
     def get_volumes(self):
-        # Path to the volumes.json file
-        # Ensure the file exists
-        if not os.path.exists(self.volumes_path):
+        # the volumes are loaded once per process
+        registry = VolumeRegistry.get_instance()
+        if not registry.is_available():
             return None
-        # Read the JSON data
-        with open(self.volumes_path, "r") as file:
-            volumes_data = json.load(file)
-        return volumes_data
+        return registry.volumes
 
     def test_home_pages_count(self):
         """
@@ -277,20 +273,19 @@ class TestHomepages(Basetest):
         debug = True
         vol_numbers = self.get_random_homepages(sample_size=50, max_len=10000)
         llm = LLM()
-
-        events = Events()
         log_path = os.path.join(self.ceurws_path, "llm")
         os.makedirs(
             log_path, exist_ok=True
         )  # Create llm directory if it doesn't exist.
         log_file = f"events-{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.yaml"
-        for vol_number in tqdm(vol_numbers):
-            try:
-                hp = self.checker.homepages_by_volume[vol_number]
-                event_info = EventInfo(llm, debug=debug)
-                event = event_info.get_event_metadata_from_homepage(hp, temperature=0.0)
-                event.volume = vol_number
-                events.events.append(event)
-            except Exception as ex:
-                print(str(ex), file=sys.stderr)
-        events.save_to_file(os.path.join(log_path, log_file))
+        homepages = [self.checker.homepages_by_volume[vol] for vol in vol_numbers]
+        runner = EventExtractionRunner(
+            llm,
+            os.path.join(log_path, log_file),
+            llm_cache=LlmResponseCache(),
+            progress_bar=tqdm(),
+            debug=debug,
+        )
+        events = runner.run(homepages)
+        if debug:
+            print(f"{len(events)} events extracted {runner.failed} failed")
@@ -0,0 +1,163 @@
+"""
+Created on 2024-03-05
+
+@author: wf
+"""
+import glob
+import os
+import time
+import tracemalloc
+
+from ngwidgets.basetest import Basetest
+from tabulate import tabulate
+
+from sempubflow.homepage import Homepage
+from sempubflow.html_text import HAS_LXML, extract_text
+from tests.local_http_server import LocalHttpServer
+
+
+class TestHtmlText(Basetest):
+    """
+    test the streaming html text extraction
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        self.parsers = ["lxml", "bs4"] if HAS_LXML else ["bs4"]
+
+    def sample_html(self, index: int = 1, paragraphs: int = 50) -> str:
+        """
+        get a CEUR-WS workshop like homepage
+        """
+        body = "\n".join(
+            f"<p>Session {i}: Paper {i} on <b>Knowledge  Graphs</b> and LLMs</p>"
+            for i in range(paragraphs)
+        )
+        html = f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>KGW {index}</title>
+<style>body {{ color: black }}</style>
+<script>var tracking = "not visible";</script></head>
+<body>
+<h1>{index}th International Workshop on Knowledge Graphs (KGW 2024)</h1>
+<!-- a comment -->
+<p>Hersonissos, Crete, Greece – May 26-27, 2024 – Zürich</p>
+{body}
+<script>console.log("not visible either")</script>
+</body></html>"""
+        return html
+
+    def test_extract_text(self):
+        """
+        test that all parsers extract the same visible text
+        """
+        html = self.sample_html().encode("utf-8")
+        texts = {}
+        for parser in self.parsers:
+            with self.subTest(parser=parser):
+                text = extract_text(html, parser=parser)
+                self.assertIn("International Workshop on Knowledge Graphs", text)
+                self.assertIn("Zürich", text)
+                self.assertNotIn("visible", text)
+                self.assertNotIn("comment", text)
+                self.assertNotIn("KGW 1</title>", text)
+                texts[parser] = text
+        self.assertEqual(1, len(set(texts.values())))
+
+    def test_charset_and_chunks(self):
+        """
+        test decoding with declared, meta and sniffed charsets across chunk borders
+        """
+        html = "<html><body><p>Université de Montréal – Köln</p></body></html>"
+        for charset, declared in [
+            ("utf-8", "utf-8"),
+            ("latin-1", "latin-1"),
+            ("cp1252", None),
+            ("utf-8", None),
+        ]:
+            data = html.encode(charset, errors="replace")
+            chunks = [data[i : i + 7] for i in range(0, len(data), 7)]
+            for parser in self.parsers:
+                with self.subTest(charset=charset, declared=declared, parser=parser):
+                    text = extract_text(chunks, charset=declared, parser=parser)
+                    self.assertIn("Université de Montréal", text)
+
+    def test_max_bytes(self):
+        """
+        test that the extraction stops after the byte cap
+        """
+        html = self.sample_html(paragraphs=1000).encode("utf-8")
+        for parser in self.parsers:
+            with self.subTest(parser=parser):
+                text = extract_text(html, max_bytes=2000, parser=parser)
+                self.assertIn("Session 1:", text)
+                self.assertNotIn("Session 999", text)
+
+    def test_homepage_get_text(self):
+        """
+        test streaming a homepage from a local server with a byte cap
+        """
+        server = LocalHttpServer()
+        server.add_html("/kgw", self.sample_html(paragraphs=1000))
+        server.start()
+        try:
+            homepage = Homepage(volume=1, url=server.url("/kgw"))
+            text = homepage.get_text()
+            self.assertEqual("utf-8", homepage.charset)
+            self.assertFalse(homepage.truncated)
+            self.assertIn("Session 999", text)
+            text = homepage.get_text(max_bytes=4096)
+            self.assertTrue(homepage.truncated)
+            self.assertNotIn("Session 999", text)
+            html = homepage.read(max_bytes=100)
+            self.assertEqual(100, len(html))
+        finally:
+            server.stop()
+
+    def get_corpus(self) -> list:
+        """
+        get a corpus of saved CEUR-WS homepages or a synthetic one
+        """
+        corpus_path = os.path.expanduser("~/.ceurws/homepages_html")
+        html_files = sorted(glob.glob(os.path.join(corpus_path, "*.html")))
+        if html_files:
+            corpus = []
+            for html_file in html_files:
+                with open(html_file, "rb") as file:
+                    corpus.append(file.read())
+        else:
+            corpus = [
+                self.sample_html(index, paragraphs=50 + index * 20).encode("utf-8")
+                for index in range(20)
+            ]
+        return corpus
+
+    def test_benchmark(self):
+        """
+        compare throughput and peak memory of the parsers
+
+        the peak memory is measured with tracemalloc and therefore only
+        covers allocations on the Python heap
+        """
+        corpus = self.get_corpus()
+        total_bytes = sum(len(html) for html in corpus)
+        rows = []
+        for parser in self.parsers:
+            tracemalloc.start()
+            start_time = time.perf_counter()
+            for html in corpus:
+                extract_text(html, parser=parser)
+            elapsed = time.perf_counter() - start_time
+            _current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            rows.append(
+                {
+                    "parser": parser,
+                    "pages": len(corpus),
+                    "MB": total_bytes / 1024 / 1024,
+                    "pages/s": len(corpus) / elapsed,
+                    "MB/s": total_bytes / 1024 / 1024 / elapsed,
+                    "peak KB": peak / 1024,
+                }
+            )
+        if self.debug:
+            print(tabulate(rows, headers="keys", floatfmt=".1f"))
@@ -0,0 +1,106 @@
+"""
+Created on 2024-03-14
+
+@author: wf
+"""
+import time
+
+import requests
+from ngwidgets.basetest import Basetest
+
+from sempubflow.homepage import Homepage
+from sempubflow.http_client import HttpClient
+from sempubflow.models.scholar import Scholar
+from sempubflow.services.dblp import Dblp
+from tests.local_http_server import LocalHttpServer
+
+
+class TestHttpClient(Basetest):
+    """
+    test the pooled outbound HTTP client against a local HTTP stand-in
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        self.server = LocalHttpServer(keep_alive=True)
+        self.server.add_json("/search/author/api", '{"result": {"hits": {}}}')
+        self.server.add_html("/home", "<html><body>CEUR-WS workshop</body></html>")
+        self.server.add_redirect("/redirect", "/home")
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+        Basetest.tearDown(self)
+
+    def test_keep_alive(self):
+        """
+        test that homepage checks and reads reuse pooled connections
+        """
+        http_client = HttpClient()
+        for _i in range(5):
+            response = http_client.head(self.server.url("/redirect"))
+            self.assertEqual(200, response.status_code)
+        self.assertEqual(1, self.server.connection_count)
+        homepage = Homepage(volume=1, url=self.server.url("/home"))
+        for _i in range(3):
+            self.assertTrue(homepage.check_url())
+            self.assertIn("CEUR-WS", homepage.get_text())
+        self.assertEqual("utf-8", homepage.charset)
+        # one connection for the probe and one for the default client
+        self.assertEqual(3, self.server.connection_count)
+        http_client.close()
+
+    def test_retry(self):
+        """
+        test that temporary failures are retried
+        """
+        attempts = []
+
+        def flaky(handler):
+            attempts.append(handler.command)
+            code = 503 if len(attempts) < 3 else 200
+            handler.send_response(code)
+            handler.send_header("Content-Length", "0")
+            handler.end_headers()
+
+        self.server.routes["/flaky"] = flaky
+        http_client = HttpClient(backoff_factor=0.01)
+        response = http_client.get(self.server.url("/flaky"))
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(3, len(attempts))
+        probe_client = HttpClient(max_retries=0)
+        attempts.clear()
+        response = probe_client.get(self.server.url("/flaky"))
+        self.assertEqual(503, response.status_code)
+        self.assertEqual(1, len(attempts))
+
+    def test_dblp_benchmark(self):
+        """
+        benchmark repeated dblp lookups with pooled connections
+        against a new connection per request
+        """
+        endpoint_url = self.server.url("/search/author/api")
+        dblp = Dblp(endpoint_url=endpoint_url)
+        dblp.http_client = HttpClient()
+        search_mask = Scholar(given_name="Stefan", family_name="Decker")
+        lookups = 100
+        # warm up
+        dblp.get_scholar_suggestions(search_mask)
+        start_time = time.perf_counter()
+        for _i in range(lookups):
+            self.assertEqual([], dblp.get_scholar_suggestions(search_mask))
+        pooled = (time.perf_counter() - start_time) / lookups
+        pooled_connections = self.server.connection_count
+        start_time = time.perf_counter()
+        for _i in range(lookups):
+            response = requests.get(endpoint_url, params={"q": "Stefan Decker"})
+            self.assertEqual(200, response.status_code)
+        unpooled = (time.perf_counter() - start_time) / lookups
+        unpooled_connections = self.server.connection_count - pooled_connections
+        if self.debug:
+            print(
+                f"pooled: {pooled * 1000:.2f} ms unpooled: {unpooled * 1000:.2f} ms "
+                f"saved: {(unpooled - pooled) * 1000:.2f} ms per request"
+            )
+        self.assertEqual(1, pooled_connections)
+        self.assertEqual(lookups, unpooled_connections)
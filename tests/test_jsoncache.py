@@ -0,0 +1,169 @@
+"""
+Created on 2024-03-17
+
+@author: wf
+"""
+import gzip
+import os
+import tempfile
+import threading
+
+import orjson
+from ngwidgets.basetest import Basetest
+
+from sempubflow.jsoncache import HAS_ZSTD, JsonCacheManager
+from tests.local_http_server import LocalHttpServer
+
+
+class TestJsonCacheManager(Basetest):
+    """
+    test atomic, versioned and compressed cache writes
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.manager = JsonCacheManager(root_path=self.tmpdir.name)
+        self.lod = [{"number": i, "title": f"Workshop {i}"} for i in range(1, 2001)]
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+        Basetest.tearDown(self)
+
+    def test_store(self):
+        """
+        test that store writes a plain json file and its header
+        """
+        self.assertTrue(self.manager.is_stale("volumes"))
+        self.manager.store("volumes", self.lod)
+        json_path = self.manager.json_path("volumes")
+        with open(json_path, "rb") as json_file:
+            self.assertEqual(self.lod, orjson.loads(json_file.read()))
+        meta = self.manager.get_meta("volumes")
+        self.assertEqual(JsonCacheManager.schema_version, meta["schema_version"])
+        self.assertEqual(2000, meta["count"])
+        self.assertEqual(os.path.getsize(json_path), meta["size"])
+        self.assertFalse(self.manager.is_stale("volumes"))
+        self.assertTrue(self.manager.is_stale("volumes", max_age=-1))
+        # no temporary files are left
+        self.assertEqual(
+            ["volumes.json", "volumes.meta.json"], sorted(os.listdir(self.tmpdir.name))
+        )
+        # a cache written by another tool has no matching header
+        with open(json_path, "wb") as json_file:
+            json_file.write(orjson.dumps(self.lod[:10]))
+        self.assertTrue(self.manager.is_stale("volumes"))
+
+    def test_compressed(self):
+        """
+        test the zstd compressed cache
+        """
+        if not HAS_ZSTD:
+            self.skipTest("zstandard is not installed")
+        self.manager.store("volumes", self.lod)
+        self.manager.store("volumes", self.lod, compress=True)
+        self.assertFalse(os.path.isfile(self.manager.json_path("volumes")))
+        self.assertEqual("zstd", self.manager.get_meta("volumes")["compression"])
+        self.assertEqual(self.lod, self.manager.load_lod("volumes"))
+        self.assertFalse(self.manager.is_stale("volumes"))
+
+    def test_concurrent_readers(self):
+        """
+        test that readers never see a partially written cache
+        """
+        self.manager.store("volumes", self.lod)
+        errors = []
+        done = threading.Event()
+
+        def read():
+            while not done.is_set():
+                try:
+                    lod = self.manager.load_lod("volumes")
+                    if len(lod) not in (2000, 1000):
+                        errors.append(len(lod))
+                except Exception as ex:
+                    errors.append(ex)
+
+        readers = [threading.Thread(target=read) for _i in range(4)]
+        for reader in readers:
+            reader.start()
+        for i in range(20):
+            self.manager.store("volumes", self.lod if i % 2 else self.lod[:1000])
+        done.set()
+        for reader in readers:
+            reader.join()
+        self.assertEqual([], errors)
+
+    def serve_lod(self, server: LocalHttpServer, path: str, lod: list, etag: str):
+        """
+        serve the given list of dicts with the given ETag - gzipped for .gz paths
+        """
+        body = orjson.dumps(lod)
+        if path.endswith(".gz"):
+            body = gzip.compress(body)
+
+        def route(handler):
+            if handler.headers.get("If-None-Match") == etag:
+                handler.send_response(304)
+                handler.send_header("ETag", etag)
+                handler.end_headers()
+                return
+            handler.send_response(200)
+            handler.send_header("ETag", etag)
+            handler.send_header("Content-Length", str(len(body)))
+            handler.end_headers()
+            handler.wfile.write(body)
+
+        server.routes[path] = route
+
+    def test_remote_refresh(self):
+        """
+        test persisting and revalidating the download of a missing cache
+        """
+        server = LocalHttpServer().start()
+        try:
+            self.serve_lod(server, "/volumes.json", self.lod, '"v1"')
+            manager = JsonCacheManager(
+                base_url=server.base_url, root_path=self.tmpdir.name
+            )
+            self.assertEqual(self.lod, manager.load_lod("volumes"))
+            self.assertEqual(self.lod, manager.load_lod("volumes"))
+            # the download is persisted for other processes
+            other = JsonCacheManager(
+                base_url=server.base_url, root_path=self.tmpdir.name
+            )
+            self.assertEqual(self.lod, other.load_lod("volumes"))
+            self.assertEqual(1, len(server.requests))
+            self.assertEqual('"v1"', manager.get_meta("volumes")["remote"]["etag"])
+            # revalidation of an unchanged remote
+            manager.revalidate_after = 0
+            self.assertEqual(self.lod, manager.load_lod("volumes"))
+            _method, _path, headers = server.requests[-1]
+            self.assertEqual('"v1"', headers.get("If-None-Match"))
+            self.assertFalse(manager.is_stale("volumes"))
+            # revalidation of a changed remote
+            self.serve_lod(server, "/volumes.json", self.lod[:5], '"v2"')
+            self.assertEqual(self.lod[:5], manager.load_lod("volumes"))
+            self.assertEqual(3, len(server.requests))
+        finally:
+            server.stop()
+        # the local copy is used if the remote is not reachable
+        self.assertEqual(self.lod[:5], manager.load_lod("volumes"))
+
+    def test_gzipped_remote(self):
+        """
+        test the streaming decompression of a gzipped remote
+        """
+        server = LocalHttpServer().start()
+        try:
+            self.serve_lod(server, "/volumes.json.gz", self.lod, '"gz1"')
+            manager = JsonCacheManager(
+                base_url=server.base_url,
+                root_path=self.tmpdir.name,
+                remote_ext=".json.gz",
+            )
+            self.assertEqual(self.lod, manager.load_lod("volumes"))
+            with open(manager.json_path("volumes"), "rb") as json_file:
+                self.assertEqual(self.lod, orjson.loads(json_file.read()))
+        finally:
+            server.stop()
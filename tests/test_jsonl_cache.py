@@ -0,0 +1,136 @@
+"""
+Created on 2024-03-16
+
+@author: wf
+"""
+import os
+import tempfile
+import tracemalloc
+
+import orjson
+from ngwidgets.basetest import Basetest
+
+from sempubflow.jsoncache import JsonCacheManager
+from sempubflow.jsonl_cache import JsonLinesCache
+from tests.local_http_server import LocalHttpServer
+
+
+class TestJsonLinesCache(Basetest):
+    """
+    test the memory mapped JSON lines cache
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.lod = [
+            {
+                "number": i,
+                "acronym": f"WS{i}",
+                "title": f"Proceedings of the workshop {i}\nwith a newline",
+                "homepage": f"http://ws{i}.example.org",
+            }
+            for i in range(1, 5001)
+        ]
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+        Basetest.tearDown(self)
+
+    def test_access(self):
+        """
+        test iteration, random access by row and key and projection
+        """
+        path = os.path.join(self.tmpdir.name, "volumes.jsonl")
+        self.assertEqual(5000, JsonLinesCache.write(self.lod, path, key="number"))
+        with JsonLinesCache(path) as cache:
+            self.assertEqual(5000, len(cache))
+            self.assertEqual(self.lod, list(cache))
+            self.assertEqual(self.lod[41], cache[41])
+            self.assertEqual("WS42", cache.get(42)["acronym"])
+            self.assertEqual("WS42", cache.get("42")["acronym"])
+            self.assertIsNone(cache.get(5001))
+            projection = list(cache.project(["number", "acronym"]))
+            self.assertEqual({"number": 1, "acronym": "WS1"}, projection[0])
+            with self.assertRaises(IndexError):
+                cache[5000]
+        # without key index
+        JsonLinesCache.write([], path)
+        with JsonLinesCache(path) as cache:
+            self.assertEqual([], list(cache))
+            with self.assertRaises(ValueError):
+                cache.get(1)
+
+    def test_torn_write(self):
+        """
+        test that a data file without its matching index is detected
+        """
+        path = os.path.join(self.tmpdir.name, "volumes.jsonl")
+        other_path = os.path.join(self.tmpdir.name, "other.jsonl")
+        JsonLinesCache.write(self.lod[:10], path, key="number")
+        JsonLinesCache.write(self.lod[:20], other_path, key="number")
+        self.assertTrue(JsonLinesCache.is_valid(path))
+        # no temporary files are left behind
+        self.assertEqual(
+            ["other.jsonl", "other.jsonl.idx", "volumes.jsonl", "volumes.jsonl.idx"],
+            sorted(os.listdir(self.tmpdir.name)),
+        )
+        # the new data has been renamed but the index is still the old one
+        os.replace(other_path, path)
+        self.assertFalse(JsonLinesCache.is_valid(path))
+        with self.assertRaises(ValueError):
+            JsonLinesCache(path)
+
+    def test_peak_memory(self):
+        """
+        test that a key lookup needs much less memory than load_lod
+        """
+        manager = JsonCacheManager(root_path=self.tmpdir.name)
+        manager.store("volumes", self.lod)
+        tracemalloc.start()
+        lod = manager.load_lod("volumes")
+        _current, lod_peak = tracemalloc.get_traced_memory()
+        del lod
+        tracemalloc.reset_peak()
+        with manager.open_lod("volumes") as cache:
+            _current, open_peak = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            self.assertEqual("WS4711", cache.get(4711)["acronym"])
+            _current, get_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        if self.debug:
+            print(f"load_lod: {lod_peak} open: {open_peak} get: {get_peak} bytes")
+        self.assertLess(get_peak * 100, lod_peak)
+
+    def test_manager(self):
+        """
+        test the JSON lines copy of the cache manager
+        """
+        manager = JsonCacheManager(root_path=self.tmpdir.name)
+        manager.store("volumes", self.lod[:10])
+        self.assertFalse(manager.is_jsonl_current("volumes"))
+        with manager.open_lod("volumes") as cache:
+            self.assertEqual("WS3", cache.get(3)["acronym"])
+        # the copy is kept in sync by store
+        manager.store("volumes", self.lod[:20])
+        with manager.open_lod("volumes") as cache:
+            self.assertEqual(20, len(cache))
+        # the compatibility path works from the JSON lines copy only
+        os.remove(manager.json_path("volumes"))
+        self.assertEqual(self.lod[:20], manager.load_lod("volumes"))
+
+    def test_download(self):
+        """
+        test creating the JSON lines copy from the download
+        """
+        server = LocalHttpServer()
+        server.add_json("/dblp.json", orjson.dumps(self.lod[:3]).decode())
+        server.start()
+        try:
+            manager = JsonCacheManager(
+                base_url=server.base_url, root_path=self.tmpdir.name
+            )
+            with manager.open_lod("dblp", key="acronym") as cache:
+                self.assertEqual(2, cache.get("WS2")["number"])
+        finally:
+            server.stop()
@@ -0,0 +1,80 @@
+"""
+Created on 2024-03-08
+
+@author: wf
+"""
+import os
+import tempfile
+
+from ngwidgets.basetest import Basetest
+
+from sempubflow.event_info import EventInfo
+from sempubflow.llm_cache import LlmResponseCache
+from tests.fake_llm import FakeLLM
+
+
+class TestLlmCache(Basetest):
+    """
+    test the LLM response cache
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "llm_cache.db")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+        Basetest.tearDown(self)
+
+    def test_ask(self):
+        """
+        test that repeated requests are answered from the cache
+        """
+        llm = FakeLLM()
+        cache = LlmResponseCache(self.db_path)
+        answer = cache.ask(llm, "prompt", "text", "gpt-4", 0.0)
+        self.assertEqual(answer, cache.ask(llm, "prompt", "text", "gpt-4", 0))
+        self.assertEqual(["prompt\ntext"], llm.prompts)
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+        # each part of the key matters
+        cache.ask(llm, "prompt", "other text", "gpt-4", 0.0)
+        cache.ask(llm, "prompt", "text", "gpt-3.5", 0.0)
+        cache.ask(llm, "prompt", "text", "gpt-4", 0.7)
+        cache.ask(llm, "other prompt", "text", "gpt-4", 0.0)
+        self.assertEqual(5, len(llm.prompts))
+        # the cache persists and works as an offline stand in
+        offline = FakeLLM(is_available=False)
+        cache = LlmResponseCache(self.db_path)
+        self.assertEqual(answer, cache.ask(offline, "prompt", "text", "gpt-4", 0.0))
+        self.assertIsNone(cache.ask(offline, "prompt", "new", "gpt-4", 0.0))
+        self.assertEqual([], offline.prompts)
+
+    def test_eviction(self):
+        """
+        test that the least recently used responses are evicted
+        """
+        cache = LlmResponseCache(self.db_path, max_bytes=100)
+        keys = [cache.key_of("prompt", str(i), "model", 0.0) for i in range(4)]
+        cache.put(keys[0], "a" * 40)
+        cache.put(keys[1], "b" * 40)
+        # touch the first response so that the second one is the oldest
+        self.assertEqual("a" * 40, cache.get(keys[0]))
+        cache.put(keys[2], "c" * 40)
+        self.assertIsNone(cache.get(keys[1]))
+        self.assertEqual("a" * 40, cache.get(keys[0]))
+        self.assertEqual("c" * 40, cache.get(keys[2]))
+
+    def test_event_info(self):
+        """
+        test that EventInfo uses the cache
+        """
+        llm = FakeLLM()
+        cache = LlmResponseCache(self.db_path)
+        event_info = EventInfo(llm, llm_cache=cache)
+        event_info.text = "1st Workshop on Knowledge Graphs"
+        answer = event_info.ask_llm(model="gpt-4", temperature=0.0)
+        self.assertEqual(answer, event_info.ask_llm(model="gpt-4", temperature=0.0))
+        self.assertEqual(1, len(llm.prompts))
+        self.assertTrue(llm.prompts[0].startswith(event_info.prompt_prefix))
+        self.assertTrue(llm.prompts[0].endswith(event_info.text))
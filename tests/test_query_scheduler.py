@@ -0,0 +1,133 @@
+"""
+Created on 2024-03-11
+
+@author: wf
+"""
+import asyncio
+import threading
+
+from ngwidgets.basetest import Basetest
+
+from sempubflow.query_scheduler import QueryScheduler
+
+
+class TestQueryScheduler(Basetest):
+    """
+    test the debouncing and coalescing query scheduler
+    """
+
+    def test_debounce(self):
+        """
+        test that rapid triggers are merged into a single query
+        """
+        queries = []
+
+        async def query():
+            queries.append(scheduler.trigger_count)
+
+        scheduler = QueryScheduler(query, delay=0.05, min_interval=0.0)
+
+        async def type_name():
+            for _char in "Wolfgang Fahl":
+                scheduler.trigger()
+                await asyncio.sleep(0.005)
+            await scheduler.wait()
+
+        asyncio.run(type_name())
+        self.assertEqual([13], queries)
+        self.assertEqual(1, scheduler.query_count)
+
+    def test_coalesce(self):
+        """
+        test that triggers during a running query lead to a single follow up
+        query after the minimum interval
+        """
+        starts = []
+
+        async def query():
+            starts.append(asyncio.get_running_loop().time())
+            await asyncio.sleep(0.05)
+
+        scheduler = QueryScheduler(query, delay=0.0, min_interval=0.2)
+
+        async def edit():
+            scheduler.trigger()
+            await asyncio.sleep(0.01)
+            for _i in range(5):
+                scheduler.trigger()
+                await asyncio.sleep(0.005)
+            await scheduler.wait()
+
+        asyncio.run(edit())
+        self.assertEqual(2, len(starts))
+        self.assertGreaterEqual(starts[1] - starts[0], 0.19)
+
+    def test_errors(self):
+        """
+        test that errors are passed to the handler
+        """
+        errors = []
+
+        async def query():
+            raise ValueError("endpoint down")
+
+        scheduler = QueryScheduler(query, delay=0.0, on_error=errors.append)
+
+        async def trigger():
+            scheduler.trigger()
+            await scheduler.wait()
+
+        asyncio.run(trigger())
+        self.assertEqual(["endpoint down"], [str(error) for error in errors])
+
+    def test_backend_slot(self):
+        """
+        test the global limit of concurrent backend queries
+        """
+        inflight = 0
+        max_inflight = 0
+
+        async def backend_query():
+            nonlocal inflight, max_inflight
+            async with QueryScheduler.backend_slot():
+                inflight += 1
+                max_inflight = max(max_inflight, inflight)
+                await asyncio.sleep(0.01)
+                inflight -= 1
+
+        async def many_users():
+            await asyncio.gather(*[backend_query() for _i in range(30)])
+
+        asyncio.run(many_users())
+        self.assertEqual(QueryScheduler.max_backend_queries, max_inflight)
+
+    def test_call_in_slot(self):
+        """
+        test that cancelled callers keep their slot until the thread finished
+        """
+        release = threading.Event()
+
+        def blocking_query(value):
+            release.wait(5)
+            return value
+
+        async def cancelled_users():
+            semaphore = QueryScheduler.backend_semaphore()
+            tasks = [
+                asyncio.ensure_future(QueryScheduler.call_in_slot(blocking_query, i))
+                for i in range(QueryScheduler.max_backend_queries)
+            ]
+            await asyncio.sleep(0.05)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # the threads are still running
+            locked_after_cancel = semaphore.locked()
+            release.set()
+            result = await QueryScheduler.call_in_slot(blocking_query, 42)
+            return locked_after_cancel, result, semaphore.locked()
+
+        locked_after_cancel, result, locked_at_end = asyncio.run(cancelled_users())
+        self.assertTrue(locked_after_cancel)
+        self.assertEqual(42, result)
+        self.assertFalse(locked_at_end)
@@ -0,0 +1,134 @@
+"""
+Created on 2024-03-25
+
+@author: wf
+"""
+import json
+import os
+import tempfile
+
+from ngwidgets.basetest import Basetest
+
+from sempubflow.models.scholar import Scholar
+from sempubflow.sempubflow_cmd import SemPubFlowCmd
+from sempubflow.services.scholar_index import DblpIdIndex, ScholarIndex
+from tests.local_http_server import LocalHttpServer
+
+
+class RecordingCmd(SemPubFlowCmd):
+    """
+    command line handler that records the dispatched actions instead of running them
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def build_scholar_index(self, args):
+        self.calls.append(("build_scholar_index", args))
+
+    def extract_texts(self, args):
+        self.calls.append(("extract_texts", args))
+
+
+class TestSemPubFlowCmd(Basetest):
+    """
+    test the command line handling
+    """
+
+    def test_parser(self):
+        """
+        test that the specific arguments are added to the inherited ones
+        """
+        cmd = SemPubFlowCmd()
+        args = cmd.parse_args(
+            ["--extract-texts", "--maxConcurrency", "4", "--offline", "-f"]
+        )
+        self.assertTrue(args.extract_texts)
+        self.assertEqual(4, args.maxConcurrency)
+        self.assertTrue(args.offline)
+        self.assertTrue(args.force)
+        self.assertFalse(args.build_scholar_index)
+        self.assertEqual(100, args.checkpoint)
+        # inherited webserver argument
+        self.assertEqual(9857, args.port)
+
+    def test_dispatch(self):
+        """
+        test that the actions get the parsed arguments
+        """
+        cmd = RecordingCmd()
+        exit_code = cmd.cmd_main(
+            [
+                "--extract-texts",
+                "--build-scholar-index",
+                "--maxConcurrency",
+                "4",
+                "--offline",
+            ]
+        )
+        self.assertEqual(0, exit_code)
+        self.assertEqual(
+            ["build_scholar_index", "extract_texts"], [name for name, _ in cmd.calls]
+        )
+        for _name, args in cmd.calls:
+            self.assertIs(cmd.args, args)
+            self.assertEqual(4, args.maxConcurrency)
+            self.assertTrue(args.offline)
+        # nothing to do without an action
+        cmd = RecordingCmd()
+        self.assertFalse(cmd.handle_args(cmd.parse_args([])))
+        self.assertEqual([], cmd.calls)
+
+    def test_build_scholar_index(self):
+        """
+        test building the scholar indexes from a local SPARQL stand-in
+        """
+        bindings = [
+            {
+                "scholar": {
+                    "type": "uri",
+                    "value": "http://www.wikidata.org/entity/Q54303353",
+                },
+                "label": {"type": "literal", "value": "Stefan Decker"},
+                "given_name": {"type": "literal", "value": "Stefan"},
+                "family_name": {"type": "literal", "value": "Decker"},
+                "dblp_author_id": {"type": "literal", "value": "d/StefanDecker"},
+            }
+        ]
+        variables = ["scholar", "label", "given_name", "family_name", "dblp_author_id"]
+        server = LocalHttpServer()
+        server.add_json(
+            "/sparql",
+            json.dumps(
+                {"head": {"vars": variables}, "results": {"bindings": bindings}}
+            ),
+            content_type="application/sparql-results+json",
+        )
+        server.start()
+        home = os.environ.get("HOME")
+        with tempfile.TemporaryDirectory() as tmpdir:
+            # the indexes are built at their default paths
+            os.environ["HOME"] = tmpdir
+            try:
+                exit_code = SemPubFlowCmd().cmd_main(
+                    [
+                        "--build-scholar-index",
+                        "--wikidataEndpoint",
+                        server.url("/sparql"),
+                    ]
+                )
+                self.assertEqual(0, exit_code)
+                index = ScholarIndex(ScholarIndex.default_path())
+                mask = Scholar(given_name="Stefan", family_name="Decker")
+                scholars = index.get_scholar_suggestions(mask)
+                index.close()
+                self.assertEqual(["Q54303353"], [s.wikidata_id for s in scholars])
+                id_index = DblpIdIndex(DblpIdIndex.default_path())
+                self.assertEqual(
+                    "Q54303353", id_index.lookup("d/StefanDecker").wikidata_id
+                )
+                id_index.close()
+            finally:
+                os.environ["HOME"] = home
+                server.stop()
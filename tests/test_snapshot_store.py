@@ -0,0 +1,80 @@
+"""
+Created on 2024-03-07
+
+@author: wf
+"""
+import os
+import tempfile
+
+from ngwidgets.basetest import Basetest
+
+from sempubflow.homepage import Homepage, HomepageChecker
+from sempubflow.homepage_store import HomepageStore
+from sempubflow.snapshot_store import SnapshotStore
+from sempubflow.text_extraction import TextExtractionPipeline
+from tests.local_http_server import LocalHttpServer
+
+
+class TestSnapshotStore(Basetest):
+    """
+    test the content addressed raw html snapshot store
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = SnapshotStore(os.path.join(self.tmpdir.name, "snapshots"))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+        Basetest.tearDown(self)
+
+    def test_put_and_get(self):
+        """
+        test that snapshots are deduplicated and compressed
+        """
+        html = ("<html><body><p>Workshop</p></body></html>\n" * 100).encode()
+        digest = self.store.put(html)
+        self.assertEqual(SnapshotStore.hash_of(html), digest)
+        self.assertEqual(digest, self.store.put(html))
+        other = self.store.put(b"<html><body>other</body></html>")
+        self.assertEqual(sorted([digest, other]), list(self.store.digests()))
+        self.assertEqual(html, self.store.get(digest))
+        self.assertLess(os.path.getsize(self.store.find(digest)), len(html) / 10)
+        self.assertEqual("Workshop\n" * 99 + "Workshop", self.store.get_text(digest))
+        self.assertFalse(self.store.has(None))
+        with self.assertRaises(KeyError):
+            self.store.get("0" * 64)
+
+    def test_offline_replay(self):
+        """
+        test that homepage texts are replayed from the snapshots once the server is gone
+        """
+        server = LocalHttpServer()
+        html = "<html><body><h1>Café Workshop</h1></body></html>"
+        server.add_html("/Vol-1", html, encoding="latin-1")
+        server.start()
+        try:
+            homepage = Homepage(volume=1, url=server.url("/Vol-1"))
+            self.assertEqual(
+                "Café Workshop", homepage.get_text(snapshot_store=self.store)
+            )
+        finally:
+            server.stop()
+        self.assertEqual("latin-1", homepage.charset)
+        self.assertTrue(self.store.has(homepage.html_hash))
+        # persist hash and charset and replay without the server
+        db_path = os.path.join(self.tmpdir.name, "volume_homepages.db")
+        homepage.available = True
+        checker = HomepageChecker([], cache_file=db_path)
+        checker.homepages.homepages.append(homepage)
+        checker.save_homepages_cache()
+        checker = HomepageChecker([], cache_file=db_path)
+        loaded = checker.homepages.homepages[0]
+        self.assertEqual(homepage.html_hash, loaded.html_hash)
+        self.assertEqual("Café Workshop", loaded.get_text(snapshot_store=self.store))
+        pipeline = TextExtractionPipeline(
+            checker, workers=1, snapshot_store=self.store, offline=True
+        )
+        self.assertEqual(1, pipeline.run())
+        self.assertEqual("Café Workshop", HomepageStore(db_path).get_text(1))
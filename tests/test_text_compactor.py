@@ -0,0 +1,114 @@
+"""
+Created on 2024-03-10
+
+@author: wf
+"""
+import re
+import tempfile
+
+from ngwidgets.basetest import Basetest
+from tabulate import tabulate
+
+from sempubflow.event_evaluation import EventEvaluation
+from sempubflow.event_info import EventInfo
+from sempubflow.homepage import Homepage
+from sempubflow.text_compactor import TextCompactor
+from tests.fake_llm import FakeLLM
+
+
+class TestTextCompactor(Basetest):
+    """
+    test the token budgeted compaction of homepage texts
+    """
+
+    def homepage_text(self, volume: int, noise_lines: int = 400) -> str:
+        """
+        get a homepage text with the signature elements hidden in noise
+        """
+        noise = [
+            f"Accepted paper number {i} by some authors" for i in range(noise_lines)
+        ]
+        lines = (
+            ["Home", "Call for papers"]
+            + noise[: noise_lines // 2]
+            + [
+                f"{volume}th International Workshop on Knowledge Graphs (KGW {2000 + volume})",
+                f"The workshop will be held in Heraklion, Greece on May 26-27, {2000 + volume}",
+            ]
+            + noise[noise_lines // 2 :]
+        )
+        return "\n".join(lines)
+
+    def test_compact(self):
+        """
+        test that the compacted text fits the budget and keeps the signature
+        """
+        compactor = TextCompactor(token_budget=100)
+        text = self.homepage_text(24)
+        compacted = compactor.compact(text)
+        self.assertLessEqual(compactor.estimate_tokens(compacted), 100 + 10)
+        self.assertLess(len(compacted), len(text) / 20)
+        lines = compacted.splitlines()
+        self.assertIn(
+            "24th International Workshop on Knowledge Graphs (KGW 2024)", lines
+        )
+        self.assertIn("Heraklion, Greece", compacted)
+        # the original order is kept
+        self.assertLess(compacted.index("KGW 2024"), compacted.index("Heraklion"))
+        self.assertNotIn("Home", lines)
+        # short texts are not changed
+        self.assertEqual("Home\nKGW 2024", compactor.compact("Home\nKGW 2024"))
+
+    def test_event_info_budget(self):
+        """
+        test that EventInfo trims the prompt to the token budget
+        """
+        event_info = EventInfo(FakeLLM(), token_budget=1200)
+        event_info.text = self.homepage_text(24)
+        prompt_text = event_info.get_prompt_text()
+        compactor = TextCompactor()
+        prompt_tokens = compactor.estimate_tokens(event_info.prompt_prefix)
+        prompt_tokens += compactor.estimate_tokens(prompt_text)
+        self.assertLessEqual(prompt_tokens, 1200 + 10)
+        self.assertIn("KGW 2024", prompt_text)
+        event_info.token_budget = None
+        self.assertEqual(event_info.text, event_info.get_prompt_text())
+
+    def test_compare_compaction(self):
+        """
+        test the precision and recall report of full versus compacted texts
+        """
+
+        def answer(prompt_text: str) -> str:
+            # read the text part only - the prompt prefix has examples
+            text = prompt_text.split("from the following homepage text:")[-1]
+            acronym = re.search(r"\((KGW \d{4})\)", text).group(1)
+            city = re.search(r"held in (\w+)", text).group(1)
+            return f'acronym: "{acronym}"\ncity: "{city}"\n'
+
+        volumes = [
+            {"number": volume, "acronym": f"KGW {2000 + volume}", "city": "Heraklion"}
+            for volume in range(1, 6)
+        ]
+        homepages = [
+            Homepage(
+                volume=volume["number"],
+                url=f"http://example.org/{volume['number']}",
+                text=self.homepage_text(volume["number"]),
+            )
+            for volume in volumes
+        ]
+        evaluation = EventEvaluation(volumes)
+        with tempfile.TemporaryDirectory() as output_dir:
+            rows, tokens = evaluation.compare_compaction(
+                FakeLLM(answer=answer), homepages, output_dir, token_budget=1000
+            )
+        if self.debug:
+            print(tabulate(rows, headers="keys", floatfmt=".2f"))
+            print(tokens)
+        by_attr = {row["attr"]: row for row in rows}
+        for attr in ["acronym", "city"]:
+            self.assertEqual(1.0, by_attr[attr]["prec full"])
+            self.assertEqual(0.0, by_attr[attr]["Δ prec"])
+            self.assertEqual(0.0, by_attr[attr]["Δ recall"])
+        self.assertLess(tokens["compact"] * 2, tokens["full"])
@@ -0,0 +1,111 @@
+"""
+Created on 2024-03-06
+
+@author: wf
+"""
+import os
+import tempfile
+
+from ngwidgets.basetest import Basetest
+
+from sempubflow.homepage import Homepage, HomepageChecker
+from sempubflow.homepage_store import HomepageStore
+from sempubflow.text_extraction import TextExtractionPipeline
+from tests.local_http_server import LocalHttpServer
+
+
+class TestTextExtraction(Basetest):
+    """
+    test the parallel bulk text extraction pipeline
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "volume_homepages.db")
+        self.server = LocalHttpServer()
+        for volume in range(1, 8):
+            self.server.add_html(
+                f"/Vol-{volume}",
+                f"<html><body><h1>Workshop {volume}</h1>\n<p>Proceedings</p></body></html>",
+                delay=0.05,
+            )
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+        self.tmpdir.cleanup()
+        Basetest.tearDown(self)
+
+    def get_checker(self) -> HomepageChecker:
+        """
+        get a checker with available, unavailable, oversized and already extracted homepages
+        """
+        checker = HomepageChecker([], cache_file=self.db_path)
+        for volume in range(1, 8):
+            checker.homepages.homepages.append(
+                Homepage(
+                    volume=volume,
+                    url=self.server.url(f"/Vol-{volume}"),
+                    available=True,
+                    # the probe of the last page returned no content length
+                    content_len=200 if volume < 7 else None,
+                )
+            )
+        checker.homepages.homepages.extend(
+            [
+                Homepage(volume=8, url=LocalHttpServer.dead_url(), available=False),
+                Homepage(
+                    volume=9,
+                    url=self.server.url("/Vol-9"),
+                    available=True,
+                    content_len=10**7,
+                ),
+                Homepage(
+                    volume=10,
+                    url=self.server.url("/Vol-1"),
+                    text="already extracted",
+                    available=True,
+                    content_len=200,
+                ),
+            ]
+        )
+        return checker
+
+    def test_extract_texts(self):
+        """
+        test extracting the texts with checkpoints
+        """
+        checker = self.get_checker()
+        pipeline = TextExtractionPipeline(checker, checkpoint_every=2, workers=2)
+        selected = pipeline.select_homepages()
+        self.assertEqual(list(range(1, 8)), [hp.volume for hp in selected])
+        self.assertEqual(7, pipeline.run())
+        self.assertEqual(0, pipeline.failed)
+        # 3 regular checkpoints and a final one for the 7th page
+        self.assertEqual(4, pipeline.checkpoints)
+        self.assertLessEqual(self.server.max_inflight, 2)
+        store = HomepageStore(self.db_path)
+        for volume in range(1, 8):
+            self.assertEqual(f"Workshop {volume}\nProceedings", store.get_text(volume))
+        self.assertEqual("already extracted", store.get_text(10))
+        self.assertIsNone(store.get_text(8))
+        # a rerun resumes with nothing left to do
+        pipeline = TextExtractionPipeline(
+            HomepageChecker([], cache_file=self.db_path), checkpoint_every=2
+        )
+        self.assertEqual([], pipeline.select_homepages())
+
+    def test_failures(self):
+        """
+        test that failing downloads are counted and do not stop the pipeline
+        """
+        checker = self.get_checker()
+        homepages = [
+            Homepage(volume=11, url=LocalHttpServer.dead_url(), available=True),
+            checker.homepages.homepages[0],
+        ]
+        pipeline = TextExtractionPipeline(checker, workers=1)
+        self.assertEqual(1, pipeline.run(homepages))
+        self.assertEqual(1, pipeline.failed)
+        self.assertEqual(1, pipeline.checkpoints)
@@ -0,0 +1,96 @@
+"""
+Created on 2024-03-21
+
+@author: wf
+"""
+import tempfile
+
+from ngwidgets.basetest import Basetest
+
+from sempubflow.jsoncache import JsonCacheManager
+from sempubflow.volume_registry import VolumeRegistry
+
+
+class TestVolumeRegistry(Basetest):
+    """
+    test the shared volume registry
+    """
+
+    def setUp(self, debug=False, profile=True):
+        Basetest.setUp(self, debug=debug, profile=profile)
+        self.volumes = [
+            {
+                "number": 3344,
+                "acronym": "SemPub 2024",
+                "urn": "urn:nbn:de:0074-3344-9",
+                "homepage": "https://sempub.example.org/2024/",
+                "year": 2024,
+            },
+            {
+                "number": 3000,
+                "acronym": "Wikidata 2021",
+                "urn": "urn:nbn:de:0074-3000-4",
+                "homepage": "http://WIKIDATA.example.org/",
+                "year": "2021",
+            },
+            {"number": 1, "acronym": "SemPub 2024", "homepage": None, "year": 1995},
+            {"number": 2, "homepage": "  "},
+        ]
+
+    def test_lookups(self):
+        """
+        test the lookups by number, acronym, URN and homepage host
+        """
+        registry = VolumeRegistry(self.volumes)
+        self.assertEqual(4, len(registry))
+        self.assertEqual(self.volumes[0], registry.by_number(3344))
+        self.assertEqual(self.volumes[0], registry.by_number("3344"))
+        self.assertIsNone(registry.by_number(4711))
+        self.assertEqual(
+            [self.volumes[0], self.volumes[2]], registry.by_acronym("sempub 2024")
+        )
+        self.assertEqual(self.volumes[1], registry.by_urn("URN:NBN:DE:0074-3000-4"))
+        self.assertEqual([self.volumes[1]], registry.by_host("wikidata.example.org"))
+
+    def test_filters(self):
+        """
+        test the vectorized filters
+        """
+        registry = VolumeRegistry(self.volumes)
+        self.assertEqual(
+            [3344, 3000],
+            [v["number"] for v in registry.select(has_homepage=True)],
+        )
+        self.assertEqual(
+            [1, 2], [v["number"] for v in registry.select(has_homepage=False)]
+        )
+        self.assertEqual(
+            [3344, 3000], [v["number"] for v in registry.select(year_from=2000)]
+        )
+        self.assertEqual(
+            [3000, 1],
+            [v["number"] for v in registry.select(year_from=1990, year_to=2021)],
+        )
+        self.assertEqual([1], [v["number"] for v in registry.select(year_to=2000)])
+        self.assertEqual(4, registry.mask().sum())
+
+    def test_lazy_load(self):
+        """
+        test loading the volumes from the cache once on first use
+        """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache_manager = JsonCacheManager(root_path=tmpdir)
+            registry = VolumeRegistry(cache_manager=cache_manager)
+            self.assertFalse(registry.is_available())
+            cache_manager.store("volumes", self.volumes)
+            self.assertTrue(registry.is_available())
+            self.assertIsNone(registry.index)
+            self.assertEqual(self.volumes[1], registry.by_number(3000))
+            index = registry.index
+            self.assertIsNotNone(index)
+            registry.by_acronym("SemPub 2024")
+            self.assertIs(index, registry.index)
+            cache_manager.store("volumes", self.volumes[:2])
+            self.assertEqual(self.volumes[:2], registry.reload())
+            self.assertIsNone(registry.by_number(1))
+        self.assertIs(VolumeRegistry.get_instance(), VolumeRegistry.get_instance())
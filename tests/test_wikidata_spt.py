@@ -11,6 +11,7 @@ from ngwidgets.basetest import Basetest
 
 from sempubflow.homepage import Homepage
 from sempubflow.sync import Sync, SyncPair
+from sempubflow.volume_registry import VolumeRegistry
 
 
 class VolumeList:
@@ -78,7 +79,6 @@ class TestWikidataSpt(Basetest):
     def setUp(self, debug=False, profile=True):
         Basetest.setUp(self, debug=debug, profile=profile)
         self.ceurws_path = os.path.expanduser("~/.ceurws")
-        self.volumes_path = os.path.join(self.ceurws_path, "volumes.json")
         self.dblp_volumes_path = os.path.join(self.ceurws_path, "dblp/volumes.json")
         self.volumes = self.get_volumes()
         self.volume_list = VolumeList()
@@ -94,8 +94,11 @@ class TestWikidataSpt(Basetest):
         return lod
 
     def get_volumes(self):
-        lod = self.get_from_json(self.volumes_path)
-        return lod
+        # the volumes are loaded once per process
+        registry = VolumeRegistry.get_instance()
+        if not registry.is_available():
+            return None
+        return registry.volumes
 
     def show_ceur_ws_pages(self, sync: Sync, direction: str):
         """